@@ -59,6 +59,7 @@ class TM(ConsolePrinterMixin):
                collectStats =False,    # If true, collect training and inference stats
                seed =42,
                verbosity =VERBOSITY,
+               useSynapseArrays =False,
                ):
     """
     Construct the TM
@@ -104,6 +105,10 @@ class TM(ConsolePrinterMixin):
 
     @param seed   seed for random number generator
 
+    @param useSynapseArrays If True, keep an array-backed copy of the synapses
+                  and compute the activity of all segments in one vectorized
+                  pass. See setUseSynapseArrays. Default is False.
+
     """
 
     ConsolePrinterMixin.__init__(self, verbosity)
@@ -198,6 +203,8 @@ class TM(ConsolePrinterMixin):
     #  __setstate__)
     self._initEphemerals()
 
+    self.setUseSynapseArrays(useSynapseArrays)
+
   ################################################################################
   def _getEphemeralMembers(self):
     """
@@ -207,6 +214,7 @@ class TM(ConsolePrinterMixin):
       'segmentUpdates',
       '_internalStats',
       '_stats',
+      '_synapseArrays',
       ]
 
   #############################################################################
@@ -223,6 +231,10 @@ class TM(ConsolePrinterMixin):
 
     self.sequenceSignatures = []
 
+    # The optional array-backed copy of the synapses. It is rebuilt from
+    # self.cells on demand, so it is never saved.
+    self._synapseArrays = None
+
     # Allocate and reset all stats
     self.resetStats()
 
@@ -284,6 +296,32 @@ class TM(ConsolePrinterMixin):
   def __del__(self):
     pass
 
+  #############################################################################
+  def setUseSynapseArrays(self, useSynapseArrays):
+    """ Enable or disable the array-backed synapse store.
+
+    When enabled, the synapses of every segment are mirrored into flat arrays
+    of presynaptic cell indices and permanences, along with a segment to cell
+    index, and segment activities are computed for all segments at once
+    rather than one segment at a time. The segments in self.cells remain the
+    authoritative copy, so the output of compute() and the saved state are the
+    same either way. This setting is not saved with the TM.
+    """
+    if useSynapseArrays:
+      if self._synapseArrays is None:
+        self._synapseArrays = _SynapseArrays(self.numberOfCols,
+                                             self.cellsPerColumn)
+    else:
+      self._synapseArrays = None
+
+  #############################################################################
+  def _synapsesChanged(self, c, i):
+    """ Called whenever the segments or synapses of cell (c,i) change, so
+    that the array-backed synapse store can be brought up to date.
+    """
+    if self._synapseArrays is not None:
+      self._synapseArrays.markCellDirty(c, i)
+
   #############################################################################
   def setRandomSeed(self, seed):
     """ Seed the random number generator.
@@ -1051,6 +1089,10 @@ class TM(ConsolePrinterMixin):
     #   for reinforcement,
     # - if pooling is on, try to find the best weakly activated segment to
     #   reinforce it, else create a new pooling segment.
+    if self._synapseArrays is not None:
+      self._computePhase2Vectorized(doLearn)
+      return
+
     for c in xrange(self.numberOfCols):
 
       buPredicted = False # whether any cell in the column is predicted
@@ -1079,6 +1121,35 @@ class TM(ConsolePrinterMixin):
         self.confidence['t'][c,i] = maxConfidence
 
 
+  def _computePhase2Vectorized(self, doLearn):
+    """
+    Same as computePhase2, but the activity of every segment is computed in one
+    pass over the array-backed synapse store, and only the active segments are
+    visited.
+    """
+    arrays = self._synapseArrays
+    arrays.update(self.cells)
+    activity = arrays.computeActivity(self.activeState['t'],
+                                      connectedPerm=self.connectedPerm)
+
+    self.confidence['t'].fill(0.0)
+    for segIdx in numpy.where(activity >= self.activationThreshold)[0]:
+      c, i = divmod(int(arrays.segmentCells[segIdx]), self.cellsPerColumn)
+      s = arrays.segments[segIdx]
+
+      self.predictedState['t'][c,i] = 1
+      self.confidence['t'][c,i] = max(self.confidence['t'][c,i],
+                                      s.dutyCycle(readOnly=True))
+
+      if doLearn:
+        s.totalActivations += 1    # increment activationFrequency
+        s.lastActiveIteration = self.iterationIdx
+        # mark this segment for learning
+        activeUpdate = self.getSegmentActiveSynapses(c,i,s,'t')
+        activeUpdate.phase1Flag = False
+        self.addToSegmentUpdates(c, i, activeUpdate)
+
+
   def compute(self, bottomUpInput, enableLearn, computeInfOutput=None):
     """Computes output for both learning and inference. In both cases, the
     output is the boolean OR of activeState and predictedState at t.
@@ -1352,6 +1423,8 @@ class TM(ConsolePrinterMixin):
             for syn in synsToDel: # remove some synapses on segment
               segment.syns.remove(syn)
 
+          self._synapsesChanged(c, i)
+
         for seg in segsToDel: # remove some segments of this cell
           self.cleanUpdatesList(c,i,seg)
           self.cells[c][i].remove(seg)
@@ -1447,6 +1520,8 @@ class TM(ConsolePrinterMixin):
     # Loop through all segments
     nSegsRemoved, nSynsRemoved = 0, 0
     segsToDel = [] # collect and remove segments outside the loop
+    if len(segList) > 0:
+      self._synapsesChanged(colIdx, cellIdx)
     for segment in segList:
 
       # List if synapses to delete
@@ -1692,6 +1767,20 @@ class TM(ConsolePrinterMixin):
     return isSegmentActive(seg.syns, activeState,
                            self.connectedPerm, self.activationThreshold)
 
+  #############################################################################
+  def _getCellSegmentActivities(self, c, firstCell, lastCell, activeState,
+                                connectedSynapsesOnly=False):
+    """Use the array-backed synapse store to compute the activity level of
+    every segment on cells firstCell..lastCell-1 of column c. Returns one array
+    of segment activities per cell, in the same order as self.cells[c][i].
+    """
+    arrays = self._synapseArrays
+    arrays.update(self.cells)
+    connectedPerm = self.connectedPerm if connectedSynapsesOnly else None
+    return arrays.computeCellActivities(
+      activeState, c * self.cellsPerColumn + firstCell,
+      c * self.cellsPerColumn + lastCell, connectedPerm)
+
 
   ##############################################################################
   def getSegmentActiveSynapses(self, c,i,s, timeStep, newSynapses =False):
@@ -1748,9 +1837,15 @@ class TM(ConsolePrinterMixin):
     bestActivation = self.activationThreshold
     which = -1
 
-    for j,s in enumerate(self.cells[c][i]):
+    if self._synapseArrays is not None:
+      activities = self._getCellSegmentActivities(
+        c, i, i+1, self.activeState[timeStep], connectedSynapsesOnly=True)[0]
+    else:
+      activities = [self.getSegmentActivityLevel(s, self.activeState[timeStep],
+                                                 connectedSynapsesOnly = True)
+                    for s in self.cells[c][i]]
 
-      activity = self.getSegmentActivityLevel(s, self.activeState[timeStep], connectedSynapsesOnly = True)
+    for j,activity in enumerate(activities):
 
       if activity >= bestActivation:
         bestActivation = activity
@@ -1815,14 +1910,22 @@ class TM(ConsolePrinterMixin):
     bestSegIdxInCol = -1
     bestCellInCol = -1
 
+    if self._synapseArrays is not None:
+      activitiesByCell = self._getCellSegmentActivities(
+        c, 0, self.cellsPerColumn, activeState, connectedSynapsesOnly=False)
+    else:
+      activitiesByCell = [
+        [self.getSegmentActivityLevel(s, activeState,
+                                      connectedSynapsesOnly =False)
+         for s in self.cells[c][i]]
+        for i in xrange(self.cellsPerColumn)]
+
     for i in xrange(self.cellsPerColumn):
 
       maxSegActivity = 0
       maxSegIdx = 0
 
-      for j,s in enumerate(self.cells[c][i]):
-
-        activity = self.getSegmentActivityLevel(s, activeState, connectedSynapsesOnly =False)
+      for j,activity in enumerate(activitiesByCell[i]):
 
         if self.verbosity >= 6:
           print " Segment Activity for column ", c, " cell ", i, " segment ", " j is ", activity
@@ -1854,9 +1957,15 @@ class TM(ConsolePrinterMixin):
     """
     maxActivity, which = self.minThreshold, -1
 
-    for j,s in enumerate(self.cells[c][i]):
-      activity = self.getSegmentActivityLevel(s, activeState,
-                                              connectedSynapsesOnly=False)
+    if self._synapseArrays is not None:
+      activities = self._getCellSegmentActivities(
+        c, i, i+1, activeState, connectedSynapsesOnly=False)[0]
+    else:
+      activities = [self.getSegmentActivityLevel(s, activeState,
+                                                 connectedSynapsesOnly=False)
+                    for s in self.cells[c][i]]
+
+    for j,activity in enumerate(activities):
 
       if activity >= maxActivity:
         maxActivity, which = activity, j
@@ -2014,6 +2123,7 @@ class TM(ConsolePrinterMixin):
 
     # segUpdate.segment is None when creating a new segment
     c, i, segment = segUpdate.columnIdx, segUpdate.cellIdx, segUpdate.segment
+    self._synapsesChanged(c, i)
 
     # update.activeSynapses can be empty.
     # If not, it can contain either or both integers and tuples.
@@ -2452,3 +2562,156 @@ class Segment(object):
           reached0 = True
 
     return reached0
+
+
+
+class _SynapseArrays(object):
+  """
+  Array-backed mirror of the synapses of a TM. The synapses of every segment
+  are stored as flat arrays of presynaptic cell indices and permanences, with
+  a synapse to segment index and a segment to cell index, so that the activity
+  of every segment can be computed in a single vectorized pass.
+
+  Segments are ordered by cell (column major, as in TM.cells) and then by
+  their position in the cell's segment list. The TM tells the store which
+  cells changed, and only those cells are re-read on the next update.
+  """
+
+  def __init__(self, numberOfCols, cellsPerColumn):
+    self.cellsPerColumn = cellsPerColumn
+    numCells = numberOfCols * cellsPerColumn
+
+    self._dirtyCells = set(xrange(numCells))
+
+    self.presynapticCells = numpy.empty(0, dtype="int32")
+    self.permanences = numpy.empty(0, dtype="float32")
+    self.synapseSegments = numpy.empty(0, dtype="int32")
+    self.segmentSizes = numpy.empty(0, dtype="int32")
+    self.segmentCells = numpy.empty(0, dtype="int32")
+    self.segmentsPerCell = numpy.zeros(numCells, dtype="int32")
+    self.segmentSynapseStarts = numpy.zeros(1, dtype="int32")
+    self.cellSegmentStarts = numpy.zeros(numCells + 1, dtype="int32")
+    self.segments = []
+
+
+  def markCellDirty(self, c, i):
+    self._dirtyCells.add(c * self.cellsPerColumn + i)
+
+
+  def update(self, cells):
+    """
+    Re-read the segments of every dirty cell and splice them into the flat
+    arrays. The synapses of the other cells are copied over as whole slices.
+
+    @param cells (list) The TM's cells, indexed by column and cell
+    """
+    if len(self._dirtyCells) == 0:
+      return
+
+    dirtyCells = sorted(self._dirtyCells)
+    self._dirtyCells.clear()
+
+    cellsPerColumn = self.cellsPerColumn
+    cellSegmentStarts = self.cellSegmentStarts
+    segmentSynapseStarts = self.segmentSynapseStarts
+
+    presynapticPieces = []
+    permanencePieces = []
+    segmentSizePieces = []
+    dirtySegments = []
+
+    def copyUnchanged(firstCell, lastCell):
+      firstSegment = cellSegmentStarts[firstCell]
+      lastSegment = cellSegmentStarts[lastCell]
+      firstSynapse = segmentSynapseStarts[firstSegment]
+      lastSynapse = segmentSynapseStarts[lastSegment]
+      presynapticPieces.append(
+        self.presynapticCells[firstSynapse:lastSynapse])
+      permanencePieces.append(self.permanences[firstSynapse:lastSynapse])
+      segmentSizePieces.append(self.segmentSizes[firstSegment:lastSegment])
+
+    nextCell = 0
+    for cell in dirtyCells:
+      copyUnchanged(nextCell, cell)
+
+      segments = cells[cell // cellsPerColumn][cell % cellsPerColumn]
+      syns = [syn for segment in segments for syn in segment.syns]
+      presynapticPieces.append(numpy.array(
+        [syn[0] * cellsPerColumn + syn[1] for syn in syns], dtype="int32"))
+      permanencePieces.append(numpy.array([syn[2] for syn in syns],
+                                          dtype="float32"))
+      segmentSizePieces.append(numpy.array(
+        [len(segment.syns) for segment in segments], dtype="int32"))
+      dirtySegments.append((cell, segments))
+
+      nextCell = cell + 1
+    copyUnchanged(nextCell, len(self.segmentsPerCell))
+
+    self.presynapticCells = numpy.concatenate(presynapticPieces)
+    self.permanences = numpy.concatenate(permanencePieces)
+    self.segmentSizes = numpy.concatenate(segmentSizePieces)
+
+    # Splice the segment lists from the last cell backwards, so that the old
+    # starts of the earlier cells remain valid.
+    for cell, segments in reversed(dirtySegments):
+      self.segments[cellSegmentStarts[cell]:cellSegmentStarts[cell+1]] = (
+        segments)
+      self.segmentsPerCell[cell] = len(segments)
+
+    numSegments = len(self.segmentSizes)
+    numpy.cumsum(self.segmentsPerCell, out=self.cellSegmentStarts[1:])
+    self.segmentSynapseStarts = numpy.zeros(numSegments + 1, dtype="int32")
+    numpy.cumsum(self.segmentSizes, out=self.segmentSynapseStarts[1:])
+    self.segmentCells = numpy.repeat(
+      numpy.arange(len(self.segmentsPerCell), dtype="int32"),
+      self.segmentsPerCell)
+    self.synapseSegments = numpy.repeat(
+      numpy.arange(numSegments, dtype="int32"), self.segmentSizes)
+
+
+  def computeActivity(self, activeState, connectedPerm=None):
+    """
+    Compute the activity level of every segment, i.e. its number of synapses
+    from active cells. If connectedPerm is given, only synapses with
+    permanence >= connectedPerm are counted.
+
+    @param activeState (numpy array) Active state of every cell, shaped
+                       (numberOfCols, cellsPerColumn)
+    @param connectedPerm (float or None)
+
+    @return (numpy array) The activity of each segment
+    """
+    return self._computeActivity(activeState, 0, len(self.segments),
+                                 connectedPerm)
+
+
+  def computeCellActivities(self, activeState, firstCell, lastCell,
+                            connectedPerm=None):
+    """
+    Like computeActivity, but only for the segments on cells
+    firstCell..lastCell-1.
+
+    @return (list of numpy arrays) The segment activities of each cell
+    """
+    cellSegmentStarts = self.cellSegmentStarts[firstCell:lastCell+1]
+    activity = self._computeActivity(activeState, cellSegmentStarts[0],
+                                     cellSegmentStarts[-1], connectedPerm)
+    return numpy.split(activity, cellSegmentStarts[1:-1] - cellSegmentStarts[0])
+
+
+  def _computeActivity(self, activeState, firstSegment, lastSegment,
+                       connectedPerm):
+    if lastSegment == firstSegment:
+      return numpy.zeros(0, dtype="int")
+
+    synStart = self.segmentSynapseStarts[firstSegment]
+    synEnd = self.segmentSynapseStarts[lastSegment]
+
+    activeSynapses = activeState.reshape(-1)[
+      self.presynapticCells[synStart:synEnd]] != 0
+    if connectedPerm is not None:
+      activeSynapses &= self.permanences[synStart:synEnd] >= connectedPerm
+
+    return numpy.bincount(
+      self.synapseSegments[synStart:synEnd][activeSynapses] - firstSegment,
+      minlength=lastSegment - firstSegment)
@@ -24,6 +24,7 @@
 import numpy as np
 
 from htmresearch.support import numpy_helpers as np2
+from htmresearch.support.segment_activity import computeSegmentActivity
 from nupic.bindings.math import Random, SparseMatrixConnections
 
 
@@ -461,8 +462,10 @@ class ApicalDependentTemporalMemory(object):
       The number of active potential synapses for each segment.
       Includes counts for active, matching, and nonmatching segments.
     """
+    overlaps, potentialOverlaps = computeSegmentActivity(
+      connections, activeInput, connectedPermanence)
+
     # Active apical segments lower the activation threshold for basal segments
-    overlaps = connections.computeActivity(activeInput, connectedPermanence)
     outrightActiveSegments = np.flatnonzero(overlaps >= activationThreshold)
     if (reducedThreshold != activationThreshold and
             len(reducedThresholdCells) > 0):
@@ -482,7 +485,6 @@ class ApicalDependentTemporalMemory(object):
 
 
     # Matching
-    potentialOverlaps = connections.computeActivity(activeInput)
     matchingSegments = np.flatnonzero(potentialOverlaps >= minThreshold)
 
     return (activeSegments,
@@ -24,6 +24,7 @@
 import numpy as np
 
 from htmresearch.support import numpy_helpers as np2
+from htmresearch.support.segment_activity import computeSegmentActivity
 from nupic.bindings.math import Random, SparseMatrixConnections
 
 
@@ -498,12 +499,13 @@ class ApicalTiebreakTemporalMemory(object):
       Includes counts for active, matching, and nonmatching segments.
     """
 
+    overlaps, potentialOverlaps = computeSegmentActivity(
+      connections, activeInput, connectedPermanence)
+
     # Active
-    overlaps = connections.computeActivity(activeInput, connectedPermanence)
     activeSegments = np.flatnonzero(overlaps >= activationThreshold)
 
     # Matching
-    potentialOverlaps = connections.computeActivity(activeInput)
     matchingSegments = np.flatnonzero(potentialOverlaps >= minThreshold)
 
     return (activeSegments,
@@ -539,8 +541,10 @@ class ApicalTiebreakTemporalMemory(object):
       The number of active potential synapses for each segment.
       Includes counts for active, matching, and nonmatching segments.
     """
+    overlaps, potentialOverlaps = computeSegmentActivity(
+      connections, activeInput, connectedPermanence)
+
     # Active apical segments lower the activation threshold for basal (lateral) segments
-    overlaps = connections.computeActivity(activeInput, connectedPermanence)
     outrightActiveSegments = np.flatnonzero(overlaps >= activationThreshold)
     if reducedBasalThreshold != activationThreshold and len(reducedBasalThresholdCells) > 0:
         potentiallyActiveSegments = np.flatnonzero((overlaps < activationThreshold)
@@ -556,7 +560,6 @@ class ApicalTiebreakTemporalMemory(object):
 
 
     # Matching
-    potentialOverlaps = connections.computeActivity(activeInput)
     matchingSegments = np.flatnonzero(potentialOverlaps >= minThreshold)
 
     return (activeSegments,
@@ -20,6 +20,7 @@
 # ----------------------------------------------------------------------
 
 import numpy
+import scipy.sparse
 
 from nupic.bindings.math import SparseMatrix, GetNTAReal, Random
 
@@ -187,6 +188,10 @@ class ColumnPooler(object):
     self.distalPermanences = tuple(SparseMatrix(cellCount, n)
                                    for n in lateralInputWidths)
 
+    # Connected synapse matrices used by computeBatch, cached until learning
+    # changes the permanences.
+    self._connectedMatrices = {}
+
     self.useInertia=True
 
 
@@ -296,6 +301,8 @@ class ColumnPooler(object):
     # Finally, now that we have decided which cells we should be learning on, do
     # the actual learning.
     if len(feedforwardInput) > 0:
+      self._connectedMatrices.clear()
+
       self._learn(self.proximalPermanences, self._random,
                   self.activeCells, feedforwardInput,
                   feedforwardGrowthCandidates, self.sampleSizeProximal,
@@ -373,6 +380,159 @@ class ColumnPooler(object):
                     feedforwardSupportedCells[numActiveSegsForFFSuppCells >= ttop])
         ttop -= 1
 
+    self.activeCells = self._addInertialAndFeedforwardCells(
+      chosenCells, feedforwardSupportedCells, numActiveSegmentsByCell,
+      prevActiveCells)
+
+
+  def computeBatch(self, feedforwardInputs, lateralInputsBatch=None,
+                   prevActiveCellsBatch=None):
+    """
+    Runs inference on a batch of independent sensations. Each sensation is
+    scored exactly as compute(learn=False) would score it, starting from its
+    own set of previously active cells, but the overlaps for the whole batch
+    are computed with one sparse matrix product per connection matrix and the
+    lateral cell selection is vectorized over the batch.
+
+    The pooler's state (including its active cells) is not modified, except
+    for the random number generator, which is consumed in batch order. So
+    the results are identical to setting the active cells and calling
+    compute(learn=False) for each sensation in turn.
+
+    The connected synapses of each connection matrix are extracted once and
+    reused by later batches until the pooler learns. Code that edits the
+    permanence matrices in place must clear _connectedMatrices before the
+    next batch.
+
+    Parameters:
+    ----------------------------
+    @param  feedforwardInputs (list of sequences)
+            For each sensation, sorted indices of active feedforward input bits
+
+    @param  lateralInputsBatch (list of lists of sequences or None)
+            For each sensation, the lateralInputs that would be passed to
+            compute. If None, no lateral input is used.
+
+    @param  prevActiveCellsBatch (list of sequences or None)
+            For each sensation, sorted indices of the cells that were active
+            before the sensation. If None, the current active cells are used
+            for every sensation.
+
+    @return (list of numpy arrays)
+            For each sensation, sorted indices of the resulting active cells
+    """
+    batchSize = len(feedforwardInputs)
+    if batchSize == 0:
+      return []
+
+    if lateralInputsBatch is None:
+      lateralInputsBatch = [()] * batchSize
+    if prevActiveCellsBatch is None:
+      prevActiveCellsBatch = [self.activeCells] * batchSize
+    prevActiveCellsBatch = [numpy.asarray(prevActiveCells, dtype="uint32")
+                            for prevActiveCells in prevActiveCellsBatch]
+
+    # Calculate the feedforward supported cells
+    overlaps = _rightBatchSumAtNZSparse(
+      self._getConnectedMatrix("proximal", self.proximalPermanences,
+                               self.connectedPermanenceProximal),
+      feedforwardInputs)
+    feedforwardSupported = overlaps >= self.minThresholdProximal
+
+    # Calculate the number of active segments on each cell
+    numActiveSegmentsByCell = numpy.zeros((self.cellCount, batchSize),
+                                          dtype="int")
+    overlaps = _rightBatchSumAtNZSparse(
+      self._getConnectedMatrix("internalDistal",
+                               self.internalDistalPermanences,
+                               self.connectedPermanenceDistal),
+      prevActiveCellsBatch)
+    numActiveSegmentsByCell[overlaps >= self.activationThresholdDistal] += 1
+    for i, permanences in enumerate(self.distalPermanences):
+      lateralInputs = [(lateralInputs[i] if i < len(lateralInputs) else ())
+                       for lateralInputs in lateralInputsBatch]
+      overlaps = _rightBatchSumAtNZSparse(
+        self._getConnectedMatrix(("distal", i), permanences,
+                                 self.connectedPermanenceDistal),
+        lateralInputs)
+      numActiveSegmentsByCell[overlaps >= self.activationThresholdDistal] += 1
+
+    # Activate the FF-supported cells that have the highest number of lateral
+    # active segments. For each sensation, find the highest number of active
+    # segments 'ttop' for which the sdrSize quorum is met, falling back to 1,
+    # then choose every FF-supported cell with at least 'ttop' active segments.
+    # This is what the descending 'ttop' loop in _computeInferenceMode does.
+    lateralSupport = numpy.where(feedforwardSupported,
+                                 numActiveSegmentsByCell, 0)
+    ttops = numpy.ones(batchSize, dtype="int")
+    for ttop in xrange(2, len(self.distalPermanences) + 2):
+      quorumMet = (lateralSupport >= ttop).sum(axis=0) >= self.sdrSize
+      ttops[quorumMet] = ttop
+    chosen = lateralSupport >= ttops
+
+    # The remaining selection draws from the random number generator, so it
+    # is done sensation by sensation.
+    activeCellsBatch = []
+    for b in xrange(batchSize):
+      activeCellsBatch.append(self._addInertialAndFeedforwardCells(
+        numpy.where(chosen[:, b])[0],
+        numpy.where(feedforwardSupported[:, b])[0],
+        numActiveSegmentsByCell[:, b],
+        prevActiveCellsBatch[b]))
+
+    return activeCellsBatch
+
+
+  def _getConnectedMatrix(self, key, permanences, connectedPermanence):
+    """
+    Returns the connected synapses of a permanence matrix as a scipy CSR
+    matrix, extracting them only if the cached matrix is missing or was
+    computed for another permanence matrix.
+
+    @param  key (hashable)
+            Name of the connection matrix in the cache
+
+    @param  permanences (SparseMatrix)
+            Matrix of permanences, with cells as rows and inputs as columns
+
+    @param  connectedPermanence (float)
+            Permanence at which a synapse is connected
+    """
+    cached = self._connectedMatrices.get(key)
+    if cached is None or cached[0] is not permanences:
+      cached = (permanences,
+                _connectedSynapseMatrix(permanences, connectedPermanence))
+      self._connectedMatrices[key] = cached
+    return cached[1]
+
+
+  def _addInertialAndFeedforwardCells(self, chosenCells,
+                                      feedforwardSupportedCells,
+                                      numActiveSegmentsByCell,
+                                      prevActiveCells):
+    """
+    Completes the inference mode cell selection. Starting from the cells that
+    were chosen for having both feedforward and lateral support, fill the
+    sdrSize quorum with inertial cells and then with cells that only have
+    feedforward support.
+
+    Parameters:
+    ----------------------------
+    @param  chosenCells (sorted sequence)
+            Cells chosen for having both feedforward and lateral support
+
+    @param  feedforwardSupportedCells (sorted sequence)
+            Cells with feedforward support
+
+    @param  numActiveSegmentsByCell (numpy array)
+            The number of active lateral segments on each cell
+
+    @param  prevActiveCells (sorted numpy array)
+            The previously active cells
+
+    @return (numpy array)
+            Sorted indices of the active cells
+    """
     # If we haven't filled the sdrSize quorum, add in inertial cells.
     if len(chosenCells) < self.sdrSize:
       if self.useInertia:
@@ -426,7 +586,7 @@ class ColumnPooler(object):
         chosenCells = numpy.append(chosenCells, remFFcells)
 
     chosenCells.sort()
-    self.activeCells = numpy.asarray(chosenCells, dtype="uint32")
+    return numpy.asarray(chosenCells, dtype="uint32")
 
 
   def numberOfInputs(self):
@@ -669,6 +829,46 @@ def _sample(rng, arr, k):
   return selected
 
 
+def _connectedSynapseMatrix(sparseMatrix, threshold):
+  """
+  Extracts the entries of a SparseMatrix that are >= threshold.
+
+  @return (scipy.sparse.csr_matrix)
+          A matrix with a 1 for each of these entries
+  """
+  nRows = sparseMatrix.nRows()
+  rowIndptr = numpy.zeros(nRows + 1, dtype="int32")
+  rowIndices = []
+  for row in xrange(nRows):
+    cols, values = sparseMatrix.rowNonZeros(row)
+    cols = cols[values >= threshold]
+    rowIndices.append(cols)
+    rowIndptr[row + 1] = rowIndptr[row] + len(cols)
+  rowIndices = numpy.concatenate(rowIndices).astype("int32")
+  return scipy.sparse.csr_matrix(
+    (numpy.ones(len(rowIndices), dtype="int32"), rowIndices, rowIndptr),
+    shape=(nRows, sparseMatrix.nCols()))
+
+
+def _rightBatchSumAtNZSparse(matrix, batch):
+  """
+  Like rightVecSumAtNZSparse, but for a scipy sparse matrix and a batch of
+  sparse vectors, which are multiplied with the matrix at once.
+
+  @return (numpy array)
+          A (nRows x len(batch)) matrix of sums
+  """
+  vecIndptr = numpy.zeros(len(batch) + 1, dtype="int32")
+  numpy.cumsum([len(vec) for vec in batch], out=vecIndptr[1:])
+  vecIndices = numpy.concatenate(
+    [numpy.asarray(vec, dtype="int32") for vec in batch])
+  vectors = scipy.sparse.csc_matrix(
+    (numpy.ones(len(vecIndices), dtype="int32"), vecIndices, vecIndptr),
+    shape=(matrix.shape[1], len(batch)))
+
+  return (matrix * vectors).toarray()
+
+
 def _countWhereGreaterEqualInRows(sparseMatrix, rows, threshold):
   """
   Like countWhereGreaterOrEqual, but for an arbitrary selection of rows, and
@@ -30,8 +30,22 @@ def divide(a, b):
   return a/b
 
 
+def divideArrays(a, b):
+  """
+  Elementwise version of `divide`, broadcasting a and b.
+  """
+  with np.errstate(divide="ignore", invalid="ignore"):
+    return np.where(a == 0, 0.0, np.true_divide(a, b))
+
+
 class HMM(object):
-    def __init__(self, numCats, numStates, criterion=0.0001, verbosity=0):
+    def __init__(self, numCats, numStates, criterion=0.0001, verbosity=0,
+                 vectorized=True):
+      """
+      @param vectorized (bool)
+      If true, `train` uses the scaled, matrix-product based
+      forward-backward and update steps instead of the loops.
+      """
       self.A = None # {a_ij} = P(X_t = j | X_t-1 = i)
       self.B = None # {b_ij} = P(Y_t = i | X_t = j)
       self.pi = None # {pi_i} = P(X_0 = i)
@@ -40,6 +54,7 @@ class HMM(object):
       self.observations = []
       self.verbosity = verbosity
       self.criterion = criterion
+      self.vectorized = vectorized
 
     def reset(self):
       self.observations = []
@@ -153,7 +168,122 @@ class HMM(object):
         print "B: ", self.B
 
 
+    def _forwardBackwardScaled(self, observations):
+      """
+      Scaled forward-backward pass over one observation sequence.
+
+      @param observations (numpy array)
+      The observed categories, one per time step
+
+      @return (tuple)
+      gamma, a (T, numStates) array of P(X_t = i | Y, theta),
+      and epsSum, the (numStates, numStates) sum over t of
+      P(X_t = i, X_t+1 = j | Y, theta). Both are all zeros if the
+      sequence has zero likelihood.
+      """
+      T = len(observations)
+      emissions = self.B[:, observations].T # {e_ti} = P(Y_t = y_t | X_t = i)
+
+      alpha = np.zeros((T, self.numStates), dtype="float")
+      beta = np.ones((T, self.numStates), dtype="float")
+      scales = np.ones(T, dtype="float")
+
+      alpha[0] = self.pi * emissions[0]
+      for t in xrange(T):
+        if t > 0:
+          alpha[t] = alpha[t-1].dot(self.A) * emissions[t]
+        scale = alpha[t].sum()
+        if scale == 0:
+          gamma = np.zeros((T, self.numStates), dtype="float")
+          return gamma, np.zeros((self.numStates, self.numStates), dtype="float")
+        scales[t] = scale
+        alpha[t] /= scale
+
+      weighted = np.zeros((T, self.numStates), dtype="float")
+      for t in xrange(T-1, 0, -1):
+        weighted[t] = emissions[t] * beta[t] / scales[t]
+        beta[t-1] = self.A.dot(weighted[t])
+
+      gamma = alpha * beta
+      gamma = divideArrays(gamma, gamma.sum(axis=1)[:, np.newaxis])
+      epsSum = self.A * alpha[:-1].T.dot(weighted[1:])
+
+      return gamma, epsSum
+
+
+    def _updateBatch(self, sequences):
+      """
+      Vectorized equivalent of `_forward`, `_backward` and `_update`
+      over a batch of observation sequences, pooling the expected
+      counts of all the sequences.
+      """
+      gamma0 = np.zeros(self.numStates, dtype="float")
+      transitionNumers = np.zeros((self.numStates, self.numStates), dtype="float")
+      transitionDenoms = np.zeros(self.numStates, dtype="float")
+      emissionNumers = np.zeros((self.numStates, self.numCats), dtype="float")
+      emissionDenoms = np.zeros(self.numStates, dtype="float")
+      seenValues = np.zeros(self.numCats, dtype="bool")
+
+      for observations in sequences:
+        gamma, epsSum = self._forwardBackwardScaled(observations)
+
+        gamma0 += gamma[0]
+        transitionNumers += epsSum
+        transitionDenoms += gamma[:-1].sum(axis=0)
+
+        indicators = np.zeros((len(observations), self.numCats), dtype="float")
+        indicators[np.arange(len(observations)), observations] = 1.0
+        emissionNumers += gamma.T.dot(indicators)
+        emissionDenoms += gamma.sum(axis=0)
+        seenValues[observations] = True
+
+      self.pi = gamma0 / len(sequences)
+      self.A = divideArrays(transitionNumers, transitionDenoms[:, np.newaxis])
+      self.B[:, seenValues] = divideArrays(emissionNumers[:, seenValues],
+                                           emissionDenoms[:, np.newaxis])
+
+      if self.verbosity > 0:
+        print "A: ", self.A
+        print "B: ", self.B
+
+
+    def trainBatch(self, sequences):
+      """
+      Runs Baum-Welch on several observation sequences at once, pooling
+      their expected counts in each update, until the parameters change
+      by less than the criterion. With a single sequence this gives the
+      same parameters as `train`.
+
+      @param sequences (list)
+      List of observation sequences, each a list of categories
+      """
+      sequences = [np.asarray(observations, dtype="int") for observations in sequences]
+      self.A = np.array(self.A, dtype="float")
+      self.B = np.array(self.B, dtype="float")
+      self.pi = np.array(self.pi, dtype="float")
+
+      while True:
+        startA = self.A
+        startB = self.B.copy()
+        startpi = self.pi
+
+        self._updateBatch(sequences)
+
+        if (np.max(abs(startpi - self.pi)) <= self.criterion and
+            np.max(abs(startA - self.A)) <= self.criterion and
+            np.max(abs(startB - self.B)) <= self.criterion):
+          break
+
+      self.observations = list(sequences[-1])
+      self.T = len(self.observations)
+      self.seenValues = set(self.observations)
+
+
     def train(self, observations):
+      if self.vectorized:
+        self.trainBatch([observations])
+        return
+
       self._initializeTrial(observations)
 
       while True:
@@ -20,6 +20,8 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import multiprocessing
+
 import matplotlib.pyplot as plt
 import numpy
 import scipy.cluster.hierarchy
@@ -63,14 +65,27 @@ class HierarchicalClustering(object):
   """
 
 
-  def __init__(self, knn):
+  def __init__(self, knn, overlapsFile=None, blockSize=None, numProcesses=1):
     """
     Initialization for HierarchicalClustering object.
     
     @param knn (nupic.algorithms.KNNClassifier) Populated instance of KNN
         classifer from which to draw training vectors.
+
+    @param overlapsFile (string) If set, the pairwise overlaps are written to
+        a memory-mapped file at this path instead of being held in memory.
+        Optional.
+
+    @param blockSize (int) Number of rows of the overlap matrix computed at
+        once. Optional, defaults to a size based on the number of vectors.
+
+    @param numProcesses (int) Number of processes computing row blocks of the
+        overlap matrix in parallel. Optional, defaults to 1.
     """
     self._knn = knn
+    self._overlapsFile = overlapsFile
+    self._blockSize = blockSize
+    self._numProcesses = numProcesses
     self._overlaps = None
     self._linkage = None
 
@@ -257,29 +272,34 @@ class HierarchicalClustering(object):
 
   def _populateOverlaps(self):
     sparseDataMatrix = HierarchicalClustering._extractVectorsFromKNN(self._knn)
-    self._overlaps = HierarchicalClustering._computeOverlaps(sparseDataMatrix)
+    self._overlaps = HierarchicalClustering._computeOverlaps(
+      sparseDataMatrix, blockSize=self._blockSize, filename=self._overlapsFile,
+      numProcesses=self._numProcesses)
 
 
   @staticmethod
   def _extractVectorsFromKNN(knn):
     dim = len(knn.getPattern(0, sparseBinaryForm=False))
-    sparseRowList = []
+    indices = []
+    indptr = numpy.zeros(knn._numPatterns + 1, dtype=int)
 
     for i in xrange(knn._numPatterns):
-      nzIndices = knn.getPattern(i, sparseBinaryForm=True)
-      sparseRow = scipy.sparse.csr_matrix(
-        (numpy.ones(len(nzIndices), dtype=bool),
-        (numpy.zeros(len(nzIndices)), nzIndices)),
-        shape=(1,dim))
-      sparseRowList.append(sparseRow)
-    
-    sparseDataMatrix = scipy.sparse.vstack(sparseRowList)
+      nzIndices = numpy.unique(knn.getPattern(i, sparseBinaryForm=True))
+      indices.append(nzIndices)
+      indptr[i+1] = indptr[i] + len(nzIndices)
+
+    indices = (numpy.concatenate(indices).astype(int) if len(indices) > 0
+               else numpy.zeros(0, dtype=int))
+    sparseDataMatrix = scipy.sparse.csr_matrix(
+      (numpy.ones(len(indices), dtype=bool), indices, indptr),
+      shape=(knn._numPatterns, dim))
 
     return sparseDataMatrix
 
 
   @staticmethod
-  def _computeOverlaps(data, selfOverlaps=False, dtype="int16"):
+  def _computeOverlaps(data, selfOverlaps=False, dtype="int16", blockSize=None,
+                       filename=None, numProcesses=1):
     """
     Calculates all pairwise overlaps between the rows of the input. Returns an
     array of all n(n-1)/2 values in the upper triangular portion of the
@@ -294,23 +314,100 @@ class HierarchicalClustering(object):
     
     @param dtype (string) Data type of returned array in numpy dtype format.
         Optional, defaults to 'int16'.
+
+    @param blockSize (int) Number of rows of the overlap matrix computed at
+        once, as one sparse product of the block with the remaining rows.
+        Optional, defaults to a block of about 2^24 overlaps.
+
+    @param filename (string) If set, the overlaps are written to a
+        memory-mapped file at this path, one block at a time. Optional.
+
+    @param numProcesses (int) Number of worker processes computing blocks in
+        parallel. Optional, defaults to 1.
     
     @returns (numpy.ndarray) A vector of pairwise overlaps as described above.
     """
+    data = HierarchicalClustering._binarize(data)
     nVectors = data.shape[0]
-    nDims = data.shape[1]
     nPairs = (nVectors+1)*nVectors/2 if selfOverlaps else (
       nVectors*(nVectors-1)/2)
-    overlaps = numpy.ndarray(nPairs, dtype=dtype)
-    pos = 0
 
-    for i in xrange(nVectors):
-      start = i if selfOverlaps else i+1
-      a = data[i]
-      b = data[start:]
-      newOverlaps = a.multiply(b).getnnz(1)
+    if filename is None:
+      overlaps = numpy.ndarray(nPairs, dtype=dtype)
+    else:
+      mapped = numpy.memmap(filename, dtype=dtype, mode="w+",
+                            shape=(max(nPairs, 1),))
+      overlaps = mapped[:nPairs]
+
+    if blockSize is None:
+      blockSize = max(1, 2**24 / max(nVectors, 1))
+    blocks = [(start, min(start + blockSize, nVectors), selfOverlaps)
+              for start in xrange(0, nVectors, blockSize)]
+
+    if numProcesses > 1 and len(blocks) > 1:
+      pool = multiprocessing.Pool(numProcesses, _initOverlapWorker, (data,))
+      try:
+        blockOverlaps = pool.imap(_computeOverlapBlockWorker, blocks)
+        HierarchicalClustering._writeOverlapBlocks(overlaps, blockOverlaps)
+      finally:
+        pool.close()
+        pool.join()
+    else:
+      blockOverlaps = (HierarchicalClustering._computeOverlapBlock(data, *block)
+                       for block in blocks)
+      HierarchicalClustering._writeOverlapBlocks(overlaps, blockOverlaps)
+
+    if filename is not None:
+      mapped.flush()
+
+    return overlaps
+
+
+  @staticmethod
+  def _binarize(data):
+    """
+    Returns a copy of the CSR matrix with every non-zero value set to 1.
+    """
+    data = scipy.sparse.csr_matrix(data, copy=True)
+    data.eliminate_zeros()
+    data.data = numpy.ones(len(data.data), dtype="int32")
+    return data
+
+
+  @staticmethod
+  def _computeOverlapBlock(data, start, stop, selfOverlaps):
+    """
+    Computes the overlaps of rows start to stop of the binary CSR matrix with
+    all the following rows. Returns them in the same order as the
+    corresponding chunk of the condensed array returned by _computeOverlaps().
+    """
+    block = data[start:stop].dot(data[start:].T).toarray()
+    upper = numpy.triu(numpy.ones(block.shape, dtype=bool),
+                       0 if selfOverlaps else 1)
+    return block[upper]
+
+
+  @staticmethod
+  def _writeOverlapBlocks(overlaps, blockOverlaps):
+    """
+    Copies the condensed overlaps of each row block into place, in order.
+    """
+    pos = 0
+    for newOverlaps in blockOverlaps:
       run = newOverlaps.shape[0]
       overlaps[pos:pos+run] = newOverlaps
       pos += run
-    return overlaps
+
+
+
+_workerData = None
+
+
+def _initOverlapWorker(data):
+  global _workerData
+  _workerData = data
+
+
+def _computeOverlapBlockWorker(block):
+  return HierarchicalClustering._computeOverlapBlock(_workerData, *block)
 
@@ -32,7 +32,7 @@ class LateralPooler(SpatialPooler):
   An experimental spatial pooler implementation
   with learned lateral inhibitory connections.
   """
-  def __init__(self, lateralLearningRate = 1.0, lateralDutyCyclePeriod=None, enforceDesiredWeight=True, **spArgs):
+  def __init__(self, lateralLearningRate = 1.0, lateralDutyCyclePeriod=None, enforceDesiredWeight=True, sparseLateralUpdates=False, **spArgs):
 
 
     super(LateralPooler, self).__init__(**spArgs)
@@ -48,8 +48,8 @@ class LateralPooler(SpatialPooler):
     # The new lateral inhibitory connections
     # and learning rates
     n = self._numColumns
-    self.lateralConnections = np.ones((n,n))/float(n-1)
-    np.fill_diagonal(self.lateralConnections, 0.0)
+    self._lateralConnections = np.ones((n,n))/float(n-1)
+    np.fill_diagonal(self._lateralConnections, 0.0)
     self.lateralLearningRate = lateralLearningRate
     if lateralDutyCyclePeriod == None:
       self.lateralDutyCyclePeriod = self._dutyCyclePeriod
@@ -58,11 +58,96 @@ class LateralPooler(SpatialPooler):
 
     # Varibale to store average pairwise activities
     s = self.sparsity
-    self.avgActivityPairs = np.ones((n,n))*(s**2)
-    np.fill_diagonal(self.avgActivityPairs, s)
+    self._avgActivityPairs = np.ones((n,n))*(s**2)
+    np.fill_diagonal(self._avgActivityPairs, s)
+
+    # If true, the pairwise activities and the lateral connections
+    # are updated lazily, touching only the rows and columns of
+    # the active columns on each learning step
+    self._sparseLateralUpdates = sparseLateralUpdates
+
+    # The average pairwise activities are stored as
+    # `_avgActivityPairsScale * _avgActivityPairs`, so that
+    # their decay doesn't touch the whole matrix. We keep
+    # the row sums (without the diagonal) of the unscaled matrix
+    self._avgActivityPairsScale = 1.0
+    self._avgActivityPairsRowSums = self._avgActivityPairs.sum(axis=1) - s
+
+    # Number of lateral learning steps so far, and for each
+    # row of the lateral connections, the step it is up to date with
+    self._lateralStep = 0
+    self._lateralRowSteps = np.zeros(n, dtype="int64")
+    self._lateralEpsilon = lateralLearningRate
 
     # experimental boosting
     self._beta = 0.0
+
+
+  @property
+  def lateralConnections(self):
+    """
+    The weights of the lateral inhibitory connections.
+    """
+    self._syncLateralConnections()
+    return self._lateralConnections
+
+
+  @lateralConnections.setter
+  def lateralConnections(self, lateralConnections):
+    self._lateralConnections = lateralConnections
+    self._lateralRowSteps.fill(self._lateralStep)
+
+
+  @property
+  def avgActivityPairs(self):
+    """
+    The average pairwise activities of the columns.
+    """
+    self._applyAvgActivityPairsScale()
+    return self._avgActivityPairs
+
+
+  @avgActivityPairs.setter
+  def avgActivityPairs(self, avgActivityPairs):
+    self._avgActivityPairs        = avgActivityPairs
+    self._avgActivityPairsScale   = 1.0
+    self._avgActivityPairsRowSums = (avgActivityPairs.sum(axis=1) - 
+                                     avgActivityPairs.diagonal())
+
+
+  def __setstate__(self, state):
+    """
+    Initialize class properties from stored values. Poolers pickled before 
+    the sparse lateral updates store the lateral connections and pairwise 
+    activities under their public names, and always use the dense updates.
+    """
+    if "lateralConnections" in state:
+      state["_lateralConnections"] = state.pop("lateralConnections")
+    if "avgActivityPairs" in state:
+      state["_avgActivityPairs"] = state.pop("avgActivityPairs")
+
+    P = state["_avgActivityPairs"]
+    n = P.shape[0]
+    state.setdefault("_sparseLateralUpdates", False)
+    state.setdefault("_avgActivityPairsScale", 1.0)
+    state.setdefault("_avgActivityPairsRowSums", P.sum(axis=1) - P.diagonal())
+    state.setdefault("_lateralStep", 0)
+    state.setdefault("_lateralRowSteps", np.zeros(n, dtype="int64"))
+    state.setdefault("_lateralEpsilon", state["lateralLearningRate"])
+
+    super(LateralPooler, self).__setstate__(state)
+
+
+  def _applyAvgActivityPairsScale(self):
+    """
+    Multiplies the pending scale factor into the stored pairwise 
+    activities and their row sums.
+    """
+    if self._avgActivityPairsScale != 1.0:
+      self._avgActivityPairs        *= self._avgActivityPairsScale
+      self._avgActivityPairsRowSums *= self._avgActivityPairsScale
+      self._avgActivityPairsScale    = 1.0
+
     
   def _inhibitColumnsWithLateral(self, overlaps, lateralConnections):
     """
@@ -98,6 +183,87 @@ class LateralPooler(SpatialPooler):
     return activeColumns    
 
 
+  def _inhibitColumnsWithSparseLateral(self, overlaps):
+    """
+    Same as `_inhibitColumnsWithLateral`, but instead of adding 
+    the full row of lateral connections of every winner to the 
+    inhibition signal, the signal of each candidate column is summed 
+    over the winners only.
+    """
+    s = self.sparsity
+    desiredWeight = self.codeWeight
+    sortedIndices = np.argsort(overlaps, kind='mergesort')[::-1]
+
+    winners = []
+    for i in sortedIndices:
+
+      if overlaps[i] < self._stimulusThreshold:
+        break
+
+      inhTooStrong = ( len(winners) > 0 and 
+                       np.sum(self._lateralConnectionsAt(winners, i)) >= s )
+
+      if not inhTooStrong:
+        winners.append(i)
+
+      if self.enforceDesiredWeight and len(winners) == desiredWeight:
+        break
+
+    activeColumns = np.sort(np.array(winners, dtype="int64"))
+
+    return activeColumns
+
+
+  def _lateralConnectionsAt(self, rows, column):
+    """
+    Returns the up to date lateral connections from the given rows 
+    to `column`, without updating the rows themselves.
+    """
+    rows        = np.asarray(rows)
+    connections = self._lateralConnections[rows, column]
+    lag         = self._lateralStep - self._lateralRowSteps[rows]
+    if not np.any(lag):
+      return connections
+
+    decay  = (1.0 - self._lateralEpsilon)**lag
+    target = (self._avgActivityPairs[rows, column] / 
+              self._avgActivityPairsRowSums[rows])
+    return decay*connections + (1 - decay)*target
+
+
+  def _targetLateralConnections(self, rows):
+    """
+    The lateral connections the given rows converge to, i.e. the 
+    normalized average pairwise activities without the diagonal.
+    """
+    target = self._avgActivityPairs[rows]
+    target[np.arange(len(rows)), rows] = 0.0
+    target /= self._avgActivityPairsRowSums[rows].reshape((-1,1))
+    return target
+
+
+  def _syncLateralConnections(self, rows=None):
+    """
+    Brings the given rows (all rows by default) of the lazily 
+    updated lateral connections up to date. A row's target only
+    changes when its column is active, so every step since its 
+    last update moved it towards the same target.
+    """
+    if rows is None:
+      rows = np.where(self._lateralRowSteps < self._lateralStep)[0]
+    else:
+      rows = rows[self._lateralRowSteps[rows] < self._lateralStep]
+
+    if len(rows) == 0:
+      return
+
+    lag   = self._lateralStep - self._lateralRowSteps[rows]
+    decay = ((1.0 - self._lateralEpsilon)**lag).reshape((-1,1))
+    L     = self._lateralConnections
+    L[rows] = decay*L[rows] + (1 - decay)*self._targetLateralConnections(rows)
+    self._lateralRowSteps[rows] = self._lateralStep
+
+
   def _updateAvgActivityPairs(self, activeArray):
     """
     Updates the average firing activity of pairs of 
@@ -109,7 +275,7 @@ class LateralPooler(SpatialPooler):
 
     Q = np.dot(Y, Y.T) 
 
-    self.avgActivityPairs = beta*self.avgActivityPairs + (1-beta)*Q
+    self._avgActivityPairs = beta*self.avgActivityPairs + (1-beta)*Q
 
 
 
@@ -128,6 +294,39 @@ class LateralPooler(SpatialPooler):
     self.lateralConnections[:,:] = (1 - epsilon)*oldL + epsilon*newL
 
 
+  def _updateLateralSparse(self, activeColumns, epsilon):
+    """
+    Same as `_updateAvgActivityPairs` followed by 
+    `_updateLateralConnections`, but only touches the rows and 
+    columns of the active columns: the decay of the pairwise 
+    activities goes into a scale factor, and the lateral connections
+    of the inactive columns are brought up to date lazily.
+    """
+    if epsilon != self._lateralEpsilon:
+      self._syncLateralConnections()
+      self._lateralEpsilon = epsilon
+
+    # The targets of the active rows are about to change
+    self._syncLateralConnections(activeColumns)
+
+    beta = 1.0 - 1.0/self._dutyCyclePeriod
+    self._avgActivityPairsScale *= beta
+    if self._avgActivityPairsScale < 1e-100:
+      self._applyAvgActivityPairsScale()
+
+    P = self._avgActivityPairs
+    P[np.ix_(activeColumns, activeColumns)] += (1-beta)/self._avgActivityPairsScale
+    self._avgActivityPairsRowSums[activeColumns] = (
+      P[activeColumns].sum(axis=1) - P[activeColumns, activeColumns])
+
+    if epsilon > 0:
+      self._lateralStep += 1
+      L = self._lateralConnections
+      L[activeColumns] = ((1 - epsilon)*L[activeColumns] + 
+                          epsilon*self._targetLateralConnections(activeColumns))
+      self._lateralRowSteps[activeColumns] = self._lateralStep
+
+
 
   def compute(self, inputVector, learn, activeArray, applyLateralInhibition=True):
     """
@@ -157,7 +356,9 @@ class LateralPooler(SpatialPooler):
       self._boostedOverlaps = self._overlaps
 
     # Apply inhibition to determine the winning columns
-    if applyLateralInhibition == True:
+    if applyLateralInhibition == True and self._sparseLateralUpdates:
+      activeColumns = self._inhibitColumnsWithSparseLateral(self._boostedOverlaps)
+    elif applyLateralInhibition == True:
       activeColumns = self._inhibitColumnsWithLateral(self._boostedOverlaps, self.lateralConnections)
     else:
       activeColumns = self._inhibitColumns(self._boostedOverlaps)
@@ -169,11 +370,14 @@ class LateralPooler(SpatialPooler):
       self._updateDutyCycles(self._overlaps, activeColumns)
       self._bumpUpWeakColumns()
       self._updateBoostFactors()
-      self._updateAvgActivityPairs(activeArray)
 
       epsilon = self.lateralLearningRate
-      if epsilon > 0:
-        self._updateLateralConnections(epsilon, self.avgActivityPairs)
+      if self._sparseLateralUpdates:
+        self._updateLateralSparse(activeColumns, epsilon)
+      else:
+        self._updateAvgActivityPairs(activeArray)
+        if epsilon > 0:
+          self._updateLateralConnections(epsilon, self.avgActivityPairs)
 
       if self._isUpdateRound():
         self._updateInhibitionRadius()
@@ -187,12 +391,37 @@ class LateralPooler(SpatialPooler):
     This method encodes a batch of input vectors.
     Note the inputs are assumed to be given as the 
     columns of the matrix X (not the rows).
+    The result is the same as calling `compute` without 
+    learning on each column of X, but the overlaps of the 
+    whole batch are computed with a single matrix product.
     """
-    d = X.shape[1]
+    m, d = X.shape
     n = self._numColumns
+    if m != self._numInputs:
+      raise ValueError(
+          "Input vector dimensions don't match. Expecting %s but got %s" % (
+              m, self._numInputs))
+
+    connected = np.zeros((n, m), dtype=realDType)
+    for i in range(n):
+      self.getConnectedSynapses(i, connected[i])
+
+    overlaps = np.dot(connected, np.asarray(X, dtype=realDType))
+
     Y = np.zeros((n,d))
     for t in range(d):
-        self.compute(X[:,t], False, Y[:,t], applyLateralInhibition)
+      if applyLateralInhibition == True and self._sparseLateralUpdates:
+        activeColumns = self._inhibitColumnsWithSparseLateral(overlaps[:,t])
+      elif applyLateralInhibition == True:
+        activeColumns = self._inhibitColumnsWithLateral(overlaps[:,t], self.lateralConnections)
+      else:
+        activeColumns = self._inhibitColumns(overlaps[:,t])
+      Y[activeColumns, t] = 1.0
+
+    self._iterationNum += d
+    if d > 0:
+      self._overlaps        = overlaps[:,-1]
+      self._boostedOverlaps = self._overlaps
         
     return Y
 
@@ -28,6 +28,7 @@ import copy
 import numpy as np
 
 from htmresearch.support import numpy_helpers as np2
+from htmresearch.support.segment_activity import computeSegmentActivity
 from htmresearch.algorithms.multiconnections import Multiconnections
 from nupic.bindings.math import SparseMatrixConnections, Random
 
@@ -75,7 +76,9 @@ class ThresholdedGaussian2DLocationModule(object):
                permanenceDecrement=0.0,
                maxSynapsesPerSegment=-1,
                bumpOverlapMethod="probabilistic",
-               seed=42):
+               seed=42,
+               excitationMethod="exact",
+               excitationTolerance=1e-6):
     """
     Uses hexagonal firing fields.
 
@@ -105,6 +108,22 @@ class ThresholdedGaussian2DLocationModule(object):
 
     @param bumpOverlapMethod ("probabilistic" or "sum")
     Specifies the firing rate of a cell when it's part of two bumps.
+
+    @param excitationMethod ("exact" or "truncated")
+    Specifies how the firing rates are computed from the bumps. "exact"
+    measures the distance from every cell to every bump. "truncated" only
+    visits the cells inside each bump's support, i.e. the cells where that
+    bump's gaussian is at least excitationTolerance. A precomputed
+    neighborhood of cell offsets is placed around each bump, so the cost scales
+    with the size of the bump rather than the size of the module.
+
+    @param excitationTolerance (float)
+    Used with the "truncated" excitationMethod. Each bump ignores cells where
+    its gaussian is below this value, so every firing rate is within
+    (number of bumps * excitationTolerance) of its exact value. The active cells
+    only differ from the "exact" method for cells whose exact firing rate is
+    that close to activeFiringRate, and the learning cells only differ when
+    several cells are tied for the highest firing rate within that margin.
     """
 
     self.cellsPerAxis = cellsPerAxis
@@ -155,6 +174,20 @@ class ThresholdedGaussian2DLocationModule(object):
     # meaningful impact, but it makes visualizations easier to understand.
     self.cellPhases += [[0.5/self.cellsPerAxis], [0.5/self.cellsPerAxis]]
 
+    if excitationMethod not in ("exact", "truncated"):
+      raise ValueError("Unrecognized excitation method", excitationMethod)
+    self.excitationMethod = excitationMethod
+    self.excitationTolerance = excitationTolerance
+
+    # The cell offsets around a bump that can receive excitation above the
+    # tolerance. None if the support wraps around the whole module, in which
+    # case the exact method is used.
+    self.kernelOffsets = None
+    if excitationMethod == "truncated":
+      self.kernelOffsets = (
+        ThresholdedGaussian2DLocationModule.getKernelOffsets(
+          self.cellsPerAxis, self.bumpSigma, excitationTolerance))
+
     self.rng = Random(seed)
 
   def reset(self):
@@ -170,8 +203,15 @@ class ThresholdedGaussian2DLocationModule(object):
 
 
   def _computeActiveCells(self):
-    cellExcitations = ThresholdedGaussian2DLocationModule.getCellExcitations(
-      self.cellPhases, self.bumpPhases, self.bumpSigma, self.bumpOverlapMethod)
+    if self.kernelOffsets is not None:
+      cellExcitations = (
+        ThresholdedGaussian2DLocationModule.getCellExcitationsTruncated(
+          self.cellPhases, self.bumpPhases, self.bumpSigma,
+          self.bumpOverlapMethod, self.cellsPerAxis, self.kernelOffsets))
+    else:
+      cellExcitations = ThresholdedGaussian2DLocationModule.getCellExcitations(
+        self.cellPhases, self.bumpPhases, self.bumpSigma,
+        self.bumpOverlapMethod)
 
     self.activeCells = np.where(cellExcitations >= self.activeFiringRate)[0]
     self.learningCells = np.where(cellExcitations == cellExcitations.max())[0]
@@ -248,11 +288,9 @@ class ThresholdedGaussian2DLocationModule(object):
     @param anchorInput (numpy array)
     A sensory input. This will often come from a feature-location pair layer.
     """
-    overlaps = self.connections.computeActivity(anchorInput,
-                                                self.connectedPermanence)
+    overlaps, potentialOverlaps = computeSegmentActivity(
+      self.connections, anchorInput, self.connectedPermanence)
     activeSegments = np.where(overlaps >= self.activationThreshold)[0]
-
-    potentialOverlaps = self.connections.computeActivity(anchorInput)
     matchingSegments = np.where(potentialOverlaps >=
                                 self.learningThreshold)[0]
 
@@ -404,21 +442,25 @@ class ThresholdedGaussian2DLocationModule(object):
 
 
   @staticmethod
-  def getCellExcitations(cellPhases, bumpPhases, bumpSigma, bumpOverlapMethod):
-    # For each cell, compute the phase displacement from each bump. Create an
-    # array of matrices, one per cell. Each column in a matrix corresponds to
-    # the phase displacement from the bump to the cell.
-    cell_bump_positivePhaseDisplacement = np.mod(
-      cellPhases.T[:, :, np.newaxis] - bumpPhases,
-      1.0)
+  def getPhaseDistances(positivePhaseDisplacement):
+    """
+    Measure the world distance of a set of phase displacements, taking the
+    shortest path around the rhombus.
 
+    @param positivePhaseDisplacement (numpy array)
+    A 3D array of phase displacements, each in the range [0.0, 1.0). The phase
+    components are on the second axis, e.g. organized by cell, phase, then bump.
+
+    @return (numpy array)
+    A 2D array of distances, e.g. organized by cell then bump.
+    """
     # For each cell/bump pair, consider the phase displacement vectors reaching
     # that cell from that bump by moving up-and-right, down-and-right,
     # down-and-left, and up-and-left. Create a 2D array of matrices, arranged by
     # cell then direction. Each column in a matrix corresponds to a phase
     # displacement from the bump to the cell in a particular direction.
     cell_direction_bump_phaseDisplacement = (
-      cell_bump_positivePhaseDisplacement[:, np.newaxis, :, :] -
+      positivePhaseDisplacement[:, np.newaxis, :, :] -
       np.array([[0, 0],
                 [0, 1],
                 [1, 0],
@@ -443,7 +485,20 @@ class ThresholdedGaussian2DLocationModule(object):
 
     # Choose the shortest distance from each cell to each bump. Create a 2D
     # array of distances, organized by cell then bump.
-    cell_bump_distance = np.amin(cell_direction_bump_distance, axis=1)
+    return np.amin(cell_direction_bump_distance, axis=1)
+
+
+  @staticmethod
+  def getCellExcitations(cellPhases, bumpPhases, bumpSigma, bumpOverlapMethod):
+    # For each cell, compute the phase displacement from each bump. Create an
+    # array of matrices, one per cell. Each column in a matrix corresponds to
+    # the phase displacement from the bump to the cell.
+    cell_bump_positivePhaseDisplacement = np.mod(
+      cellPhases.T[:, :, np.newaxis] - bumpPhases,
+      1.0)
+
+    cell_bump_distance = ThresholdedGaussian2DLocationModule.getPhaseDistances(
+      cell_bump_positivePhaseDisplacement)
 
     # Compute the gaussian of each of these distances.
     cellExcitationsFromBumps = ThresholdedGaussian2DLocationModule.gaussian(
@@ -480,6 +535,102 @@ class ThresholdedGaussian2DLocationModule(object):
     return cellExcitations
 
 
+  @staticmethod
+  def getKernelOffsets(cellsPerAxis, bumpSigma, tolerance):
+    """
+    Find the cell offsets around a bump that can have an excitation of at least
+    'tolerance'. Cell (i, j) sits at grid coordinate (i, j). A bump at grid
+    coordinate g is placed at cell floor(g), and every cell that's within the
+    bump's support is at one of these offsets from that cell.
+
+    @return (numpy array or None)
+    A 2 x numOffsets array of grid offsets, or None if the support would wrap
+    around the module, i.e. if every cell needs to be visited anyway.
+    """
+    # World distance (in rhombus edges) beyond which the gaussian is below the
+    # tolerance, converted to grid units.
+    radius = bumpSigma * math.sqrt(2 * math.log(1. / tolerance))
+    gridRadius = radius * cellsPerAxis
+
+    # The bump can be anywhere inside the cell at offset (0, 0), so measure from
+    # the middle of that cell and pad by half of the rhombus' long diagonal.
+    searchRadius = gridRadius + math.sqrt(3) / 2.
+
+    # Along each phase axis, a world distance of d spans at most d / sin(60)
+    # grid units.
+    maxOffset = int(math.ceil(searchRadius / math.sin(np.radians(60.)) + 0.5))
+    if 2*maxOffset + 2 > cellsPerAxis:
+      return None
+
+    offsetsAxis = np.arange(-maxOffset, maxOffset + 2)
+    offsets = np.array([np.repeat(offsetsAxis, len(offsetsAxis)),
+                        np.tile(offsetsAxis, len(offsetsAxis))])
+
+    B = np.array([[np.cos(np.radians(0.)), np.cos(np.radians(60.))],
+                  [np.sin(np.radians(0.)), np.sin(np.radians(60.))]])
+    distances = np.linalg.norm(np.dot(B, offsets - 0.5), axis=0)
+    offsets = offsets[:, distances <= searchRadius]
+
+    if (offsets.max(axis=1) - offsets.min(axis=1) >= cellsPerAxis).any():
+      return None
+
+    return offsets
+
+
+  @staticmethod
+  def getCellExcitationsTruncated(cellPhases, bumpPhases, bumpSigma,
+                                  bumpOverlapMethod, cellsPerAxis,
+                                  kernelOffsets):
+    """
+    Like getCellExcitations, but only measures the cells at kernelOffsets from
+    each bump. Every other cell is treated as receiving no excitation from that
+    bump.
+
+    @param kernelOffsets (numpy array)
+    The output of getKernelOffsets.
+    """
+    numCells = cellPhases.shape[1]
+
+    # Find the cells around each bump. Create a 2D array of cells, organized by
+    # bump then offset.
+    bumpCoordinates = np.floor(bumpPhases * cellsPerAxis - 0.5).astype("int")
+    cellCoordinates = np.mod(
+      bumpCoordinates[:, :, np.newaxis] + kernelOffsets[:, np.newaxis, :],
+      cellsPerAxis)
+    bump_offset_cell = (cellCoordinates[0] * cellsPerAxis +
+                        cellCoordinates[1])
+
+    # Organized by bump, phase, then offset.
+    bump_offset_positivePhaseDisplacement = np.mod(
+      cellPhases[:, bump_offset_cell].transpose(1, 0, 2) -
+      bumpPhases.T[:, :, np.newaxis],
+      1.0)
+
+    bump_offset_distance = (
+      ThresholdedGaussian2DLocationModule.getPhaseDistances(
+        bump_offset_positivePhaseDisplacement))
+
+    excitationsFromBumps = ThresholdedGaussian2DLocationModule.gaussian(
+      bumpSigma, bump_offset_distance)
+
+    # Combine bumps, as in getCellExcitations. Cells appear at most once per
+    # bump, so scattering over the flattened arrays visits each cell/bump pair
+    # once.
+    if bumpOverlapMethod == "probabilistic":
+      cellNonExcitations = np.ones(numCells, dtype="float")
+      np.multiply.at(cellNonExcitations, bump_offset_cell.ravel(),
+                     1. - excitationsFromBumps.ravel())
+      cellExcitations = 1. - cellNonExcitations
+    elif bumpOverlapMethod == "sum":
+      cellExcitations = np.bincount(bump_offset_cell.ravel(),
+                                    weights=excitationsFromBumps.ravel(),
+                                    minlength=numCells)
+    else:
+      raise ValueError("Unrecognized bump overlap strategy", bumpOverlapMethod)
+
+    return cellExcitations
+
+
 
 class Superficial2DLocationModule(object):
   """
@@ -759,11 +910,9 @@ class Superficial2DLocationModule(object):
     @param anchorInput (numpy array)
     A sensory input. This will often come from a feature-location pair layer.
     """
-    overlaps = self.connections.computeActivity(anchorInput,
-                                                self.connectedPermanence)
+    overlaps, potentialOverlaps = computeSegmentActivity(
+      self.connections, anchorInput, self.connectedPermanence)
     activeSegments = np.where(overlaps >= self.activationThreshold)[0]
-
-    potentialOverlaps = self.connections.computeActivity(anchorInput)
     matchingSegments = np.where(potentialOverlaps >=
                                 self.learningThreshold)[0]
 
@@ -1196,12 +1345,10 @@ class SensorToSpecificObjectModule(object):
     A sensory input. This will often come from a feature-location pair layer.
     """
 
-    overlaps = self.anchorConnections.computeActivity(
-      anchorInput, self.connectedPermanence)
+    overlaps, potentialOverlaps = computeSegmentActivity(
+      self.anchorConnections, anchorInput, self.connectedPermanence)
 
     activeSegments = np.where(overlaps >= self.activationThreshold)[0]
-
-    potentialOverlaps = self.anchorConnections.computeActivity(anchorInput)
     matchingSegments = np.where(potentialOverlaps >=
                                 self.learningThreshold)[0]
 
@@ -20,7 +20,6 @@
 # ----------------------------------------------------------------------
 
 import random
-import copy
 import numpy
 from nupic.bindings.algorithms import SpatialPooler
 # Uncomment below line to use python SP
@@ -61,6 +60,7 @@ class UnionTemporalPooler(SpatialPooler):
                synPermPreviousPredActiveInc=0.0,
                historyLength=0,
                minHistory=0,
+               batchedPermanenceUpdates=False,
                **kwargs):
     """
     Please see spatial_pooler.py in NuPIC for super class parameter
@@ -93,6 +93,13 @@ class UnionTemporalPooler(SpatialPooler):
 
     @param minHistory don't perform union (output all zeros) until buffer
     length >= minHistory
+
+    @param batchedPermanenceUpdates: If True, the permanence updates of a
+        learning step (the spatial pooler rule, the union SDR reinforcement
+        and the reinforcement of previously predicted inputs) are merged into
+        a single update per column. Permanences are then trimmed and clipped
+        once per step instead of once per update, so the learned permanences
+        can differ slightly from the sequential updates.
     """
 
     super(UnionTemporalPooler, self).__init__(**kwargs)
@@ -108,6 +115,7 @@ class UnionTemporalPooler(SpatialPooler):
 
     self._historyLength = historyLength
     self._minHistory = minHistory
+    self._batchedPermanenceUpdates = batchedPermanenceUpdates
 
     # initialize excite/decay functions
     if exciteFunctionType == 'Fixed':
@@ -153,8 +161,20 @@ class UnionTemporalPooler(SpatialPooler):
     self._poolingActivationlowerBound = 0.1
 
     self._preActiveInput = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
-    # predicted inputs from the last n steps
+    # predicted inputs from the last n steps, stored as a ring buffer. Use
+    # _historySlot to find the column holding the input from a given step.
     self._prePredictedActiveInput = numpy.zeros((self.getNumInputs(), self._historyLength), dtype=REAL_DTYPE)
+    self._historyHead = 0
+    # number of the last n steps in which each input was predicted active
+    self._prePredictedActiveCount = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
+
+    # preallocated buffers used during learning
+    self._inputMask = numpy.zeros(self.getNumInputs(), dtype="bool")
+    self._permChanges = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
+    self._unionPermChanges = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
+    self._combinedPermChanges = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
+    self._permanence = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
+    self._potential = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
 
 
   def reset(self):
@@ -167,8 +187,10 @@ class UnionTemporalPooler(SpatialPooler):
     self._unionSDR = numpy.array([], dtype=UINT_DTYPE)
     self._poolingTimer = numpy.ones(self.getNumColumns(), dtype=REAL_DTYPE) * 1000
     self._poolingActivationInitLevel = numpy.zeros(self.getNumColumns(), dtype=REAL_DTYPE)
-    self._preActiveInput = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
-    self._prePredictedActiveInput = numpy.zeros((self.getNumInputs(), self._historyLength), dtype=REAL_DTYPE)
+    self._preActiveInput.fill(0)
+    self._prePredictedActiveInput.fill(0)
+    self._historyHead = 0
+    self._prePredictedActiveCount.fill(0)
 
     # Reset Spatial Pooler fields
     self.setOverlapDutyCycles(numpy.zeros(self.getNumColumns(), dtype=REAL_DTYPE))
@@ -214,7 +236,9 @@ class UnionTemporalPooler(SpatialPooler):
     # update union SDR
     self._getMostActiveCells()
 
-    if learn:
+    if learn and self._batchedPermanenceUpdates:
+      self._adaptSynapsesBatched(predictedActiveInput, activeCells)
+    elif learn:
       # adapt permanence of connections from predicted active inputs to newly active cell
       # This step is the spatial pooler learning rule, applied only to the predictedActiveInput
       # Todo: should we also include unpredicted active input in this step?
@@ -227,8 +251,9 @@ class UnionTemporalPooler(SpatialPooler):
       # adapt permenence of connections from previously predicted inputs to newly active cells
       # This is a reinforcement learning rule that considers previous input to the current cell
       for i in xrange(self._historyLength):
-        self._adaptSynapses(self._prePredictedActiveInput[:,i], activeCells, self._synPermPreviousPredActiveInc, 0.0)
+        self._adaptSynapses(self._prePredictedActiveInput[:,self._historySlot(i)], activeCells, self._synPermPreviousPredActiveInc, 0.0)
 
+    if learn:
       # Homeostasis learning inherited from the spatial pooler
       self._updateDutyCycles(totalOverlap.astype(UINT_DTYPE), activeCells)
       self._bumpUpWeakColumns()
@@ -238,14 +263,28 @@ class UnionTemporalPooler(SpatialPooler):
         self._updateMinDutyCycles()
 
     # save inputs from the previous time step
-    self._preActiveInput = copy.copy(activeInput)
-    self._prePredictedActiveInput = numpy.roll(self._prePredictedActiveInput,1,1)
+    self._preActiveInput[:] = activeInput
     if self._historyLength > 0:
-      self._prePredictedActiveInput[:, 0] = predictedActiveInput
+      # overwrite the oldest input in the ring buffer
+      self._historyHead = (self._historyHead - 1) % self._historyLength
+      oldest = self._prePredictedActiveInput[:, self._historyHead]
+      numpy.greater(oldest, 0, out=self._inputMask)
+      self._prePredictedActiveCount[self._inputMask] -= 1
+      oldest[:] = predictedActiveInput
+      numpy.greater(oldest, 0, out=self._inputMask)
+      self._prePredictedActiveCount[self._inputMask] += 1
 
     return self._unionSDR
 
 
+  def _historySlot(self, age):
+    """
+    Returns the column of _prePredictedActiveInput holding the predicted active
+    input from 'age' + 1 steps ago.
+    """
+    return (self._historyHead + age) % self._historyLength
+
+
   def _decayPoolingActivation(self):
     """
     Decrements pooling activation of all cells
@@ -328,13 +367,62 @@ class UnionTemporalPooler(SpatialPooler):
     @param synPermInactiveDec:
                     Permanence decrement for inactive inputs
     """
-    inputIndices = numpy.where(inputVector > 0)[0]
-    permChanges = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
+    permChanges = self._permChanges
     permChanges.fill(-1 * synPermInactiveDec)
-    permChanges[inputIndices] = synPermActiveInc
-    perm = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
-    potential = numpy.zeros(self.getNumInputs(), dtype=REAL_DTYPE)
-    for i in activeColumns:
+    numpy.greater(inputVector, 0, out=self._inputMask)
+    permChanges[self._inputMask] = synPermActiveInc
+    self._applyPermanenceChanges(activeColumns, permChanges)
+
+
+  def _adaptSynapsesBatched(self, predictedActiveInput, activeColumns):
+    """
+    Applies all of the learning rules of a compute step with a single
+    permanence update per column. The newly active columns get the spatial
+    pooler rule on the predicted active input plus the reinforcement of every
+    input that was predicted active in the history, and the union SDR columns
+    get the Hebbian reinforcement of the predicted active input.
+
+    Parameters:
+    ----------------------------
+    @param predictedActiveInput:
+                    A numpy array of 0's and 1's that comprises the correctly
+                    predicted input to the union pooler
+    @param activeColumns:
+                    An array containing the indices of the columns that
+                    survived inhibition.
+    """
+    numpy.greater(predictedActiveInput, 0, out=self._inputMask)
+
+    activeChanges = self._permChanges
+    activeChanges.fill(-1 * self.getSynPermInactiveDec())
+    activeChanges[self._inputMask] = self.getSynPermActiveInc()
+    if self._historyLength > 0:
+      numpy.multiply(self._prePredictedActiveCount,
+                     self._synPermPreviousPredActiveInc,
+                     out=self._combinedPermChanges)
+      activeChanges += self._combinedPermChanges
+
+    unionChanges = self._unionPermChanges
+    unionChanges.fill(0)
+    unionChanges[self._inputMask] = self._synPermPredActiveInc
+    numpy.add(activeChanges, unionChanges, out=self._combinedPermChanges)
+
+    isUnion = numpy.in1d(activeColumns, self._unionSDR)
+    self._applyPermanenceChanges(activeColumns[~isUnion], activeChanges)
+    self._applyPermanenceChanges(activeColumns[isUnion],
+                                 self._combinedPermChanges)
+    self._applyPermanenceChanges(
+      numpy.setdiff1d(self._unionSDR, activeColumns), unionChanges)
+
+
+  def _applyPermanenceChanges(self, columns, permChanges):
+    """
+    Adds permChanges to the permanences of the potential synapses of each of
+    the given columns.
+    """
+    perm = self._permanence
+    potential = self._potential
+    for i in columns:
       self.getPermanence(i, perm)
       self.getPotential(i, potential)
       maskPotential = numpy.where(potential > 0)[0]
@@ -20,7 +20,6 @@
 # ----------------------------------------------------------------------
 
 import numpy as np
-from collections import deque
 import matplotlib.pyplot as plt
 import copy
 import os
@@ -51,8 +50,26 @@ def defaultSTDPKernel(preSynActivation,
   :return: A matrix of synapse weight changes.
   """
 
+  preSynActivation *= defaultSTDPKernelWeight(dt, inhibitoryPresyn,
+                                               inhibitoryPostsyn)
+
+  updates = np.outer(preSynActivation, postSynActivation)
+
+  return updates
+
+
+def defaultSTDPKernelWeight(dt,
+                            inhibitoryPresyn=False,
+                            inhibitoryPostsyn=False):
+  """
+  The factor by which defaultSTDPKernel scales the outer product of the
+  pre- and post-synaptic activations.
+  :param dt: the difference in time between the two (in seconds), positive if
+          after and negative if before.  Can be an array of time differences.
+  :return: The kernel weight for each time difference.
+  """
+  dt = np.asarray(dt, dtype="float")
   stdpScaler = 1
-  stdpTimeScaler = 1.
 
   # Set up STDP directions
   if inhibitoryPresyn and not inhibitoryPostsyn:
@@ -65,27 +82,35 @@ def defaultSTDPKernel(preSynActivation,
     # I-I, Hebbian (strengthening inhibitory connections)
     stdpScaler *= -1
 
-  # Set up parameters
-  if dt < 0 and not inhibitoryPresyn:
-    # Anti-causal
-    stdpScaler *= 1
-    stdpTimeScaler *= 3
-  elif dt > 0 and not inhibitoryPresyn:
-    stdpScaler *= 1.2
-    stdpTimeScaler *= 4
-  elif dt > 0 and inhibitoryPresyn:
-    stdpScaler *= .5
-    stdpTimeScaler *= 4
-  elif dt < 0 and inhibitoryPresyn:
-    stdpScaler *= 1
-    stdpTimeScaler *= 2
+  # Set up parameters.  Anti-causal (dt < 0) and causal (dt > 0) updates have
+  # their own scales; at dt == 0 the weight is 0.
+  if not inhibitoryPresyn:
+    stdpScaler = np.where(dt > 0, 1.2, 1.) * stdpScaler
+    stdpTimeScaler = np.where(dt > 0, 4., 3.)
+  else:
+    stdpScaler = np.where(dt > 0, .5, 1.) * stdpScaler
+    stdpTimeScaler = np.where(dt > 0, 4., 2.)
 
   timeFactor = np.exp(-1*np.abs(dt)/(SDTP_TIME_CONSTANT*stdpTimeScaler))
-  preSynActivation *= timeFactor*np.sign(dt)*stdpScaler
+  return timeFactor*np.sign(dt)*stdpScaler
 
-  updates = np.outer(preSynActivation, postSynActivation)
 
-  return updates
+def _weightProperty(name):
+  """
+  Returns a property for the weight matrix stored in the attribute "_" + name.
+  Assigning to it, including augmented assignments such as +=, marks the
+  cached Dale's-law weights as stale.
+  """
+  attribute = "_" + name
+
+  def getWeights(self):
+    return getattr(self, attribute)
+
+  def setWeights(self, weights):
+    setattr(self, attribute, weights)
+    self.weightsChanged()
+
+  return property(getWeights, setWeights)
 
 
 """
@@ -103,6 +128,13 @@ inhibition.
 
 
 class CAN1DNetwork(object):
+
+  weightsII = _weightProperty("weightsII")
+  weightsELI = _weightProperty("weightsELI")
+  weightsERI = _weightProperty("weightsERI")
+  weightsIEL = _weightProperty("weightsIEL")
+  weightsIER = _weightProperty("weightsIER")
+
   def __init__(self,
                numExcitatory,
                numInhibitory,
@@ -115,6 +147,8 @@ class CAN1DNetwork(object):
                placeGainI=50,
                sigmaLoc=0.01,
                stdpKernel=defaultSTDPKernel,
+               stdpKernelWeight=None,
+               stdpCutoff=None,
                globalTonicMagnitude=0,
                constantTonicMagnitude=0,
                learnFactorII=7,
@@ -142,6 +176,14 @@ class CAN1DNetwork(object):
     :param sigmaLoc: Multiplier scaling width of place code bump.
     :param stdpKernel: The STDP kernel to be used.  See the function
             defaultSTDPKernel for an example.
+    :param stdpKernelWeight: For kernels that scale the outer product of the
+            activations by a factor depending only on the time difference,
+            a function returning that factor for an array of time differences.
+            See defaultSTDPKernelWeight, which is used with the default kernel.
+            When available, STDP updates are computed with a few batched
+            matrix products instead of one kernel call per buffered step.
+    :param stdpCutoff: If set, buffered activations more than this many
+            seconds apart from the current ones are ignored by STDP.
     :param globalTonicMagnitude: The magnitude of the global tonic input
             during training.
     :param constantTonicMagnitude: The magnitude of the non-velocity-dependent
@@ -157,6 +199,12 @@ class CAN1DNetwork(object):
     :param plotting: Whether or not to generate plots.  False speeds training.
 
     """
+    # Recurrent weights stacked by target population, as used by update().
+    # They are rebuilt from the weight matrices only when those have changed.
+    self._weightsToI = None
+    self._weightsToE = None
+    self._stackedWeightsDale = None
+
     # Synapse weights.  We assume dense connections.
     # Inhibitory neuron recurrent weights.
     self.weightsII = np.random.random_sample((numInhibitory, numInhibitory))* \
@@ -199,8 +247,21 @@ class CAN1DNetwork(object):
 
     self.stdpWindow = stdpWindow
     self.stdpKernel = stdpKernel
-
-    self.activationBuffer = deque(maxlen=int(self.stdpWindow))
+    if stdpKernelWeight is None and stdpKernel is defaultSTDPKernel:
+      stdpKernelWeight = defaultSTDPKernelWeight
+    self.stdpKernelWeight = stdpKernelWeight
+    self.stdpCutoff = stdpCutoff
+
+    # Buffer of the last stdpWindow instantaneous activations, stacked as
+    # time x cells arrays.  Rows are used as a ring buffer, starting at
+    # _bufferStart.
+    bufferLength = int(self.stdpWindow)
+    self._bufferI = np.zeros((bufferLength, numInhibitory))
+    self._bufferEL = np.zeros((bufferLength, numExcitatory))
+    self._bufferER = np.zeros((bufferLength, numExcitatory))
+    self._bufferTimes = np.zeros(bufferLength)
+    self._bufferStart = 0
+    self._bufferSize = 0
 
     self.globalTonicMagnitude = globalTonicMagnitude
     self.constantTonicMagnitude = constantTonicMagnitude
@@ -462,26 +523,21 @@ class CAN1DNetwork(object):
     self.instantaneousEL += feedforwardInputE
     self.instantaneousER += feedforwardInputE
 
-    if enforceDale:
-      weightsII =  np.minimum(self.weightsII, 0)
-      weightsIER = np.minimum(self.weightsIER, 0)
-      weightsIEL = np.minimum(self.weightsIEL, 0)
-      weightsELI = np.maximum(self.weightsELI, 0)
-      weightsERI = np.maximum(self.weightsERI, 0)
-    else:
-      weightsII =  self.weightsII
-      weightsIER = self.weightsIER
-      weightsIEL = self.weightsIEL
-      weightsELI = self.weightsELI
-      weightsERI = self.weightsERI
-
     if recurrent:
-      self.instantaneousI += (np.matmul(self.activationsEL, weightsELI) +\
-                np.matmul(self.activationsER, weightsERI) +\
-                np.matmul(self.activationsI, weightsII))
+      # One product for all the input onto the inhibitory cells, and one for
+      # all the input from them.
+      self._updateStackedWeights(enforceDale)
+      numExcitatory = self.activationsEL.shape[0]
+
+      self._activationsToI[:numExcitatory] = self.activationsEL
+      self._activationsToI[numExcitatory:2*numExcitatory] = self.activationsER
+      self._activationsToI[2*numExcitatory:] = self.activationsI
+      np.dot(self._activationsToI, self._weightsToI, out=self._recurrentI)
+      np.dot(self._activationsFromI(), self._weightsToE, out=self._recurrentE)
 
-      self.instantaneousEL += np.matmul(self.activationsI, weightsIEL)
-      self.instantaneousER += np.matmul(self.activationsI, weightsIER)
+      self.instantaneousI += self._recurrentI
+      self.instantaneousEL += self._recurrentE[:numExcitatory]
+      self.instantaneousER += self._recurrentE[numExcitatory:]
 
     self.instantaneousEL *= max((1 - self.velocityGain*v), 0)
     self.instantaneousER *= max((1 + self.velocityGain*v), 0)
@@ -513,6 +569,70 @@ class CAN1DNetwork(object):
     np.minimum(self.activationsER, self.clip, self.activationsER)
 
 
+  def weightsChanged(self):
+    """
+    Marks the cached weights used by update() as stale.  Assigning to one of
+    the weight attributes does this automatically; call it after modifying a
+    weight matrix in place through other means, e.g. weightsII[:] = ...
+    """
+    self._stackedWeightsDale = None
+
+
+  def _updateStackedWeights(self, enforceDale):
+    """
+    Rebuilds the stacked recurrent weights if the weights or enforceDale
+    changed since they were last built.  _weightsToI holds the weights from
+    [EL, ER, I] onto the inhibitory cells, _weightsToE the weights from the
+    inhibitory cells onto [EL, ER].  With enforceDale, each block is clipped
+    to the sign of its presynaptic population.
+    """
+    if self._stackedWeightsDale is not None and \
+        self._stackedWeightsDale == enforceDale:
+      return
+
+    numExcitatory, numInhibitory = self._weightsELI.shape
+    if self._weightsToI is None or \
+        self._weightsToI.shape != (2*numExcitatory + numInhibitory,
+                                   numInhibitory):
+      self._weightsToI = np.empty((2*numExcitatory + numInhibitory,
+                                   numInhibitory))
+      self._weightsToE = np.empty((numInhibitory, 2*numExcitatory))
+      self._activationsToI = np.empty(2*numExcitatory + numInhibitory)
+      self._recurrentI = np.empty(numInhibitory)
+      self._recurrentE = np.empty(2*numExcitatory)
+
+    toELI = self._weightsToI[:numExcitatory]
+    toERI = self._weightsToI[numExcitatory:2*numExcitatory]
+    toII = self._weightsToI[2*numExcitatory:]
+    toIEL = self._weightsToE[:, :numExcitatory]
+    toIER = self._weightsToE[:, numExcitatory:]
+
+    if enforceDale:
+      np.maximum(self._weightsELI, 0, toELI)
+      np.maximum(self._weightsERI, 0, toERI)
+      np.minimum(self._weightsII, 0, toII)
+      np.minimum(self._weightsIEL, 0, toIEL)
+      np.minimum(self._weightsIER, 0, toIER)
+    else:
+      toELI[:] = self._weightsELI
+      toERI[:] = self._weightsERI
+      toII[:] = self._weightsII
+      toIEL[:] = self._weightsIEL
+      toIER[:] = self._weightsIER
+
+    self._stackedWeightsDale = enforceDale
+
+
+  def _activationsFromI(self):
+    """
+    Returns the inhibitory activations as float64, the type np.dot needs to
+    write into the preallocated buffers.
+    """
+    if self.activationsI.dtype == np.float64:
+      return self.activationsI
+    return self.activationsI.astype(np.float64)
+
+
   def decayWeights(self, decayConst=60):
     """
     Decay the network's weights.
@@ -639,6 +759,7 @@ class CAN1DNetwork(object):
     np.minimum(self.weightsIEL, 0, self.weightsIEL)
     np.maximum(self.weightsELI, 0, self.weightsELI)
     np.maximum(self.weightsERI, 0, self.weightsERI)
+    self.weightsChanged()
 
 
   def normalize_weights(self, IIMax, IEMax, EIMax):
@@ -655,6 +776,7 @@ class CAN1DNetwork(object):
       maximum = np.amax(np.abs(w))
       w /= maximum
       w *= n
+    self.weightsChanged()
 
 
   def computeEnvelope(self, placeCode):
@@ -721,105 +843,277 @@ class CAN1DNetwork(object):
             This should be done at the end of training.
     """
     if clearBuffer:
-      while len(self.activationBuffer) > 1:
-        baseI, baseEL, baseER, t = self.activationBuffer.popleft()
-        for (I, EL, ER, i) in self.activationBuffer:
-          t = 1. * (i - t) * self.dt
-          self.weightsII += self.stdpKernel(self.learningRate *\
-                                            self.learnFactorII *\
-                                            self.dt *\
-                                            baseI, I, t,
-                                            True, True)
-
-          self.weightsIEL += self.stdpKernel(self.learningRate *\
-                                             self.learnFactorIE *\
-                                             self.dt *\
-                                             baseI, EL, t,
-                                             True, False)
-
-          self.weightsIER += self.stdpKernel(self.learningRate *\
-                                             self.learnFactorIE *\
-                                             self.dt *\
-                                             baseI, ER, t,
-                                             True, False)
-
-          self.weightsELI += self.stdpKernel(self.learningRate *\
-                                             self.learnFactorEI *\
-                                             self.dt *\
-                                             baseEL, I, t,
-                                             False, True)
-
-          self.weightsERI += self.stdpKernel(self.learningRate *\
-                                             self.learnFactorEI *\
-                                             self.dt *\
-                                             baseER, I, t,
-                                             False, True)
+      if self.stdpKernelWeight is not None:
+        self._clearBufferBatched()
+      else:
+        self._clearBufferWithKernel()
+      return
 
+    if self.stdpKernelWeight is not None:
+      self._stdpUpdateBatched(time)
     else:
-      for I, EL, ER, i in reversed(self.activationBuffer):
-        t = (i - time) * self.dt
-        self.weightsII +=  self.stdpKernel(self.learningRate *\
-                                           self.learnFactorII *\
-                                           self.dt *\
-                                           self.instantaneousI, I, t,
-                                           True, True)
+      self._stdpUpdateWithKernel(time)
 
-        self.weightsIEL += self.stdpKernel(self.learningRate *\
-                                           self.learnFactorIE *\
-                                           self.dt *\
-                                           self.instantaneousI, EL, t,
-                                           True, False)
+    self._appendToBuffer(time)
 
-        self.weightsIER += self.stdpKernel(self.learningRate *\
-                                           self.learnFactorIE *\
-                                           self.dt *\
-                                           self.instantaneousI, ER, t,
-                                           True, False)
 
-        self.weightsELI += self.stdpKernel(self.learningRate *\
-                                           self.learnFactorEI *\
-                                           self.dt *\
-                                           self.instantaneousEL, I, t,
-                                           False, True)
+  def _getBuffer(self):
+    """
+    Returns the buffered inhibitory, left and right excitatory activations as
+    time x cells arrays, along with their times, oldest first.
+    """
+    rows = (self._bufferStart + np.arange(self._bufferSize)) % \
+           len(self._bufferTimes)
+    return (self._bufferI[rows], self._bufferEL[rows], self._bufferER[rows],
+            self._bufferTimes[rows])
 
-        self.weightsERI += self.stdpKernel(self.learningRate *\
-                                           self.learnFactorEI *\
-                                           self.dt *\
-                                           self.instantaneousER, I, t,
-                                           False, True)
 
-      for I, EL, ER, i in self.activationBuffer:
-        t = (time - i) * self.dt
-        self.weightsII +=  self.stdpKernel(self.learningRate *\
-                                           self.learnFactorII *\
-                                           self.dt *\
-                                           I, self.instantaneousI, t,
-                                           True, True)
+  def _appendToBuffer(self, time):
+    """
+    Adds the current instantaneous activations to the buffer, dropping the
+    oldest ones if it is full.
+    """
+    bufferLength = len(self._bufferTimes)
+    if bufferLength == 0:
+      return
+
+    if self._bufferSize < bufferLength:
+      row = (self._bufferStart + self._bufferSize) % bufferLength
+      self._bufferSize += 1
+    else:
+      row = self._bufferStart
+      self._bufferStart = (self._bufferStart + 1) % bufferLength
+
+    self._bufferI[row] = self.instantaneousI
+    self._bufferEL[row] = self.instantaneousEL
+    self._bufferER[row] = self.instantaneousER
+    self._bufferTimes[row] = time
+
+
+  def _keepLastBuffered(self):
+    """
+    Empties the buffer, except for its most recent activations.
+    """
+    if self._bufferSize > 1:
+      self._bufferStart = (self._bufferStart + self._bufferSize - 1) % \
+                          len(self._bufferTimes)
+      self._bufferSize = 1
+
+
+  def _kernelWeights(self, lags, inhibitoryPresyn, inhibitoryPostsyn):
+    """
+    Returns the kernel weights for the given time differences, set to zero
+    beyond stdpCutoff.
+    """
+    weights = self.stdpKernelWeight(lags, inhibitoryPresyn, inhibitoryPostsyn)
+    if self.stdpCutoff is not None:
+      weights = np.where(np.abs(lags) <= self.stdpCutoff, weights, 0.)
+    return weights
+
+
+  def _stdpUpdateBatched(self, time):
+    """
+    STDP update between the current activations and each buffered one, for
+    kernels given by stdpKernelWeight.  Since the kernel scales the outer
+    product of the activations, the buffered activations are first summed
+    with their kernel weights, leaving one outer product per direction, which
+    are added to each weight matrix with a single product.
+    """
+    I, EL, ER, times = self._getBuffer()
+    if len(times) == 0:
+      return
+
+    # Current activations are presynaptic, buffered ones postsynaptic
+    lags = (times - time) * self.dt
+    postII = self._kernelWeights(lags, True, True).dot(I)
+    weightsIE = self._kernelWeights(lags, True, False)
+    postIEL = weightsIE.dot(EL)
+    postIER = weightsIE.dot(ER)
+    postEI = self._kernelWeights(lags, False, True).dot(I)
+
+    # Buffered activations are presynaptic, current ones postsynaptic
+    lags = (time - times) * self.dt
+    preII = self._kernelWeights(lags, True, True).dot(I)
+    preIE = self._kernelWeights(lags, True, False).dot(I)
+    weightsEI = self._kernelWeights(lags, False, True)
+    preEL = weightsEI.dot(EL)
+    preER = weightsEI.dot(ER)
+
+    learnII = self.learningRate * self.learnFactorII * self.dt
+    learnIE = self.learningRate * self.learnFactorIE * self.dt
+    learnEI = self.learningRate * self.learnFactorEI * self.dt
+
+    def pairUpdate(rate, pre1, post1, pre2, post2):
+      return np.dot(np.column_stack((rate * pre1, rate * pre2)),
+                    np.vstack((post1, post2)))
+
+    self.weightsII += pairUpdate(learnII, self.instantaneousI, postII,
+                                 preII, self.instantaneousI)
+    self.weightsIEL += pairUpdate(learnIE, self.instantaneousI, postIEL,
+                                  preIE, self.instantaneousEL)
+    self.weightsIER += pairUpdate(learnIE, self.instantaneousI, postIER,
+                                  preIE, self.instantaneousER)
+    self.weightsELI += pairUpdate(learnEI, self.instantaneousEL, postEI,
+                                  preEL, self.instantaneousI)
+    self.weightsERI += pairUpdate(learnEI, self.instantaneousER, postEI,
+                                  preER, self.instantaneousI)
+
+
+  def _clearBufferBatched(self):
+    """
+    STDP update between every buffered activation and the ones buffered after
+    it, for kernels given by stdpKernelWeight, then empties the buffer except
+    for its last activations.  The kernel weights of all pairs form an upper
+    triangular time x time matrix, so each weight update is two products.
+    """
+    I, EL, ER, times = self._getBuffer()
+    if len(times) > 1:
+      lags = (times[np.newaxis, :] - times[:, np.newaxis]) * self.dt
+      later = np.triu(np.ones(lags.shape, dtype=bool), 1)
+
+      def weights(inhibitoryPresyn, inhibitoryPostsyn):
+        return np.where(later, self._kernelWeights(lags, inhibitoryPresyn,
+                                                   inhibitoryPostsyn), 0.)
+
+      weightsII = weights(True, True)
+      weightsIE = weights(True, False)
+      weightsEI = weights(False, True)
+
+      learnII = self.learningRate * self.learnFactorII * self.dt
+      learnIE = self.learningRate * self.learnFactorIE * self.dt
+      learnEI = self.learningRate * self.learnFactorEI * self.dt
+
+      self.weightsII += learnII * I.T.dot(weightsII.dot(I))
+      self.weightsIEL += learnIE * I.T.dot(weightsIE.dot(EL))
+      self.weightsIER += learnIE * I.T.dot(weightsIE.dot(ER))
+      weightedI = weightsEI.dot(I)
+      self.weightsELI += learnEI * EL.T.dot(weightedI)
+      self.weightsERI += learnEI * ER.T.dot(weightedI)
+
+    self._keepLastBuffered()
+
+
+  def _clearBufferWithKernel(self):
+    """
+    Same as _clearBufferBatched, calling stdpKernel for every pair of buffered
+    activations.
+    """
+    bufferedI, bufferedEL, bufferedER, times = self._getBuffer()
+    for base in xrange(len(times) - 1):
+      baseI, baseEL, baseER = bufferedI[base], bufferedEL[base], bufferedER[base]
+      for I, EL, ER, i in zip(bufferedI[base+1:], bufferedEL[base+1:],
+                              bufferedER[base+1:], times[base+1:]):
+        t = 1. * (i - times[base]) * self.dt
+        if self.stdpCutoff is not None and abs(t) > self.stdpCutoff:
+          continue
+
+        self.weightsII += self.stdpKernel(self.learningRate *\
+                                          self.learnFactorII *\
+                                          self.dt *\
+                                          baseI, I, t,
+                                          True, True)
 
         self.weightsIEL += self.stdpKernel(self.learningRate *\
                                            self.learnFactorIE *\
                                            self.dt *\
-                                           I, self.instantaneousEL, t,
+                                           baseI, EL, t,
                                            True, False)
 
         self.weightsIER += self.stdpKernel(self.learningRate *\
                                            self.learnFactorIE *\
                                            self.dt *\
-                                           I, self.instantaneousER, t,
+                                           baseI, ER, t,
                                            True, False)
 
         self.weightsELI += self.stdpKernel(self.learningRate *\
                                            self.learnFactorEI *\
                                            self.dt *\
-                                           EL, self.instantaneousI, t,
+                                           baseEL, I, t,
                                            False, True)
 
         self.weightsERI += self.stdpKernel(self.learningRate *\
                                            self.learnFactorEI *\
                                            self.dt *\
-                                           ER, self.instantaneousI, t,
+                                           baseER, I, t,
                                            False, True)
 
-      self.activationBuffer.append((np.copy(self.instantaneousI),
-                                    np.copy(self.instantaneousEL),
-                                    np.copy(self.instantaneousER), time))
+    self._keepLastBuffered()
+
+
+  def _stdpUpdateWithKernel(self, time):
+    """
+    Same as _stdpUpdateBatched, calling stdpKernel for every buffered
+    activation.
+    """
+    bufferedI, bufferedEL, bufferedER, times = self._getBuffer()
+    buffered = zip(bufferedI, bufferedEL, bufferedER, times)
+
+    for I, EL, ER, i in reversed(buffered):
+      t = (i - time) * self.dt
+      if self.stdpCutoff is not None and abs(t) > self.stdpCutoff:
+        continue
+
+      self.weightsII +=  self.stdpKernel(self.learningRate *\
+                                         self.learnFactorII *\
+                                         self.dt *\
+                                         self.instantaneousI, I, t,
+                                         True, True)
+
+      self.weightsIEL += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorIE *\
+                                         self.dt *\
+                                         self.instantaneousI, EL, t,
+                                         True, False)
+
+      self.weightsIER += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorIE *\
+                                         self.dt *\
+                                         self.instantaneousI, ER, t,
+                                         True, False)
+
+      self.weightsELI += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorEI *\
+                                         self.dt *\
+                                         self.instantaneousEL, I, t,
+                                         False, True)
+
+      self.weightsERI += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorEI *\
+                                         self.dt *\
+                                         self.instantaneousER, I, t,
+                                         False, True)
+
+    for I, EL, ER, i in buffered:
+      t = (time - i) * self.dt
+      if self.stdpCutoff is not None and abs(t) > self.stdpCutoff:
+        continue
+
+      self.weightsII +=  self.stdpKernel(self.learningRate *\
+                                         self.learnFactorII *\
+                                         self.dt *\
+                                         I, self.instantaneousI, t,
+                                         True, True)
+
+      self.weightsIEL += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorIE *\
+                                         self.dt *\
+                                         I, self.instantaneousEL, t,
+                                         True, False)
+
+      self.weightsIER += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorIE *\
+                                         self.dt *\
+                                         I, self.instantaneousER, t,
+                                         True, False)
+
+      self.weightsELI += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorEI *\
+                                         self.dt *\
+                                         EL, self.instantaneousI, t,
+                                         False, True)
+
+      self.weightsERI += self.stdpKernel(self.learningRate *\
+                                         self.learnFactorEI *\
+                                         self.dt *\
+                                         ER, self.instantaneousI, t,
+                                         False, True)
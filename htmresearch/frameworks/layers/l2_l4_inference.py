@@ -82,6 +82,7 @@ projects/layers/multi_column.py
 # pylint: disable=C0103
 
 import collections
+import itertools
 import os
 import random
 import matplotlib.pyplot as plt
@@ -117,6 +118,19 @@ def rerunExperimentFromLogfile(logFilename):
 
 
 
+def _toSparseBatch(sdrs):
+  """
+  Returns the given SDRs (iterables of active bits) as the indices and indptr
+  arrays of a CSR matrix with one SDR per row.
+  """
+  indptr = np.zeros(len(sdrs) + 1, dtype="int64")
+  indptr[1:] = np.cumsum([len(sdr) for sdr in sdrs])
+  indices = np.fromiter(itertools.chain.from_iterable(sdrs), dtype="int64",
+                        count=indptr[-1])
+  return indices, indptr
+
+
+
 class L4L2Experiment(object):
   """
   L4-L2 experiment.
@@ -373,18 +387,12 @@ class L4L2Experiment(object):
       if len(sensationList) == 0:
         continue
 
-      # keep track of numbers of iterations to run
-      iterations = 0
-
-      for sensations in sensationList:
-        # learn each pattern multiple times
-        for _ in xrange(self.numLearningPoints):
-
-          for col in xrange(self.numColumns):
-            location, feature = sensations[col]
-            self.sensorInputs[col].addDataToQueue(list(feature), 0, 0)
-            self.externalInputs[col].addDataToQueue(list(location), 0, 0)
-          iterations += 1
+      # learn each pattern multiple times
+      sensationsToLearn = [sensations
+                           for sensations in sensationList
+                           for _ in xrange(self.numLearningPoints)]
+      self._queueSensations(sensationsToLearn)
+      iterations = len(sensationsToLearn)
 
       # actually learn the objects
       if iterations > 0:
@@ -444,13 +452,10 @@ class L4L2Experiment(object):
     self._unsetLearningMode()
     statistics = collections.defaultdict(list)
 
-    for sensations in sensationList:
+    # feed all columns with sensations
+    self._queueSensations(sensationList)
 
-      # feed all columns with sensations
-      for col in xrange(self.numColumns):
-        location, feature = sensations[col]
-        self.sensorInputs[col].addDataToQueue(list(feature), 0, 0)
-        self.externalInputs[col].addDataToQueue(list(location), 0, 0)
+    for _ in sensationList:
       self.network.run(1)
       self._updateInferenceStats(statistics, objectName)
 
@@ -493,6 +498,18 @@ class L4L2Experiment(object):
                               np.ones(len(activeCells), dtype="float32"))
 
 
+  def _queueSensations(self, sensationList):
+    """
+    Adds the features and locations of the given sensations to the sensors of
+    each column, as a single batch per sensor.
+    """
+    for col in xrange(self.numColumns):
+      features = [sensations[col][1] for sensations in sensationList]
+      locations = [sensations[col][0] for sensations in sensationList]
+      self.sensorInputs[col].addBatchToQueue(*_toSparseBatch(features))
+      self.externalInputs[col].addBatchToQueue(*_toSparseBatch(locations))
+
+
   def _sendReset(self, sequenceId=0):
     """
     Sends a reset signal to the network.
@@ -28,6 +28,7 @@ import math
 import numbers
 
 import numpy as np
+from scipy.special import gammaln, xlog1py, xlogy
 
 
 def choose(n, k):
@@ -47,6 +48,58 @@ def _choose(n, k):
           np.product(np.arange(1, k+1, dtype="float128")))
 
 
+# log(0!), log(1!), ..., grown on demand by logFactorial
+_logFactorials = np.zeros(1)
+
+
+def logFactorial(n):
+  """
+  Computes log(n!) for an int or an array of ints. The values are memoized, so
+  evaluating binomial distributions for many n reuses the same table.
+  """
+  global _logFactorials
+  nMax = np.max(n) if np.size(n) > 0 else 0
+  if nMax >= len(_logFactorials):
+    size = max(nMax + 1, 2 * len(_logFactorials))
+    _logFactorials = gammaln(np.arange(size, dtype="float64") + 1.)
+  return _logFactorials[n]
+
+
+def logBinomialPmf(n, p, k):
+  """
+  Computes log(P(X = k)) for X ~ Binomial(n, p), vectorized over k. Values of k
+  outside [0, n] get -inf.
+  """
+  k = np.asarray(k)
+  withinBounds = (k >= 0) & (k <= n)
+  k2 = np.where(withinBounds, k, 0)
+  logPmf = (logFactorial(n) - logFactorial(k2) - logFactorial(n - k2) +
+            xlogy(k2, p) + xlog1py(n - k2, -p))
+  return np.where(withinBounds, logPmf, -np.inf)
+
+
+def getExpectedBinomialSampleMinimum(n, p, numSamples):
+  """
+  Calculates E[min(X_1, ..., X_numSamples)] where each X_i ~ Binomial(n, p),
+  without building the distribution of the minimum:
+
+    E[min] = sum_k P(min > k) = sum_k P(X > k)^numSamples
+  """
+  pmf = np.exp(logBinomialPmf(n, p, np.arange(n + 1)))
+  # P(X > k) for k = 0, ..., n-1
+  survival = np.cumsum(pmf[:0:-1])[::-1]
+  return np.sum(np.power(survival, numSamples))
+
+
+def getBinomialSampleMinimumLowerBound(n, p, numSamples, value):
+  """
+  Calculates P(min(X_1, ..., X_numSamples) >= value) where each
+  X_i ~ Binomial(n, p).
+  """
+  cdf = np.sum(np.exp(logBinomialPmf(n, p, np.arange(value))))
+  return np.power(max(1. - cdf, 0.), numSamples)
+
+
 class BinomialDistribution(object):
   """
   Given a coin with P(Heads=p), flip it n times.
@@ -63,25 +116,21 @@ class BinomialDistribution(object):
 
   def _cache(self):
     self._cachedPmf = self._pmf(np.arange(self.n + 1))
-    self._cachedCdf = np.zeros(self.n + 1)
-    for k in xrange(self.n + 1):
-      self._cachedCdf[k:] += self._cachedPmf[k]
+    self._cachedCdf = np.minimum(np.cumsum(self._cachedPmf), 1.)
 
   def _pmf(self, k):
-    return (choose(self.n, k)*
-            np.power(self.p, k)*
-            np.power(1. - self.p, self.n - k))
+    return np.exp(logBinomialPmf(self.n, self.p, k))
 
   def pmf(self, k):
     if self.cache:
       withinBounds = (k >= 0) & (k <= self.n)
       k2 = np.where(withinBounds, k, 0)
-      return np.where(withinBounds, self._cachedPmf(k2))
+      return np.where(withinBounds, self._cachedPmf[k2], 0.)
     else:
       return self._pmf(k)
 
   def _cdf(self, k):
-    return np.sum(self._pmf(np.arange(k+1)))
+    return min(np.sum(self._pmf(np.arange(min(k, self.n) + 1))), 1.)
 
   def cdf(self, k):
     if self.cache:
@@ -147,11 +196,8 @@ def findBinomialNsWithExpectedSampleMinimum(desiredValuesSorted, p, numSamples,
   """
 
   # mapping from n -> expected value
-  actualValues = [
-    getExpectedValue(
-      SampleMinimumDistribution(numSamples,
-                                BinomialDistribution(n, p, cache=True)))
-    for n in xrange(nMax + 1)]
+  actualValues = [getExpectedBinomialSampleMinimum(n, p, numSamples)
+                  for n in xrange(nMax + 1)]
 
   results = []
 
@@ -202,12 +248,16 @@ def findBinomialNsWithLowerBoundSampleMinimum(confidence, desiredValuesSorted,
    ...]
   """
 
+  memo = {}
+
   def P(n, numOccurrences):
     """
     Given n, return probability than the sample minimum is >= numOccurrences
     """
-    return 1 - SampleMinimumDistribution(numSamples, BinomialDistribution(n, p)).cdf(
-      numOccurrences - 1)
+    if (n, numOccurrences) not in memo:
+      memo[(n, numOccurrences)] = getBinomialSampleMinimumLowerBound(
+        n, p, numSamples, numOccurrences)
+    return memo[(n, numOccurrences)]
 
   results = []
 
@@ -0,0 +1,441 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Trace writers and readers for the PIUN experiment logs.
+
+A trace is a sequence of records. Each record has a tag (e.g. "shift" or
+"featureLocationPair", or None for the header) and a list of payloads. The
+JSON lines format prints the tag on one line, followed by one JSON line per
+payload. The binary format stores the same records in zlib-compressed chunks:
+
+  MAGIC
+  chunk*     uint32 compressedSize, uint32 numRecords, zlib(records)
+  footer     JSON: tags, chunk table, object and step indexes
+  uint64     footer offset
+  END_MAGIC
+
+Each record is uint8 tagId, uint8 numPayloads, then the payloads. Cell lists
+are stored as raw uint32 arrays and every other payload is stored as its JSON
+text, so exporting a binary trace reproduces the JSON lines trace exactly.
+"""
+
+from __future__ import print_function
+import bisect
+import json
+import Queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+
+MAGIC = "PIUNTRC1"
+END_MAGIC = "PIUNEND1"
+
+PAYLOAD_JSON = 0
+PAYLOAD_CELLS = 1
+PAYLOAD_CELLS_LIST = 2
+
+# Records that start a new object / a new step. Inference emits
+# "currentObject", then each step starts with a movement.
+OBJECT_TAGS = ("currentObject",)
+STEP_TAGS = ("initialSensation", "shift")
+
+
+
+def _jsonDefault(obj):
+  if isinstance(obj, (np.ndarray, np.generic)):
+    return obj.tolist()
+  raise TypeError("{} is not JSON serializable".format(repr(obj)))
+
+
+def toJSON(payload):
+  """
+  Format a payload for the JSON lines trace. Numpy arrays are written as lists.
+  """
+  return json.dumps(payload, default=_jsonDefault)
+
+
+def _isCells(payload):
+  return (isinstance(payload, np.ndarray) and
+          payload.ndim == 1 and
+          payload.dtype.kind in "ui" and
+          (payload.size == 0 or
+           (payload.min() >= 0 and payload.max() <= 0xFFFFFFFF)))
+
+
+def _encodePayload(payload):
+  if _isCells(payload):
+    return (struct.pack("<BI", PAYLOAD_CELLS, payload.size) +
+            payload.astype("<u4").tostring())
+  elif (isinstance(payload, list) and len(payload) > 0 and
+        all(_isCells(cells) for cells in payload)):
+    lengths = np.array([cells.size for cells in payload], dtype="<u4")
+    return (struct.pack("<BI", PAYLOAD_CELLS_LIST, len(payload)) +
+            lengths.tostring() +
+            np.concatenate(payload).astype("<u4").tostring())
+  else:
+    text = toJSON(payload)
+    return struct.pack("<BI", PAYLOAD_JSON, len(text)) + text
+
+
+
+class JSONLinesTraceWriter(object):
+  """
+  Writes records as the text trace read by the PIUNVisualizer.
+  """
+
+  def __init__(self, out):
+    self.out = out
+
+
+  def writeRecord(self, tag, payloads):
+    if tag is not None:
+      print(tag, file=self.out)
+    for payload in payloads:
+      print(toJSON(payload), file=self.out)
+
+
+  def close(self):
+    pass
+
+
+
+class BinaryTraceWriter(object):
+  """
+  Writes records in the chunked binary format. Records are encoded as they
+  arrive and grouped into chunks. Full chunks are compressed and written by a
+  background thread, so the experiment only pays for encoding.
+  """
+
+  def __init__(self, out, recordsPerChunk=512, compressionLevel=6,
+               maxPendingChunks=8):
+    """
+    @param out (file)
+    A file opened in binary mode, positioned at its start. The chunk offsets
+    in the footer are positions in this file. It's not closed by this writer.
+
+    @param recordsPerChunk (int)
+    The number of records in each compressed chunk. A reader decompresses one
+    chunk to read any record in it.
+
+    @param compressionLevel (int)
+    The zlib compression level of the chunks, from 1 (fastest) to 9 (smallest).
+
+    @param maxPendingChunks (int)
+    The number of full chunks that can wait for the background thread before
+    writeRecord blocks.
+    """
+    if out.tell() != 0:
+      raise ValueError("BinaryTraceWriter must start at the beginning of the "
+                       "file, not at position {}".format(out.tell()))
+
+    self.out = out
+    self.recordsPerChunk = recordsPerChunk
+    self.compressionLevel = compressionLevel
+
+    self.tags = []
+    self.tagIds = {}
+    self.numRecords = 0
+    self.objectRecords = []
+    self.stepRecords = []
+
+    self.pendingRecords = []
+    self.pendingFirstRecord = 0
+
+    # Only touched by the background thread until it's joined.
+    self.chunks = []
+    self.offset = len(MAGIC)
+    self.error = None
+
+    self.out.write(MAGIC)
+
+    self.queue = Queue.Queue(maxPendingChunks)
+    self.thread = threading.Thread(target=self._writeChunks)
+    self.thread.daemon = True
+    self.thread.start()
+
+
+  def _writeChunks(self):
+    while True:
+      item = self.queue.get()
+      if item is None:
+        return
+
+      if self.error is not None:
+        continue
+
+      firstRecord, numRecords, data = item
+      try:
+        compressed = zlib.compress(data, self.compressionLevel)
+        self.out.write(struct.pack("<II", len(compressed), numRecords))
+        self.out.write(compressed)
+        self.chunks.append([self.offset, firstRecord, numRecords])
+        self.offset += struct.calcsize("<II") + len(compressed)
+      except Exception as e:
+        self.error = e
+
+
+  def _checkError(self):
+    if self.error is not None:
+      raise self.error
+
+
+  def writeRecord(self, tag, payloads):
+    """
+    @param tag (str or None)
+
+    @param payloads (list)
+    JSON-serializable objects. 1D arrays of non-negative integers, and
+    non-empty lists of them, are stored as uint32 arrays.
+    """
+    self._checkError()
+
+    if tag not in self.tagIds:
+      self.tagIds[tag] = len(self.tags)
+      self.tags.append(tag)
+
+    if tag in OBJECT_TAGS:
+      self.objectRecords.append(self.numRecords)
+    elif tag in STEP_TAGS:
+      self.stepRecords.append(self.numRecords)
+
+    self.pendingRecords.append(
+      struct.pack("<BB", self.tagIds[tag], len(payloads)) +
+      "".join(_encodePayload(payload) for payload in payloads))
+    self.numRecords += 1
+
+    if len(self.pendingRecords) >= self.recordsPerChunk:
+      self.flush()
+
+
+  def flush(self):
+    """
+    Hand the current partial chunk to the background thread.
+    """
+    if len(self.pendingRecords) > 0:
+      self.queue.put((self.pendingFirstRecord, len(self.pendingRecords),
+                      "".join(self.pendingRecords)))
+      self.pendingRecords = []
+      self.pendingFirstRecord = self.numRecords
+
+
+  def close(self):
+    """
+    Write the remaining records and the footer. The output file stays open.
+    """
+    if self.thread is None:
+      return
+
+    self.flush()
+    self.queue.put(None)
+    self.thread.join()
+    self.thread = None
+    self._checkError()
+
+    footer = json.dumps({
+      "tags": self.tags,
+      "numRecords": self.numRecords,
+      "chunks": self.chunks,
+      "objectRecords": self.objectRecords,
+      "stepRecords": self.stepRecords,
+    })
+    self.out.write(footer)
+    self.out.write(struct.pack("<Q", self.offset))
+    self.out.write(END_MAGIC)
+    self.out.flush()
+
+
+
+class BinaryTraceReader(object):
+  """
+  Random-access reader for traces written by BinaryTraceWriter. Only the
+  footer is read up front. Reading a record decompresses only its chunk.
+  """
+
+  def __init__(self, f):
+    """
+    @param f (file)
+    A seekable file opened in binary mode.
+    """
+    self.f = f
+
+    self.f.seek(0)
+    if self.f.read(len(MAGIC)) != MAGIC:
+      raise ValueError("Not a binary PIUN trace")
+
+    trailerSize = struct.calcsize("<Q") + len(END_MAGIC)
+    self.f.seek(-trailerSize, 2)
+    trailer = self.f.read(trailerSize)
+    if trailer[-len(END_MAGIC):] != END_MAGIC:
+      raise ValueError("Binary PIUN trace is truncated. Was the writer closed?")
+    footerOffset, = struct.unpack("<Q", trailer[:-len(END_MAGIC)])
+    footerEnd = self.f.tell() - trailerSize
+
+    self.f.seek(footerOffset)
+    footer = json.loads(self.f.read(footerEnd - footerOffset))
+
+    self.tags = [(str(tag) if tag is not None else None)
+                 for tag in footer["tags"]]
+    self.numRecords = footer["numRecords"]
+    self.chunkOffsets = [offset for offset, _, _ in footer["chunks"]]
+    self.chunkFirstRecords = [first for _, first, _ in footer["chunks"]]
+    self.objectRecords = footer["objectRecords"]
+    self.stepRecords = footer["stepRecords"]
+
+    self.cachedChunk = None
+    self.cachedRecords = None
+
+
+  def getObjectCount(self):
+    return len(self.objectRecords)
+
+
+  def _objectBounds(self, objectIndex):
+    start = self.objectRecords[objectIndex]
+    if objectIndex + 1 < len(self.objectRecords):
+      stop = self.objectRecords[objectIndex + 1]
+    else:
+      stop = self.numRecords
+    return start, stop
+
+
+  def getStepCount(self, objectIndex):
+    start, stop = self._objectBounds(objectIndex)
+    return (bisect.bisect_left(self.stepRecords, stop) -
+            bisect.bisect_left(self.stepRecords, start))
+
+
+  def findRecord(self, objectIndex, step=None):
+    """
+    @param objectIndex (int)
+    The index of an inferred object, in the order of the "currentObject"
+    records.
+
+    @param step (int or None)
+    The index of a step within that object. Each step starts with a movement.
+    If None, find the object's first record.
+
+    @return (int)
+    A record number for iterRecords.
+    """
+    start, stop = self._objectBounds(objectIndex)
+    if step is None:
+      return start
+
+    i = bisect.bisect_left(self.stepRecords, start) + step
+    if step < 0 or i >= len(self.stepRecords) or self.stepRecords[i] >= stop:
+      raise IndexError("Object {} has no step {}".format(objectIndex, step))
+    return self.stepRecords[i]
+
+
+  def _decodeChunk(self, chunkIndex, raw):
+    self.f.seek(self.chunkOffsets[chunkIndex])
+    compressedSize, numRecords = struct.unpack("<II", self.f.read(8))
+    data = zlib.decompress(self.f.read(compressedSize))
+
+    records = []
+    pos = 0
+    for _ in xrange(numRecords):
+      tagId, numPayloads = struct.unpack_from("<BB", data, pos)
+      pos += 2
+      payloads = []
+      for _ in xrange(numPayloads):
+        kind, length = struct.unpack_from("<BI", data, pos)
+        pos += 5
+        if kind == PAYLOAD_JSON:
+          text = data[pos:pos + length]
+          payloads.append(text if raw else json.loads(text))
+          pos += length
+        elif kind == PAYLOAD_CELLS:
+          payloads.append(np.frombuffer(data, dtype="<u4", count=length,
+                                        offset=pos).astype("uint32"))
+          pos += 4*length
+        elif kind == PAYLOAD_CELLS_LIST:
+          lengths = np.frombuffer(data, dtype="<u4", count=length, offset=pos)
+          pos += 4*length
+          total = int(lengths.sum())
+          cells = np.frombuffer(data, dtype="<u4", count=total,
+                                offset=pos).astype("uint32")
+          pos += 4*total
+          payloads.append(np.split(cells, np.cumsum(lengths)[:-1]))
+        else:
+          raise ValueError("Unrecognized payload kind", kind)
+      records.append((self.tags[tagId], payloads))
+
+    return records
+
+
+  def iterRecords(self, start=0, stop=None, raw=False):
+    """
+    Iterate over (tag, payloads) records, decompressing one chunk at a time.
+
+    @param raw (bool)
+    If True, JSON payloads are returned as their JSON text rather than parsed.
+    Cell lists are always returned as uint32 arrays.
+    """
+    if stop is None:
+      stop = self.numRecords
+
+    record = start
+    while record < stop:
+      chunkIndex = bisect.bisect_right(self.chunkFirstRecords, record) - 1
+      if self.cachedChunk != (chunkIndex, raw):
+        self.cachedRecords = self._decodeChunk(chunkIndex, raw)
+        self.cachedChunk = (chunkIndex, raw)
+      records = self.cachedRecords
+
+      first = self.chunkFirstRecords[chunkIndex]
+      for r in xrange(record - first, min(len(records), stop - first)):
+        yield records[r]
+      record = first + len(records)
+
+
+  def iterObject(self, objectIndex, step=None, raw=False):
+    """
+    Iterate over the records of one inferred object, optionally starting at
+    one of its steps.
+    """
+    _, stop = self._objectBounds(objectIndex)
+    return self.iterRecords(self.findRecord(objectIndex, step), stop, raw)
+
+
+
+def exportToJSONLines(reader, out):
+  """
+  Convert a binary trace into the JSON lines trace, e.g. for the
+  PIUNVisualizer. The output is identical to what the JSON lines writer would
+  have written.
+
+  @param reader (BinaryTraceReader)
+
+  @param out (file)
+  """
+  for tag, payloads in reader.iterRecords(raw=True):
+    if tag is not None:
+      print(tag, file=out)
+    for payload in payloads:
+      if isinstance(payload, str):
+        print(payload, file=out)
+      else:
+        print(toJSON(payload), file=out)
@@ -26,7 +26,6 @@ PathIntegrationUnionNarrowing.js visualization.
 
 from __future__ import print_function
 from collections import defaultdict
-import json
 import os
 from pkg_resources import resource_string
 import StringIO
@@ -35,6 +34,10 @@ import numpy as np
 
 from htmresearch.frameworks.location.path_integration_union_narrowing import (
   PIUNExperimentMonitor)
+from htmresearch.frameworks.location.trace_io import (
+  BinaryTraceReader, BinaryTraceWriter, JSONLinesTraceWriter,
+  exportToJSONLines)
+from htmresearch.support.sdr_inverted_index import SDRInvertedIndex
 
 
 
@@ -43,33 +46,53 @@ class PIUNLogger(PIUNExperimentMonitor):
   Logs the state of the world and the state of each layer to a file.
   """
 
-  def __init__(self, out, exp, includeSynapses=True, learnedObjectsOverride=None):
+  def __init__(self, out, exp, includeSynapses=True, learnedObjectsOverride=None,
+               traceFormat="json"):
+    """
+    @param traceFormat ("json" or "binary")
+    "json" writes the JSON lines trace read by the PIUNVisualizer. "binary"
+    writes a compressed binary trace from a background thread (see trace_io),
+    which is smaller and faster to write for long runs. The binary trace is
+    completed when this logger is unsubscribed. It can be read with
+    BinaryTraceReader and converted with exportToJSONLines.
+    """
     self.exp = exp
     self.out = out
     self.includeSynapses = includeSynapses
 
+    if traceFormat == "json":
+      self.writer = JSONLinesTraceWriter(out)
+    elif traceFormat == "binary":
+      self.writer = BinaryTraceWriter(out)
+    else:
+      raise ValueError("Unrecognized trace format", traceFormat)
+
     self.locationRepresentations = exp.locationRepresentations
     self.inputRepresentations = exp.inputRepresentations
 
+    # Inverted indexes for decoding the active cells. They're rebuilt if the
+    # experiment learns more representations while this logger is attached.
+    self.locationIndex = None
+    self.inputIndex = None
+    self.featureIndex = None
+
     self.locationModules = exp.column.L6aModules
     self.inputLayer = exp.column.L4
 
     self.subscriberToken = exp.addMonitor(self)
 
-    print(json.dumps({"numMinicolumns": exp.column.L4.numberOfColumns(),
-                      "cellsPerColumn": exp.column.L4.getCellsPerColumn()}),
-          file=self.out)
-
-    print(json.dumps([{"cellDimensions": [module.cellsPerAxis, module.cellsPerAxis],
-                       "moduleMapDimensions": [module.scale, module.scale],
-                       "orientation": module.orientation}
-                      for module in self.locationModules]),
-          file=self.out)
+    self.writer.writeRecord(None, [
+      {"numMinicolumns": exp.column.L4.numberOfColumns(),
+       "cellsPerColumn": exp.column.L4.getCellsPerColumn()},
+      [{"cellDimensions": [module.cellsPerAxis, module.cellsPerAxis],
+        "moduleMapDimensions": [module.scale, module.scale],
+        "orientation": module.orientation}
+       for module in self.locationModules]])
 
-    print("learnedObjects", file=self.out)
-    print(json.dumps(exp.learnedObjects
-                     if learnedObjectsOverride is None
-                     else learnedObjectsOverride), file=self.out)
+    self.writer.writeRecord("learnedObjects", [
+      exp.learnedObjects
+      if learnedObjectsOverride is None
+      else learnedObjectsOverride])
 
 
   def __enter__(self, *args):
@@ -84,50 +107,45 @@ class PIUNLogger(PIUNExperimentMonitor):
 
     self.exp.removeMonitor(self.subscriberToken)
     self.subscriberToken = None
+    self.writer.close()
 
 
   def beforeSense(self, featureSDR):
-    print("featureInput", file=self.out)
-    print(json.dumps(featureSDR.tolist()), file=self.out)
-    print(json.dumps(
+    self.featureIndex = self._getIndex(self.featureIndex, self.exp.features)
+    containment = self.featureIndex.containment(featureSDR)
+    self.writer.writeRecord("featureInput", [
+      featureSDR,
       [k
-       for k, sdr in self.exp.features.iteritems()
-       if np.intersect1d(featureSDR, sdr).size == sdr.size]), file=self.out)
+       for k, amountContained in zip(self.featureIndex.keys, containment)
+       if amountContained == 1.0]])
 
 
   def afterLocationInitialize(self):
-    print("initialSensation", file=self.out)
+    self.writer.writeRecord("initialSensation", [])
 
 
   def afterReset(self):
-    print("reset", file=self.out)
+    self.writer.writeRecord("reset", [])
 
 
   def beforeSensoryRepetition(self):
-    print("sensoryRepetition", file=self.out)
+    self.writer.writeRecord("sensoryRepetition", [])
 
 
   def beforeInferObject(self, obj):
-    print("currentObject", file=self.out)
-    print(json.dumps(obj), file=self.out)
+    self.writer.writeRecord("currentObject", [obj])
 
 
   def afterLocationChanged(self, locationOnObject):
-    print("locationOnObject", file=self.out)
-    print(json.dumps(locationOnObject), file=self.out)
+    self.writer.writeRecord("locationOnObject", [locationOnObject])
 
 
   def afterLocationShift(self, displacement, **kwargs):
-    print("shift", file=self.out)
-    print(json.dumps({"top": displacement[0], "left": displacement[1]}),
-                     file=self.out)
     phaseDisplacementByModule = [module.phaseDisplacement.tolist()
                                  for module in self.locationModules]
-    print(json.dumps(phaseDisplacementByModule), file=self.out)
 
-    cellsByModule = [module.getActiveCells().tolist()
+    cellsByModule = [module.getActiveCells()
                      for module in self.locationModules]
-    print(json.dumps(cellsByModule), file=self.out)
 
     cellPointsByModule = []
     for module in self.locationModules:
@@ -137,21 +155,18 @@ class PIUNLogger(PIUNExperimentMonitor):
       else:
         cellPoints = []
       cellPointsByModule.append(cellPoints)
-    print(json.dumps(cellPointsByModule), file=self.out)
 
     activeLocationCells = self.exp.column.getLocationRepresentation()
 
-    decodings = []
-    for (objectName, iFeature), sdrs in self.locationRepresentations.iteritems():
-      amountContained = np.amax([(np.intersect1d(sdr, activeLocationCells).size /
-                         float(sdr.size)) for sdr in sdrs])
-      decodings.append([objectName, iFeature, amountContained])
-
-    print(json.dumps(decodings), file=self.out)
+    self.writer.writeRecord("shift", [
+      {"top": displacement[0], "left": displacement[1]},
+      phaseDisplacementByModule,
+      cellsByModule,
+      cellPointsByModule,
+      self.getLocationDecodings(activeLocationCells)])
 
 
   def afterLocationAnchor(self, anchorInput, **kwargs):
-    print("locationLayer", file=self.out)
 
     cellsByModule = []
     for module in self.locationModules:
@@ -182,8 +197,6 @@ class PIUNLogger(PIUNExperimentMonitor):
       else:
         cellsByModule.append([activeCells.tolist()])
 
-    print(json.dumps(cellsByModule), file=self.out)
-
     cellPointsByModule = []
     for module in self.locationModules:
       if hasattr(module, "activePhases"):
@@ -192,18 +205,13 @@ class PIUNLogger(PIUNExperimentMonitor):
       else:
         cellPoints = []
       cellPointsByModule.append(cellPoints)
-    print(json.dumps(cellPointsByModule), file=self.out)
-
 
     activeLocationCells = self.exp.column.getLocationRepresentation()
 
-    decodings = []
-    for (objectName, iFeature), sdrs in self.locationRepresentations.iteritems():
-      amountContained = np.amax([(np.intersect1d(sdr, activeLocationCells).size /
-                                  float(sdr.size)) for sdr in sdrs])
-      decodings.append(
-        [objectName, iFeature, amountContained])
-    print(json.dumps(decodings), file=self.out)
+    self.writer.writeRecord("locationLayer", [
+      cellsByModule,
+      cellPointsByModule,
+      self.getLocationDecodings(activeLocationCells)])
 
 
   def getInputSegments(self, cells, basalInput, apicalInput):
@@ -244,43 +252,56 @@ class PIUNLogger(PIUNExperimentMonitor):
     }
 
 
+  @staticmethod
+  def _getIndex(index, representations):
+    if index is None or not index.isCurrent(representations):
+      index = SDRInvertedIndex(representations)
+    return index
+
+
+  def getLocationDecodings(self, activeCells):
+    self.locationIndex = self._getIndex(self.locationIndex,
+                                        self.locationRepresentations)
+    containment = self.locationIndex.containment(activeCells).tolist()
+
+    return [[objectName, iFeature, amountContained]
+            for (objectName, iFeature), amountContained
+            in zip(self.locationIndex.keys, containment)]
+
+
   def getInputDecodings(self, activeCells):
-    decodings = []
-    for (objectName, iFeature, featureName), sdr in self.inputRepresentations.iteritems():
-      amountContained = (np.intersect1d(sdr, activeCells).size /
-                         float(sdr.size))
-      decodings.append([objectName, iFeature, amountContained])
+    self.inputIndex = self._getIndex(self.inputIndex,
+                                     self.inputRepresentations)
+    containment = self.inputIndex.containment(activeCells).tolist()
 
-    return decodings
+    return [[objectName, iFeature, amountContained]
+            for (objectName, iFeature, featureName), amountContained
+            in zip(self.inputIndex.keys, containment)]
 
 
   def afterInputCompute(self, activeColumns, basalInput, **kwargs):
-    activeCells = self.inputLayer.getActiveCells().tolist()
-    predictedCells = self.inputLayer.getPredictedCells().tolist()
+    activeCells = self.inputLayer.getActiveCells()
+    predictedCells = self.inputLayer.getPredictedCells()
 
-    print("predictedFeatureLocationPair", file=self.out)
     if self.includeSynapses:
-      segmentsForPredictedCells = self.getInputSegments(predictedCells, basalInput,
-                                                        [])
-      print(json.dumps(
-        [predictedCells, segmentsForPredictedCells]), file=self.out)
+      segmentsForPredictedCells = self.getInputSegments(predictedCells.tolist(),
+                                                        basalInput, [])
+      predictedPayload = [predictedCells.tolist(), segmentsForPredictedCells]
     else:
-      print(json.dumps(
-        [predictedCells]), file=self.out)
-    print(json.dumps(self.getInputDecodings(activeCells)), file=self.out)
+      predictedPayload = [predictedCells]
+    self.writer.writeRecord("predictedFeatureLocationPair", [
+      predictedPayload,
+      self.getInputDecodings(activeCells)])
 
-    print("featureLocationPair", file=self.out)
     if self.includeSynapses:
-      segmentsForActiveCells = self.getInputSegments(activeCells, basalInput,
-                                                     [])
-
-      print(json.dumps(
-        [activeCells, segmentsForActiveCells]), file=self.out)
-
+      segmentsForActiveCells = self.getInputSegments(activeCells.tolist(),
+                                                     basalInput, [])
+      activePayload = [activeCells.tolist(), segmentsForActiveCells]
     else:
-      print(json.dumps(
-        [activeCells]), file=self.out)
-    print(json.dumps(self.getInputDecodings(activeCells)), file=self.out)
+      activePayload = [activeCells]
+    self.writer.writeRecord("featureLocationPair", [
+      activePayload,
+      self.getInputDecodings(activeCells)])
 
 
 
@@ -301,7 +322,14 @@ class PIUNVisualizer(PIUNLogger):
 
 
   def close(self):
-    cssText = """
+    writeVisualization(self.logOut.getvalue(), self.htmlOut)
+
+
+def writeVisualization(logText, htmlOut):
+  """
+  Write a self-contained interactive HTML file for a JSON lines trace.
+  """
+  cssText = """
         .noselect {
             -webkit-touch-callout: none;
             -webkit-user-select: none;
@@ -311,11 +339,9 @@ class PIUNVisualizer(PIUNLogger):
         }
     """
 
-    jsText = get_htmresearchviz0_js()
+  jsText = get_htmresearchviz0_js()
 
-    logText = self.logOut.getvalue()
-
-    page_content = u"""
+  page_content = u"""
     <!doctype html>
     <html>
     <head>
@@ -337,7 +363,20 @@ class PIUNVisualizer(PIUNLogger):
                jsText,
                logText.replace("\r", "\\r").replace("\n", "\\n"))
 
-    print(page_content, file=self.htmlOut)
+  print(page_content, file=htmlOut)
+
+
+def visualizeBinaryTrace(traceFile, htmlOut):
+  """
+  Write a self-contained interactive HTML file for a binary trace written with
+  PIUNLogger(..., traceFormat="binary").
+
+  @param traceFile (file)
+  The binary trace, opened in binary mode.
+  """
+  logOut = StringIO.StringIO()
+  exportToJSONLines(BinaryTraceReader(traceFile), logOut)
+  writeVisualization(logOut.getvalue(), htmlOut)
 
 
 def get_htmresearchviz0_js():
@@ -21,7 +21,7 @@
 # ----------------------------------------------------------------------
 
 
-import copy
+import multiprocessing
 import random
 
 import matplotlib.pyplot as plt
@@ -52,8 +52,11 @@ from nupic.bindings.math import GetNTAReal
 
 
 import random
+import weakref
+
 import numpy as np
 import pandas as pd
+import scipy.sparse
 
 
 
@@ -61,14 +64,80 @@ import pandas as pd
 uintType = "uint32"
 
 
-def getConnectedSyns(sp):
-  numInputs = sp.getNumInputs()
+# Synapse matrices extracted from each pooler, see getSynapseMatrix
+_synapseMatrixCache = weakref.WeakKeyDictionary()
+
+
+def _getSnapshotKey(sp):
+  """
+  Identifies the state of the pooler's synapses. The learning iteration
+  changes whenever learning runs, and the connected counts catch direct edits
+  such as FaultySpatialPooler.killCells.
+  """
   numColumns = np.prod(sp.getColumnDimensions())
-  connectedSyns = np.zeros((numColumns, numInputs), dtype=uintType)
-  for columnIndex in range(numColumns):
-    sp.getConnectedSynapses(columnIndex, connectedSyns[columnIndex, :])
-  connectedSyns = connectedSyns.astype('float32')
-  return connectedSyns
+  connectedCounts = np.zeros(numColumns, dtype=uintType)
+  sp.getConnectedCounts(connectedCounts)
+  return sp.getIterationLearnNum(), connectedCounts.tostring()
+
+
+
+def getSynapseMatrix(sp, type='connected'):
+  """
+  Get the connected (or potential) synapses of every column as a sparse
+  numColumns x numInputs matrix. The matrix is extracted once per pooler
+  snapshot and cached until the pooler learns or its connections change.
+  The cached matrix is shared, don't modify it.
+
+  @param sp (SpatialPooler) the spatial pooler instance
+  @param type (string) 'connected' or 'potential'
+  @return synapses (scipy.sparse.csr_matrix) binary float32 matrix
+  """
+  if type == 'connected':
+    getSynapses = sp.getConnectedSynapses
+  elif type == 'potential':
+    getSynapses = sp.getPotential
+  else:
+    raise RuntimeError('unknown RF type')
+
+  key = _getSnapshotKey(sp)
+  cache = _synapseMatrixCache.get(sp)
+  if cache is None or cache[0] != key:
+    cache = (key, {})
+    _synapseMatrixCache[sp] = cache
+  matrices = cache[1]
+
+  if type not in matrices:
+    numInputs = sp.getNumInputs()
+    numColumns = np.prod(sp.getColumnDimensions())
+    synapses = np.zeros((numInputs,), dtype=uintType)
+    indices = []
+    indptr = np.zeros(numColumns + 1, dtype="int64")
+    for columnIndex in xrange(numColumns):
+      getSynapses(columnIndex, synapses)
+      columnSynapses = np.flatnonzero(synapses)
+      indices.append(columnSynapses)
+      indptr[columnIndex + 1] = indptr[columnIndex] + len(columnSynapses)
+    indices = (np.concatenate(indices) if numColumns > 0
+               else np.zeros(0, dtype="int64"))
+    matrices[type] = scipy.sparse.csr_matrix(
+      (np.ones(len(indices), dtype="float32"), indices, indptr),
+      shape=(numColumns, numInputs))
+
+  return matrices[type]
+
+
+
+def invalidateSynapseMatrix(sp):
+  """
+  Drop the cached synapse matrices of sp. Only needed after changing
+  permanences in a way that keeps every column's connected count.
+  """
+  _synapseMatrixCache.pop(sp, None)
+
+
+
+def getConnectedSyns(sp):
+  return getSynapseMatrix(sp).toarray()
 
 
 
@@ -391,8 +460,6 @@ class SDRDataSet(object):
 
 
 
-from nupic.math.topology import coordinatesFromIndex
-
 realDType = GetNTAReal()
 uintType = "uint32"
 
@@ -420,6 +487,43 @@ def percentOverlap(x1, x2):
 
 
 
+def percentOverlapRows(x1, x2):
+  """
+  Computes percentOverlap between each row of x1 and the same row of x2.
+
+  @param x1 (array) 2D array of binary vectors
+  @param x2 (array) 2D array of binary vectors, same shape as x1
+
+  @return percentOverlaps (array) one percent overlap per row
+  """
+  overlaps = np.sum(np.multiply(x1, x2, dtype="float64"), axis=1)
+  minX1X2 = np.minimum(np.count_nonzero(x1, axis=1),
+                       np.count_nonzero(x2, axis=1))
+  percentOverlaps = np.zeros(len(overlaps))
+  np.divide(overlaps, minX1X2, out=percentOverlaps, where=minX1X2 > 0)
+  return percentOverlaps
+
+
+
+def percentOverlapMatrix(x1, x2):
+  """
+  Computes percentOverlap between every row of x1 and every row of x2.
+
+  @param x1 (array) 2D array of binary vectors
+  @param x2 (array) 2D array of binary vectors
+
+  @return percentOverlaps (array) len(x1) x len(x2) matrix
+  """
+  overlaps = np.dot(np.asarray(x1, dtype="float64"),
+                    np.asarray(x2, dtype="float64").T)
+  minX1X2 = np.minimum(np.count_nonzero(x1, axis=1)[:, np.newaxis],
+                       np.count_nonzero(x2, axis=1)[np.newaxis, :])
+  percentOverlaps = np.zeros(overlaps.shape)
+  np.divide(overlaps, minX1X2, out=percentOverlaps, where=minX1X2 > 0)
+  return percentOverlaps
+
+
+
 def addNoiseToVector(inputVector, noiseLevel, vectorType):
   """
   Add noise to SDRs
@@ -477,36 +581,169 @@ def corruptSparseVector(sdr, noiseLevel):
 
 
 
-def calculateOverlapCurve(sp, inputVectors):
+def corruptSparseVectors(sdrs, noiseLevel):
+  """
+  Vectorized corruptSparseVector for a batch of SDRs. In each row, turns off
+  numNoiseBits randomly chosen active bits and turns on numNoiseBits randomly
+  chosen inactive bits. Each row is corrupted independently, but the random
+  draws differ from calling corruptSparseVector on the rows one at a time.
+
+  @param sdrs       (array) 2D numpy array, one SDR per row
+  @param noiseLevel (float) amount of noise to be applied on each SDR.
+
+  @return corrupted (array) corrupted copy of sdrs
+  """
+  corrupted = np.array(sdrs, copy=True)
+  numRows, numBits = corrupted.shape
+  numNoiseBits = (noiseLevel * np.sum(corrupted, axis=1)).astype("int")
+  if numRows == 0 or numNoiseBits.max() <= 0:
+    return corrupted
+
+  active = corrupted > 0
+  numActive = np.count_nonzero(active, axis=1)
+  numTurnOff = np.minimum(numNoiseBits, numActive)
+  numTurnOn = np.minimum(numNoiseBits, numBits - numActive)
+
+  # Sorting random keys gives each row a random permutation of its active
+  # bits followed by its inactive bits, and vice versa.
+  keys = np.random.random((numRows, numBits))
+  position = np.arange(numBits)
+
+  order = np.argsort(np.where(active, keys, 2.), axis=1)
+  selected = position[np.newaxis, :] < numTurnOff[:, np.newaxis]
+  corrupted[np.nonzero(selected)[0], order[selected]] = 0
+
+  order = np.argsort(np.where(active, 2., keys), axis=1)
+  selected = position[np.newaxis, :] < numTurnOn[:, np.newaxis]
+  corrupted[np.nonzero(selected)[0], order[selected]] = 1
+
+  return corrupted
+
+
+
+_inferenceSP = None
+
+
+def _initInferenceWorker(sp):
+  global _inferenceSP
+  _inferenceSP = sp
+
+
+def _computeInferenceShardWorker(inputVectors):
+  columnNumber = np.prod(_inferenceSP.getColumnDimensions())
+  outputColumns = np.zeros((len(inputVectors), columnNumber), dtype=uintType)
+  for i in xrange(len(inputVectors)):
+    _inferenceSP.compute(inputVectors[i], False, outputColumns[i])
+  return np.nonzero(outputColumns)
+
+
+
+def createInferencePool(sp, numProcesses):
+  """
+  Create a process pool whose workers each hold their own copy of the SP, for
+  use with computeSPOutputs. The workers are forked with the SP already in
+  memory, so it is not serialized. Later changes to sp are not seen by the
+  workers; create a new pool after learning.
+
+  @param sp a spatial pooler instance
+  @param numProcesses (int) number of worker processes
+
+  @return pool (multiprocessing.Pool), or None if numProcesses <= 1
+  """
+  if sp is None or numProcesses is None or numProcesses <= 1:
+    return None
+  return multiprocessing.Pool(numProcesses, _initInferenceWorker, (sp,))
+
+
+
+def computeSPOutputs(sp, inputVectors, pool=None, shardSize=256):
+  """
+  Run the SP with learning off on every input vector.
+
+  @param sp a spatial pooler instance
+  @param inputVectors (array) 2D numpy array of input vectors
+  @param pool (multiprocessing.Pool) optional pool from createInferencePool(sp)
+  @param shardSize (int) number of input vectors sent to a worker at a time
+
+  @return outputColumns (array) numInputVector x numColumns binary outputs
+  """
+  numInputVector = len(inputVectors)
+  columnNumber = np.prod(sp.getColumnDimensions())
+  outputColumns = np.zeros((numInputVector, columnNumber), dtype=uintType)
+
+  if pool is None or numInputVector < 2:
+    for i in xrange(numInputVector):
+      sp.compute(inputVectors[i], False, outputColumns[i])
+    return outputColumns
+
+  shards = [np.arange(start, min(start + shardSize, numInputVector))
+            for start in xrange(0, numInputVector, shardSize)]
+  results = pool.imap(_computeInferenceShardWorker,
+                      (inputVectors[shard] for shard in shards))
+  for shard, (rows, columns) in zip(shards, results):
+    outputColumns[shard[rows], columns] = 1
+  return outputColumns
+
+
+
+def iterNoiseSweep(sp, inputVectors, noiseLevelList, numProcesses=1):
+  """
+  Corrupt all the input vectors at each noise level and run the corrupted
+  vectors through the SP with learning off. The outputs for the clean input
+  vectors are only computed once.
+
+  @param sp a spatial pooler instance, or None to use the input vectors as
+            the outputs
+  @param inputVectors (array) 2D numpy array of input SDRs
+  @param noiseLevelList (list) list of noise levels
+  @param numProcesses (int) number of processes running the SP
+
+  @return (generator) For each noise level, yields a tuple
+          (outputColumns, corruptedInputVectors, corruptedOutputColumns).
+          outputColumns are the outputs for the clean input vectors.
+  """
+  pool = createInferencePool(sp, numProcesses)
+  try:
+    if sp is None:
+      outputColumns = inputVectors
+    else:
+      outputColumns = computeSPOutputs(sp, inputVectors, pool)
+
+    for noiseLevel in noiseLevelList:
+      corruptedInputVectors = corruptSparseVectors(inputVectors, noiseLevel)
+      if sp is None:
+        corruptedOutputColumns = corruptedInputVectors
+      else:
+        corruptedOutputColumns = computeSPOutputs(sp, corruptedInputVectors,
+                                                  pool)
+      yield outputColumns, corruptedInputVectors, corruptedOutputColumns
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+
+
+
+def calculateOverlapCurve(sp, inputVectors, numProcesses=1):
   """
   Evalulate noise robustness of SP for a given set of SDRs
   @param sp a spatial pooler instance
   @param inputVectors list of arrays.
+  @param numProcesses (int) number of processes running the SP
   :return:
   """
-  columnNumber = np.prod(sp.getColumnDimensions())
   numInputVector, inputSize = inputVectors.shape
 
-  outputColumns = np.zeros((numInputVector, columnNumber), dtype=uintType)
-  outputColumnsCorrupted = np.zeros((numInputVector, columnNumber),
-                                    dtype=uintType)
-
   noiseLevelList = np.linspace(0, 1.0, 21)
   inputOverlapScore = np.zeros((numInputVector, len(noiseLevelList)))
   outputOverlapScore = np.zeros((numInputVector, len(noiseLevelList)))
-  for i in range(numInputVector):
-    for j in range(len(noiseLevelList)):
-      inputVectorCorrupted = copy.deepcopy(inputVectors[i][:])
-      corruptSparseVector(inputVectorCorrupted, noiseLevelList[j])
-
-      sp.compute(inputVectors[i][:], False, outputColumns[i][:])
-      sp.compute(inputVectorCorrupted, False,
-                 outputColumnsCorrupted[i][:])
-
-      inputOverlapScore[i][j] = percentOverlap(inputVectors[i][:],
-                                               inputVectorCorrupted)
-      outputOverlapScore[i][j] = percentOverlap(outputColumns[i][:],
-                                                outputColumnsCorrupted[i][:])
+  sweep = iterNoiseSweep(sp, inputVectors, noiseLevelList, numProcesses)
+  for j, (outputColumns, inputVectorsCorrupted,
+          outputColumnsCorrupted) in enumerate(sweep):
+    inputOverlapScore[:, j] = percentOverlapRows(inputVectors,
+                                                 inputVectorsCorrupted)
+    outputOverlapScore[:, j] = percentOverlapRows(outputColumns,
+                                                  outputColumnsCorrupted)
 
   return noiseLevelList, inputOverlapScore, outputOverlapScore
 
@@ -529,40 +766,30 @@ def classifySPoutput(targetOutputColumns, outputColumns):
 
 
 
-def classificationAccuracyVsNoise(sp, inputVectors, noiseLevelList):
+def classificationAccuracyVsNoise(sp, inputVectors, noiseLevelList,
+                                  numProcesses=1, chunkSize=1024):
   """
   Evaluate whether the SP output is classifiable, with varying amount of noise
   @param sp a spatial pooler instance
   @param inputVectors (list) list of input SDRs
   @param noiseLevelList (list) list of noise levels
+  @param numProcesses (int) number of processes running the SP
+  @param chunkSize (int) number of outputs classified per matrix product
   :return:
   """
   numInputVector, inputSize = inputVectors.shape
 
-  if sp is None:
-    targetOutputColumns = copy.deepcopy(inputVectors)
-  else:
-    columnNumber = np.prod(sp.getColumnDimensions())
-    # calculate target output given the uncorrupted input vectors
-    targetOutputColumns = np.zeros((numInputVector, columnNumber),
-                                   dtype=uintType)
-    for i in range(numInputVector):
-      sp.compute(inputVectors[i][:], False, targetOutputColumns[i][:])
-
   outcomes = np.zeros((len(noiseLevelList), numInputVector))
-  for i in range(len(noiseLevelList)):
-    for j in range(numInputVector):
-      corruptedInputVector = copy.deepcopy(inputVectors[j][:])
-      corruptSparseVector(corruptedInputVector, noiseLevelList[i])
-
-      if sp is None:
-        outputColumns = copy.deepcopy(corruptedInputVector)
-      else:
-        outputColumns = np.zeros((columnNumber, ), dtype=uintType)
-        sp.compute(corruptedInputVector, False, outputColumns)
-
-      predictedClassLabel = classifySPoutput(targetOutputColumns, outputColumns)
-      outcomes[i][j] = predictedClassLabel == j
+  sweep = iterNoiseSweep(sp, inputVectors, noiseLevelList, numProcesses)
+  for i, (targetOutputColumns, corruptedInputVectors,
+          outputColumns) in enumerate(sweep):
+    for start in xrange(0, numInputVector, chunkSize):
+      stop = min(start + chunkSize, numInputVector)
+      # Same as classifySPoutput on each output, ties go to the lowest label
+      overlap = percentOverlapMatrix(outputColumns[start:stop],
+                                     targetOutputColumns)
+      predictedClassLabels = np.argmax(overlap, axis=1)
+      outcomes[i, start:stop] = predictedClassLabels == np.arange(start, stop)
 
   predictionAccuracy = np.mean(outcomes, 1)
   return predictionAccuracy
@@ -679,45 +906,40 @@ def getRFCenters(sp, params, type='connected'):
 
   meanCoordinates = np.zeros((numColumns, 2))
   avgDistToCenter = np.zeros((numColumns, 2))
-  for columnIndex in range(numColumns):
-    receptiveField = np.zeros((sp.getNumInputs(), ))
-    if type == 'connected':
-      sp.getConnectedSynapses(columnIndex, receptiveField)
-    elif type == 'potential':
-      sp.getPotential(columnIndex, receptiveField)
-    else:
-      raise RuntimeError('unknown RF type')
-
-    connectedSynapseIndex = np.where(receptiveField)[0]
-    if len(connectedSynapseIndex) == 0:
-      continue
-    coordinates = []
-    for synapseIndex in connectedSynapseIndex:
-      coordinate = coordinatesFromIndex(synapseIndex, dimensions)
-      coordinates.append(coordinate)
-    coordinates = np.array(coordinates)
-
-    coordinates = coordinates.astype('float32')
-    angularCoordinates = np.array(coordinates)
-    angularCoordinates[:, 0] = coordinates[:, 0] / params['nX'] * 2 * np.pi
-    angularCoordinates[:, 1] = coordinates[:, 1] / params['nY'] * 2 * np.pi
-
-    for i in range(2):
-      meanCoordinate = np.arctan2(
-        np.sum(np.sin(angularCoordinates[:, i])),
-        np.sum(np.cos(angularCoordinates[:, i])))
-      if meanCoordinate < 0:
-        meanCoordinate += 2 * np.pi
-
-      dist2Mean = angularCoordinates[:, i] - meanCoordinate
-      dist2Mean = np.arctan2(np.sin(dist2Mean), np.cos(dist2Mean))
-      dist2Mean = np.max(np.abs(dist2Mean))
-
-      meanCoordinate *= dimensions[i] / (2 * np.pi)
-      dist2Mean *= dimensions[i] / (2 * np.pi)
-
-      avgDistToCenter[columnIndex, i] = dist2Mean
-      meanCoordinates[columnIndex, i] = meanCoordinate
+
+  receptiveFields = getSynapseMatrix(sp, type)
+  synapseColumns = np.repeat(np.arange(numColumns),
+                             np.diff(receptiveFields.indptr))
+  synapseIndex = receptiveFields.indices
+  hasSynapses = np.diff(receptiveFields.indptr) > 0
+
+  # Same as coordinatesFromIndex for every synapse
+  coordinates = np.zeros((len(synapseIndex), 2), dtype='float32')
+  coordinates[:, 0] = synapseIndex / dimensions[1]
+  coordinates[:, 1] = synapseIndex % dimensions[1]
+
+  angularCoordinates = np.array(coordinates)
+  angularCoordinates[:, 0] = coordinates[:, 0] / params['nX'] * 2 * np.pi
+  angularCoordinates[:, 1] = coordinates[:, 1] / params['nY'] * 2 * np.pi
+
+  for i in range(2):
+    meanCoordinate = np.arctan2(
+      np.bincount(synapseColumns, np.sin(angularCoordinates[:, i]),
+                  minlength=numColumns),
+      np.bincount(synapseColumns, np.cos(angularCoordinates[:, i]),
+                  minlength=numColumns))
+    meanCoordinate[meanCoordinate < 0] += 2 * np.pi
+
+    dist2Mean = angularCoordinates[:, i] - meanCoordinate[synapseColumns]
+    dist2Mean = np.abs(np.arctan2(np.sin(dist2Mean), np.cos(dist2Mean)))
+    maxDist2Mean = np.zeros(numColumns)
+    np.maximum.at(maxDist2Mean, synapseColumns, dist2Mean)
+
+    meanCoordinate *= dimensions[i] / (2 * np.pi)
+    maxDist2Mean *= dimensions[i] / (2 * np.pi)
+
+    avgDistToCenter[hasSynapses, i] = maxDist2Mean[hasSynapses]
+    meanCoordinates[hasSynapses, i] = meanCoordinate[hasSynapses]
 
   return meanCoordinates, avgDistToCenter
 
@@ -758,15 +980,30 @@ def calculateEntropy(activeColumns, type='binary'):
 
 
 
-def calculateInputOverlapMat(inputVectors, sp):
+def calculateInputOverlapMat(inputVectors, sp, chunkSize=256):
+  """
+  Computes percentOverlap between the connected synapses of every column and
+  every input vector, one chunk of columns at a time.
+  @param inputVectors (array) 2D numpy array of input vectors
+  @param sp (SpatialPooler) the spatial pooler instance
+  @param chunkSize (int) number of columns per matrix product
+  @return overlapMat (array) numColumns x numInputVector matrix
+  """
   numColumns = np.product(sp.getColumnDimensions())
   numInputVector, inputSize = inputVectors.shape
+  connectedSyns = getSynapseMatrix(sp)
+  inputVectors = np.asarray(inputVectors, dtype="float64")
+
+  numConnected = connectedSyns.getnnz(axis=1)
+  numActiveInputs = np.count_nonzero(inputVectors, axis=1)
+
   overlapMat = np.zeros((numColumns, numInputVector))
-  for c in range(numColumns):
-    connectedSynapses = np.zeros((inputSize, ), dtype=uintType)
-    sp.getConnectedSynapses(c, connectedSynapses)
-    for i in range(numInputVector):
-      overlapMat[c, i] = percentOverlap(connectedSynapses, inputVectors[i, :])
+  for start in xrange(0, numColumns, chunkSize):
+    columns = slice(start, min(start + chunkSize, numColumns))
+    overlaps = connectedSyns[columns].dot(inputVectors.T)
+    minX1X2 = np.minimum(numConnected[columns, np.newaxis],
+                         numActiveInputs[np.newaxis, :])
+    np.divide(overlaps, minX1X2, out=overlapMat[columns], where=minX1X2 > 0)
   return overlapMat
 
 
@@ -780,14 +1017,10 @@ def calculateStability(activeColumnsCurrentEpoch, activeColumnsPreviousEpoch):
 
 
 def calculateInputSpaceCoverage(sp):
-  numInputs = np.prod(sp.getInputDimensions())
-  numColumns = np.prod(sp.getColumnDimensions())
-  inputSpaceCoverage = np.zeros(numInputs)
-
-  connectedSynapses = np.zeros((numInputs), dtype=uintType)
-  for columnIndex in range(numColumns):
-    sp.getConnectedSynapses(columnIndex, connectedSynapses)
-    inputSpaceCoverage += connectedSynapses
+  connectedSynapses = getSynapseMatrix(sp)
+  inputSpaceCoverage = np.bincount(connectedSynapses.indices,
+                                   minlength=connectedSynapses.shape[1])
+  inputSpaceCoverage = inputSpaceCoverage.astype("float64")
   inputSpaceCoverage = np.reshape(inputSpaceCoverage, sp.getInputDimensions())
   return inputSpaceCoverage
 
@@ -829,9 +1062,10 @@ def reconstructionError(sp, inputVectors, activeColumnVectors, threshold=0.):
   @return error (float) the reconstruction error
   """
   batchSize        = inputVectors.shape[0]
-  connectionMatrix = getConnectedSyns(sp)
+  connectionMatrix = getSynapseMatrix(sp)
 
-  reconstructionVectors = np.dot(activeColumnVectors, connectionMatrix)
+  reconstructionVectors = connectionMatrix.T.dot(
+    np.asarray(activeColumnVectors, dtype="float64").T).T
   # numActiveColumns      = np.sum(activeColumnVectors, 1)[0]
   numActiveColumns = int(sp._localAreaDensity * sp._numColumns) + 0.0
   reconstructionVectors = reconstructionVectors/numActiveColumns
@@ -847,7 +1081,7 @@ def reconstructionError(sp, inputVectors, activeColumnVectors, threshold=0.):
   return Err/batchSize
 
 
-def witnessError(sp, inputVectors, activeColumnsCurrentEpoch):
+def witnessError(sp, inputVectors, activeColumnsCurrentEpoch, chunkSize=256):
   """
   Computes a variation of a reconstruction error. It measures the average 
   hamming distance of an active column's connected synapses vector and its witnesses. 
@@ -864,22 +1098,41 @@ def witnessError(sp, inputVectors, activeColumnsCurrentEpoch):
   \]
   It can be shown that the error is optimized by the Hebbian-like update rule 
   of the spatial pooler. 
+
+  For binary input vectors the hamming distances are computed from the
+  overlaps of each chunk of inputs with every column,
+  \[
+      \| x -  syn(i) \|_1 = |x| + |syn(i)| - 2 x \cdot syn(i) .
+  \]
+
+  @param chunkSize (int) number of input vectors per matrix product
   """
-  connectionMatrix = getConnectedSyns(sp)
+  connectionMatrix = getSynapseMatrix(sp)
   batchSize        = inputVectors.shape[0]
+  activeColumnsCurrentEpoch = np.asarray(activeColumnsCurrentEpoch) > 0.
+  numActiveColumns = np.sum(activeColumnsCurrentEpoch, 1)
+  isBinary = np.all((inputVectors == 0) | (inputVectors == 1))
+
+  numConnected = connectionMatrix.getnnz(axis=1).astype("float64")
+
+  # Summed hamming distance from each input to its active columns
+  err = np.zeros(batchSize)
+  for start in xrange(0, batchSize, chunkSize):
+    inputs = slice(start, min(start + chunkSize, batchSize))
+    if isBinary:
+      chunk = np.asarray(inputVectors[inputs], dtype="float64")
+      hammingDistances = (numConnected[np.newaxis, :] +
+                          np.sum(chunk, 1)[:, np.newaxis] -
+                          2 * connectionMatrix.dot(chunk.T).T)
+      err[inputs] = np.sum(hammingDistances *
+                           activeColumnsCurrentEpoch[inputs], 1)
+    else:
+      for i in xrange(inputs.start, inputs.stop):
+        activeColumns = np.where(activeColumnsCurrentEpoch[i])[0]
+        err[i] = np.sum(np.absolute(
+          connectionMatrix[activeColumns].toarray() - inputVectors[i]))
 
-  # 1st sum... over each input in batch
-  Err = 0.
-  for i in range(batchSize):
-    activeColumns    = np.where(activeColumnsCurrentEpoch[i] > 0.)[0]
-    numActiveColumns = activeColumns.shape[0]
-    # 2nd sum... over each active colum
-    err = 0.
-    for j in activeColumns:
-      # Compute hamming distance and accumulate
-      err += np.sum(np.absolute(connectionMatrix[j] - inputVectors[i]))
-
-    Err += err/numActiveColumns
+  Err = np.sum(err / numActiveColumns)
 
   return Err/batchSize
 
@@ -895,49 +1148,79 @@ def mutualInformation(sp, activeColumnsCurrentEpoch, column_1, column_2):
   \]
   (https://en.wikipedia.org/wiki/Mutual_information)
   """
-  i, j        = column_1, column_2
-  batchSize   = activeColumnsCurrentEpoch.shape[0]
+  return mutualInformationMatrix(activeColumnsCurrentEpoch,
+                                 [column_1], [column_2])[0, 0]
+
+
+
+def mutualInformationMatrix(activeColumnsCurrentEpoch, rowColumns, colColumns):
+  """
+  Computes the mutual information of every pair of columns (i, j) with i from
+  rowColumns and j from colColumns. The joint activity counts of all pairs come
+  from a single matrix product of the activity matrix with itself.
+
+  @param activeColumnsCurrentEpoch (array) 2D numpy array of activation history
+  @param rowColumns (array) column indices
+  @param colColumns (array) column indices
+  @return mutualInfo (array) len(rowColumns) x len(colColumns) matrix
+  """
+  batchSize = activeColumnsCurrentEpoch.shape[0]
+  activityI = np.asarray(activeColumnsCurrentEpoch[:, rowColumns] > 0,
+                         dtype="float64")
+  activityJ = np.asarray(activeColumnsCurrentEpoch[:, colColumns] > 0,
+                         dtype="float64")
 
   # Activity Counts
-  ci, cj, cij = 0., 0., dict([((0,0),0.), ((1,0),0.), ((0,1),0.), ((1,1),0.)])
-  for t in range(batchSize):
-    ai = activeColumnsCurrentEpoch[t, i]
-    aj = activeColumnsCurrentEpoch[t, j]
-    cij[(ai, aj)] += 1.
-    ci += ai
-    cj += aj
-
-  # Mutual information calculation 
-  Iij = 0
+  ci = np.sum(activityI, 0)[:, np.newaxis]
+  cj = np.sum(activityJ, 0)[np.newaxis, :]
+  c11 = np.dot(activityI.T, activityJ)
+  cij = {(1,1): c11,
+         (1,0): ci - c11,
+         (0,1): cj - c11,
+         (0,0): batchSize - ci - cj + c11}
+
+  # Mutual information calculation
+  Iij = np.zeros(c11.shape)
   for a,b in [(0,0), (1,0), (0,1), (1,1)]:
     # Compute probabilities
     pij = cij[(a,b)]/batchSize
     pi  = ci/batchSize if a == 1 else 1. - ci/batchSize
     pj  = cj/batchSize if b == 1 else 1. - cj/batchSize
-    # Add current term of mutual information 
-    Iij += pij * np.log2(pij/(pi*pj)) if pij > 0 else 0
+    # Add current term of mutual information
+    with np.errstate(divide="ignore", invalid="ignore"):
+      term = pij * np.log2(pij/(pi*pj))
+    Iij += np.where(pij > 0, term, 0)
 
   return Iij
 
 
 
-def meanMutualInformation(sp, activeColumnsCurrentEpoch, columnsUnderInvestigation = []):
+def meanMutualInformation(sp, activeColumnsCurrentEpoch, columnsUnderInvestigation = [],
+                          numSampledColumns=None, chunkSize=256, seed=None):
   """
   Computes the mean of the mutual information 
   of pairs taken from a list of columns. 
+
+  @param numSampledColumns (int) if set, the mean is estimated over the pairs of
+                                 a random sample of this many of the columns
+  @param chunkSize (int) number of columns per matrix product
+  @param seed (int) seed for the column sample
   """
   if len(columnsUnderInvestigation) == 0:
-    columns = range(np.prod(sp.getColumnDimensions()))
+    columns = np.arange(np.prod(sp.getColumnDimensions()))
   else:
-    columns = columnsUnderInvestigation
+    columns = np.asarray(columnsUnderInvestigation)
+  if numSampledColumns is not None and numSampledColumns < len(columns):
+    columns = np.random.RandomState(seed).choice(columns, numSampledColumns,
+                                                 replace=False)
   numCols = len(columns)
   sumMutualInfo = 0
   normalizingConst = numCols*(numCols - 1)/2
-  for i in range(numCols):
-    for j in range(i+1, numCols):
-      sumMutualInfo += mutualInformation(sp, activeColumnsCurrentEpoch, columns[i], columns[j])
+  for start in xrange(0, numCols, chunkSize):
+    stop = min(start + chunkSize, numCols)
+    mutualInfo = mutualInformationMatrix(activeColumnsCurrentEpoch,
+                                         columns[start:stop], columns[start:])
+    # Only count the pairs (i, j) with i < j
+    sumMutualInfo += np.sum(np.triu(mutualInfo, 1))
 
   return sumMutualInfo/normalizingConst
-
-
-
@@ -27,6 +27,8 @@ import numpy as np
 
 from nupic.bindings.regions.PyRegion import PyRegion
 
+from htmresearch.support.region_profiler import RegionProfiler
+
 
 
 class ApicalTMPairRegion(PyRegion):
@@ -183,6 +185,21 @@ class ApicalTMPairRegion(PyRegion):
           "count": 1,
           "defaultValue": "true"
         },
+        "enableProfiling": {
+          "description": ("If true, record the time spent in each phase of "
+                          "compute along with activity counters."),
+          "accessMode": "ReadWrite",
+          "dataType": "Bool",
+          "count": 1,
+          "defaultValue": "false"
+        },
+        "profile": {
+          "description": ("JSON string with the phase timers and counters "
+                          "recorded while enableProfiling is true."),
+          "accessMode": "Read",
+          "dataType": "Byte",
+          "count": 0
+        },
         "cellsPerColumn": {
           "description": "Number of cells per column",
           "accessMode": "Read",
@@ -304,6 +321,11 @@ class ApicalTMPairRegion(PyRegion):
           "defaultValue": "ApicalTiebreakCPP"
         },
       },
+      "commands": {
+        "resetProfile": {
+          "description": "Clear the profiling timers and counters."
+        },
+      },
     }
 
     return spec
@@ -336,6 +358,7 @@ class ApicalTMPairRegion(PyRegion):
                # Region params
                implementation="ApicalTiebreak",
                learn=True,
+               enableProfiling=False,
                **kwargs):
 
     # Input sizes (the network API doesn't provide these during initialize)
@@ -363,12 +386,15 @@ class ApicalTMPairRegion(PyRegion):
     # Region params
     self.implementation = implementation
     self.learn = learn
+    self.enableProfiling = enableProfiling
 
     PyRegion.__init__(self, **kwargs)
 
     # TM instance
     self._tm = None
 
+    self._profiler = RegionProfiler() if enableProfiling else None
+
 
   def initialize(self):
     """
@@ -423,6 +449,10 @@ class ApicalTMPairRegion(PyRegion):
     Run one iteration of TM's compute.
     """
 
+    profiler = self._profiler
+    if profiler is not None:
+      profiler.start()
+
     # If there's a reset, don't call compute. In some implementations, an empty
     # input might cause unwanted effects.
     if "resetIn" in inputs:
@@ -433,6 +463,9 @@ class ApicalTMPairRegion(PyRegion):
         outputs["activeCells"][:] = 0
         outputs["predictedActiveCells"][:] = 0
         outputs["winnerCells"][:] = 0
+        if profiler is not None:
+          profiler.lap("reset")
+          profiler.count("resets")
         return
 
     activeColumns = inputs["activeColumns"].nonzero()[0]
@@ -457,9 +490,18 @@ class ApicalTMPairRegion(PyRegion):
     else:
       apicalGrowthCandidates = apicalInput
 
+    if profiler is not None:
+      profiler.lap("inputConversion")
+      if self.learn:
+        numSegmentsAndSynapses = self._countSegmentsAndSynapses()
+      profiler.resume()
+
     self._tm.compute(activeColumns, basalInput, apicalInput,
                      basalGrowthCandidates, apicalGrowthCandidates, self.learn)
 
+    if profiler is not None:
+      profiler.lap("compute")
+
     # Extract the active / predicted cells and put them into binary arrays.
     outputs["activeCells"][:] = 0
     outputs["activeCells"][self._tm.getActiveCells()] = 1
@@ -471,6 +513,52 @@ class ApicalTMPairRegion(PyRegion):
     outputs["winnerCells"][:] = 0
     outputs["winnerCells"][self._tm.getWinnerCells()] = 1
 
+    if profiler is not None:
+      profiler.lap("outputConversion")
+      self._countActivity(profiler, activeColumns, numSegmentsAndSynapses
+                          if self.learn else None)
+
+
+  def _countActivity(self, profiler, activeColumns, numSegmentsAndSynapses):
+    """
+    Adds the activity of the last compute to the profiling counters. If
+    numSegmentsAndSynapses is given, also count the segments and synapses grown
+    since it was measured.
+    """
+    profiler.count("activeColumns", len(activeColumns))
+    profiler.count("activeCells", len(self._tm.getActiveCells()))
+    profiler.count("predictedCells", len(self._tm.getPredictedCells()))
+    profiler.count("winnerCells", len(self._tm.getWinnerCells()))
+    profiler.count("activeBasalSegments",
+                   len(self._tm.getActiveBasalSegments()))
+    profiler.count("activeApicalSegments",
+                   len(self._tm.getActiveApicalSegments()))
+
+    if numSegmentsAndSynapses is not None:
+      current = self._countSegmentsAndSynapses()
+      for name, before, after in zip(("basalSegmentsGrown",
+                                      "basalSynapsesGrown",
+                                      "apicalSegmentsGrown",
+                                      "apicalSynapsesGrown"),
+                                     numSegmentsAndSynapses, current):
+        profiler.count(name, after - before)
+
+
+  def _countSegmentsAndSynapses(self):
+    """
+    Returns the number of basal segments, basal synapses, apical segments and
+    apical synapses of the TM, or an empty tuple if the implementation doesn't
+    expose its connections.
+    """
+    if not (hasattr(self._tm, "basalConnections") and
+            hasattr(self._tm, "apicalConnections")):
+      return ()
+
+    return (self._tm.basalConnections.numSegments(),
+            self._tm.basalConnections.numSynapses(),
+            self._tm.apicalConnections.numSegments(),
+            self._tm.apicalConnections.numSynapses())
+
 
   def getParameter(self, parameterName, index=-1):
     """
@@ -478,6 +566,9 @@ class ApicalTMPairRegion(PyRegion):
       automatically by PyRegion's parameter get mechanism. The ones that need
       special treatment are explicitly handled here.
     """
+    if parameterName == "profile":
+      return self._profiler.toJson() if self._profiler is not None else "{}"
+
     return PyRegion.getParameter(self, parameterName, index)
 
 
@@ -492,6 +583,17 @@ class ApicalTMPairRegion(PyRegion):
     else:
       raise Exception("Unknown parameter: " + parameterName)
 
+    if parameterName == "enableProfiling":
+      self._profiler = RegionProfiler() if parameterValue else None
+
+
+  def resetProfile(self):
+    """
+    Clear the profiling timers and counters.
+    """
+    if self._profiler is not None:
+      self._profiler.reset()
+
 
   def reset(self):
     """
@@ -25,6 +25,7 @@ import inspect
 
 from nupic.bindings.regions.PyRegion import PyRegion
 from htmresearch.algorithms.column_pooler import ColumnPooler
+from htmresearch.support.region_profiler import RegionProfiler
 
 
 def getConstructorArguments():
@@ -311,9 +312,24 @@ class ColumnPoolerRegion(PyRegion):
           count=0,
           constraints="enum: active,predicted,predictedActiveCells",
           defaultValue="active"),
+        enableProfiling=dict(
+          description="If true, record the time spent in each phase of "
+                      "compute along with activity counters.",
+          accessMode="ReadWrite",
+          dataType="Bool",
+          count=1,
+          defaultValue="false"),
+        profile=dict(
+          description="JSON string with the phase timers and counters "
+                      "recorded while enableProfiling is true.",
+          accessMode="Read",
+          dataType="Byte",
+          count=0),
       ),
       commands=dict(
         reset=dict(description="Explicitly reset TM states now."),
+        resetProfile=dict(description="Clear the profiling timers and "
+                                      "counters."),
       )
     )
 
@@ -349,6 +365,7 @@ class ColumnPoolerRegion(PyRegion):
 
                seed=42,
                defaultOutputType = "active",
+               enableProfiling=False,
                **kwargs):
 
     # Used to derive Column Pooler params
@@ -380,8 +397,10 @@ class ColumnPoolerRegion(PyRegion):
     # Region params
     self.learningMode = True
     self.defaultOutputType = defaultOutputType
+    self.enableProfiling = enableProfiling
 
     self._pooler = None
+    self._profiler = RegionProfiler() if enableProfiling else None
 
     PyRegion.__init__(self, **kwargs)
 
@@ -427,6 +446,10 @@ class ColumnPoolerRegion(PyRegion):
     representation to this point and any history will then be reset. The output
     at the next compute will start fresh, presumably with bursting columns.
     """
+    profiler = self._profiler
+    if profiler is not None:
+      profiler.start()
+
     # Handle reset first (should be sent with an empty signal)
     if "resetIn" in inputs:
       assert len(inputs["resetIn"]) == 1
@@ -435,6 +458,9 @@ class ColumnPoolerRegion(PyRegion):
         self.reset()
         outputs["feedForwardOutput"][:] = 0
         outputs["activeCells"][:] = 0
+        if profiler is not None:
+          profiler.lap("reset")
+          profiler.count("resets")
         return
 
     feedforwardInput = numpy.asarray(inputs["feedforwardInput"].nonzero()[0],
@@ -461,11 +487,20 @@ class ColumnPoolerRegion(PyRegion):
     else:
       predictedInput = None
 
+    if profiler is not None:
+      profiler.lap("inputConversion")
+      if self.learningMode:
+        numSynapses = self._countSynapses()
+      profiler.resume()
+
     # Send the inputs into the Column Pooler.
     self._pooler.compute(feedforwardInput, lateralInputs,
                          feedforwardGrowthCandidates, learn=self.learningMode,
                          predictedInput = predictedInput)
 
+    if profiler is not None:
+      profiler.lap("compute")
+
     # Extract the active / predicted cells and put them into binary arrays.
     outputs["activeCells"][:] = 0
     outputs["activeCells"][self._pooler.getActiveCells()] = 1
@@ -476,6 +511,27 @@ class ColumnPoolerRegion(PyRegion):
     else:
       raise Exception("Unknown outputType: " + self.defaultOutputType)
 
+    if profiler is not None:
+      profiler.lap("outputConversion")
+      profiler.count("feedforwardInputBits", len(feedforwardInput))
+      profiler.count("activeCells", len(self._pooler.getActiveCells()))
+      if self.learningMode:
+        proximalSynapses, distalSynapses = self._countSynapses()
+        profiler.count("proximalSynapsesGrown",
+                       proximalSynapses - numSynapses[0])
+        profiler.count("distalSynapsesGrown", distalSynapses - numSynapses[1])
+
+
+  def _countSynapses(self):
+    """
+    Returns the total number of proximal and distal synapses of the pooler.
+    """
+    proximal = self._pooler.proximalPermanences.nNonZeros()
+    distal = self._pooler.internalDistalPermanences.nNonZeros()
+    for permanences in self._pooler.distalPermanences:
+      distal += permanences.nNonZeros()
+    return proximal, distal
+
 
   def reset(self):
     """ Reset the state of the layer"""
@@ -489,6 +545,9 @@ class ColumnPoolerRegion(PyRegion):
     automatically by PyRegion's parameter get mechanism. The ones that need
     special treatment are explicitly handled here.
     """
+    if parameterName == "profile":
+      return self._profiler.toJson() if self._profiler is not None else "{}"
+
     return PyRegion.getParameter(self, parameterName, index)
 
 
@@ -501,6 +560,15 @@ class ColumnPoolerRegion(PyRegion):
     else:
       raise Exception("Unknown parameter: " + parameterName)
 
+    if parameterName == "enableProfiling":
+      self._profiler = RegionProfiler() if parameterValue else None
+
+
+  def resetProfile(self):
+    """ Clear the profiling timers and counters """
+    if self._profiler is not None:
+      self._profiler.reset()
+
 
   def getOutputElementCount(self, name):
     """
@@ -37,6 +37,10 @@ class CoordinateSensorRegion(PyRegion):
 
   Each data record consists of the coordinate in an N-dimensional integer
   coordinate space, a 0/1 reset flag, and an integer sequence ID.
+
+  Many records can also be queued at once with addBatchToQueue(), as one array
+  of coordinates. The records of a batch are read directly from the arrays, in
+  order with the records queued individually.
   """
 
   def __init__(self,
@@ -131,14 +135,30 @@ class CoordinateSensorRegion(PyRegion):
     @param outputs See definition in the spec above.
     """
     if len(self.queue) > 0:
-      data = self.queue.pop()
+      data = self.queue[-1]
 
     else:
       raise Exception("CoordinateSensor: No data to encode: queue is empty")
 
+    if "coordinates" in data:
+      # Read the next record of a batch
+      record = data["position"]
+      data["position"] = record + 1
+      if data["position"] == len(data["coordinates"]):
+        self.queue.pop()
+
+      data = {
+        "sequenceId": data["sequenceIds"][record],
+        "reset": data["resets"][record],
+        "coordinate": data["coordinates"][record],
+      }
+
+    else:
+      self.queue.pop()
+
     outputs["resetOut"][0] = data["reset"]
     outputs["sequenceIdOut"][0] = data["sequenceId"]
-    sdr = self.encoder.encode((numpy.array(data["coordinate"]), self.radius))
+    sdr = self.encoder.encode((numpy.asarray(data["coordinate"]), self.radius))
     outputs["dataOut"][:] = sdr
 
     if self.verbosity > 1:
@@ -176,6 +196,40 @@ class CoordinateSensorRegion(PyRegion):
       "coordinate": coordinateList,
     })
 
+  def addBatchToQueue(self, coordinates, resets=None, sequenceIds=None):
+    """
+    Add many data items to the sensor's internal queue at once. Calls to
+    compute will encode the records in order, after any item already in the
+    queue.
+
+    @param coordinates (numpy array) The integer coordinates of the records, one
+                       per row
+    @param resets      (numpy array) A 0/1 reset flag per record. Optional,
+                       defaults to no resets.
+    @param sequenceIds (numpy array) The sequence ID of each record. Optional,
+                       defaults to 0.
+    """
+    coordinates = numpy.asarray(coordinates, dtype="int64")
+    numRecords = len(coordinates)
+    if numRecords == 0:
+      return
+
+    if resets is None:
+      resets = numpy.zeros(numRecords, dtype="int")
+    if sequenceIds is None:
+      sequenceIds = numpy.zeros(numRecords, dtype="int")
+
+    if len(resets) != numRecords or len(sequenceIds) != numRecords:
+      raise Exception("CoordinateSensor.addBatchToQueue: resets and "
+                      "sequenceIds must have one entry per record")
+
+    self.queue.appendleft({
+      "coordinates": coordinates,
+      "resets": numpy.asarray(resets, dtype="int"),
+      "sequenceIds": numpy.asarray(sequenceIds, dtype="int"),
+      "position": 0,
+    })
+
   def addResetToQueue(self, sequenceId):
     """
     Add a reset signal to the sensor's internal queue. Calls to compute
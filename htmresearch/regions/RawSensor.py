@@ -20,6 +20,9 @@
 # ----------------------------------------------------------------------
 
 from collections import deque
+
+import numpy
+
 from nupic.bindings.regions.PyRegion import PyRegion
 
 
@@ -33,6 +36,10 @@ class RawSensor(PyRegion):
 
   Each data record consists of the non-zero indices of the sparse vector,
   a 0/1 reset flag, and an integer sequence ID.
+
+  Many records can also be queued at once with addBatchToQueue(), as CSR-style
+  arrays. The records of a batch are read directly from the arrays, in order
+  with the records queued individually.
   """
 
   def __init__(self,
@@ -108,16 +115,33 @@ class RawSensor(PyRegion):
     """
     if len(self.queue) > 0:
       # Take the top element of the data queue
-      data = self.queue.pop()
+      data = self.queue[-1]
 
     else:
       raise Exception("RawSensor: No data to encode: queue is empty ")
 
-    # Copy data into output vectors
-    outputs["resetOut"][0] = data["reset"]
-    outputs["sequenceIdOut"][0] = data["sequenceId"]
-    outputs["dataOut"][:] = 0
-    outputs["dataOut"][data["nonZeros"]] = 1
+    if "indptr" in data:
+      # Read the next record of a batch
+      record = data["position"]
+      begin = data["indptr"][record]
+      end = data["indptr"][record + 1]
+      outputs["resetOut"][0] = data["resets"][record]
+      outputs["sequenceIdOut"][0] = data["sequenceIds"][record]
+      outputs["dataOut"][:] = 0
+      outputs["dataOut"][data["indices"][begin:end]] = 1
+
+      data["position"] = record + 1
+      if data["position"] == len(data["resets"]):
+        self.queue.pop()
+
+    else:
+      self.queue.pop()
+
+      # Copy data into output vectors
+      outputs["resetOut"][0] = data["reset"]
+      outputs["sequenceIdOut"][0] = data["sequenceId"]
+      outputs["dataOut"][:] = 0
+      outputs["dataOut"][data["nonZeros"]] = 1
 
     if self.verbosity > 1:
       print "RawSensor outputs:"
@@ -132,9 +156,9 @@ class RawSensor(PyRegion):
     will cause items in the queue to be dequeued in FIFO order.
 
     @param nonZeros   A list of the non-zero elements corresponding
-                      to the sparse output. This list can be specified in two
-                      ways, as a python list of integers or as a string which
-                      can evaluate to a python list of integers.
+                      to the sparse output. This list can be specified as a
+                      python list or numpy array of integers or as a string
+                      which can evaluate to a python list of integers.
     @param reset      An int or string that is 0 or 1. resetOut will be set to
                       this value when this item is computed.
     @param sequenceId An int or string with an integer ID associated with this
@@ -142,7 +166,7 @@ class RawSensor(PyRegion):
     """
     if type(nonZeros) == type(""):
       nonZeroList = eval(nonZeros)
-    elif type(nonZeros) == type([]):
+    elif type(nonZeros) == type([]) or isinstance(nonZeros, numpy.ndarray):
       nonZeroList = nonZeros
     else:
       raise Exception("RawSensor.addDataToQueue: unknown type for nonZeros")
@@ -154,6 +178,45 @@ class RawSensor(PyRegion):
     })
 
 
+  def addBatchToQueue(self, indices, indptr, resets=None, sequenceIds=None):
+    """
+    Add many data items to the sensor's internal queue at once, in CSR format:
+    the non-zero elements of record i are indices[indptr[i]:indptr[i+1]].
+    Calls to compute will output the records in order, after any item already
+    in the queue.
+
+    @param indices     (numpy array) The non-zero elements of all the records,
+                       concatenated
+    @param indptr      (numpy array) Offsets of each record in indices, of
+                       length numRecords + 1
+    @param resets      (numpy array) A 0/1 reset flag per record. Optional,
+                       defaults to no resets.
+    @param sequenceIds (numpy array) The sequence ID of each record. Optional,
+                       defaults to 0.
+    """
+    indptr = numpy.asarray(indptr, dtype="int64")
+    numRecords = len(indptr) - 1
+    if numRecords <= 0:
+      return
+
+    if resets is None:
+      resets = numpy.zeros(numRecords, dtype="int")
+    if sequenceIds is None:
+      sequenceIds = numpy.zeros(numRecords, dtype="int")
+
+    if len(resets) != numRecords or len(sequenceIds) != numRecords:
+      raise Exception("RawSensor.addBatchToQueue: resets and sequenceIds must "
+                      "have one entry per record")
+
+    self.queue.appendleft({
+      "indices": numpy.asarray(indices, dtype="int64"),
+      "indptr": indptr,
+      "resets": numpy.asarray(resets, dtype="int"),
+      "sequenceIds": numpy.asarray(sequenceIds, dtype="int"),
+      "position": 0,
+    })
+
+
   def addResetToQueue(self, sequenceId):
     """
     Add a reset signal to the sensor's internal queue. Calls to compute
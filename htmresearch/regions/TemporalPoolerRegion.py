@@ -27,6 +27,7 @@ from nupic.bindings.regions.PyRegion import PyRegion
 
 from htmresearch.algorithms.union_temporal_pooler import UnionTemporalPooler
 from htmresearch.algorithms.simple_union_pooler import SimpleUnionPooler
+from htmresearch.support.region_profiler import RegionProfiler
 from htmresearch.support.union_temporal_pooler_monitor_mixin import (
   UnionTemporalPoolerMonitorMixin)
 
@@ -239,6 +240,22 @@ def _getAdditionalSpecs(poolerClass=_getDefaultPoolerClass(), poolerType="union"
       count=1,
       constraints="bool"),
 
+    enableProfiling=dict(
+      description="1 to record the time spent in each phase of compute along "
+                  "with activity counters (default 0).",
+      accessMode="ReadWrite",
+      dataType="UInt32",
+      count=1,
+      constraints="bool"),
+
+    profile=dict(
+      description="JSON string with the phase timers and counters recorded "
+                  "while enableProfiling is 1.",
+      accessMode="Read",
+      dataType="Byte",
+      count=0,
+      constraints=""),
+
 
 
   )
@@ -276,7 +293,7 @@ class TemporalPoolerRegion(PyRegion):
   """
 
   def __init__(self, columnCount, inputWidth, historyLength,
-               minHistory, poolerType, **kwargs):
+               minHistory, poolerType, enableProfiling=False, **kwargs):
 
     if columnCount <= 0 or inputWidth <=0:
       raise TypeError("Parameters columnCount and inputWidth must be > 0")
@@ -307,6 +324,9 @@ class TemporalPoolerRegion(PyRegion):
     # pooler instance
     self._pooler = None
 
+    self.enableProfiling = enableProfiling
+    self._profiler = RegionProfiler() if enableProfiling else None
+
 
   def initialize(self):
     """
@@ -335,6 +355,10 @@ class TemporalPoolerRegion(PyRegion):
     at the next compute will start fresh.
     """
 
+    profiler = self._profiler
+    if profiler is not None:
+      profiler.start()
+
     resetSignal = False
     if 'resetIn' in inputs:
       if len(inputs['resetIn']) != 1:
@@ -350,20 +374,57 @@ class TemporalPoolerRegion(PyRegion):
       self._pooler.unionIntoArray(inputs["activeCells"],
                                   outputs["mostActiveCells"],
                                   forceOutput = resetSignal)
+
+      if profiler is not None:
+        profiler.lap("compute")
     else:
       predictedActiveCells = inputs["predictedActiveCells"] if (
         "predictedActiveCells" in inputs) else numpy.zeros(self._inputWidth,
                                                            dtype=uintDType)
 
+      if profiler is not None:
+        profiler.lap("inputConversion")
+
       mostActiveCellsIndices = self._pooler.compute(inputs["activeCells"],
                                                     predictedActiveCells,
                                                     self.learningMode)
 
+      if profiler is not None:
+        profiler.lap("compute")
+
       outputs["mostActiveCells"][mostActiveCellsIndices] = 1
 
+    if profiler is not None:
+      profiler.lap("outputConversion")
+
     if resetSignal:
         self.reset()
 
+    if profiler is not None:
+      if resetSignal:
+        profiler.lap("reset")
+        profiler.count("resets")
+      profiler.count("mostActiveCells",
+                     numpy.count_nonzero(outputs["mostActiveCells"]))
+
+
+  def getParameter(self, parameterName, index=-1):
+    """
+    Get the value of a NodeSpec parameter. Most parameters are handled
+    automatically by PyRegion's parameter get mechanism. The ones that need
+    special treatment are explicitly handled here.
+    """
+    if parameterName == "profile":
+      return self._profiler.toJson() if self._profiler is not None else "{}"
+
+    return PyRegion.getParameter(self, parameterName, index)
+
+
+  def resetProfile(self):
+    """Clear the profiling timers and counters."""
+    if self._profiler is not None:
+      self._profiler.reset()
+
 
   def reset(self):
     """Reset the history of the underlying pooling class."""
@@ -430,6 +491,11 @@ class TemporalPoolerRegion(PyRegion):
       ),
 
       parameters=dict(),
+
+      commands=dict(
+        resetProfile=dict(description="Clear the profiling timers and "
+                                      "counters."),
+      ),
     )
 
     return spec
@@ -464,6 +530,9 @@ class TemporalPoolerRegion(PyRegion):
     else:
       raise Exception("Unknown parameter: " + parameterName)
 
+    if parameterName == "enableProfiling":
+      self._profiler = RegionProfiler() if parameterValue else None
+
 
   def getOutputElementCount(self, name):
     return self._columnCount
@@ -25,14 +25,15 @@ Apical Temporal Memory pair mixin that enables detailed monitoring of history.
 
 from collections import defaultdict
 
-import copy
-
+import numpy
 from prettytable import PrettyTable
 
 from nupic.algorithms.monitor_mixin.metric import Metric
 from nupic.algorithms.monitor_mixin.monitor_mixin_base import MonitorMixinBase
-from nupic.algorithms.monitor_mixin.trace import (IndicesTrace, CountsTrace,
-                                                BoolsTrace, StringsTrace)
+from nupic.algorithms.monitor_mixin.trace import (CountsTrace, BoolsTrace,
+                                                StringsTrace)
+
+from htmresearch.support.csr_indices_trace import CSRIndices, CSRIndicesTrace
 
 
 
@@ -286,51 +287,62 @@ class ApicalTMPairMonitorMixin(MonitorMixinBase):
     if not self._mmTransitionTracesStale:
       return
 
-    self._mmData["predictedActiveCellsForSequence"] = defaultdict(set)
+    activeColumns = self.mmGetTraceActiveColumns().data
+    predictedCells = self._mmTraces["predictedCells"].data
+    numSteps = len(activeColumns)
+    numColumns = self.numberOfColumns()
+
+    # Key each (timestep, column) pair, so that every timestep is handled by
+    # the same set operations.
+    activeColumnKeys = (activeColumns.rows() * numColumns +
+                        activeColumns.indices)
+    predictedCellSteps = predictedCells.rows()
+    predictedColumns = predictedCells.indices / self.getCellsPerColumn()
+    predictedColumnKeys = predictedCellSteps * numColumns + predictedColumns
+
+    correct = numpy.in1d(predictedColumnKeys, activeColumnKeys)
+    predictedActiveColumnKeys = numpy.unique(predictedColumnKeys[correct])
+    predictedInactiveColumnKeys = numpy.unique(predictedColumnKeys[~correct])
+    unpredictedActiveColumnKeys = activeColumnKeys[
+      ~numpy.in1d(activeColumnKeys, predictedActiveColumnKeys)]
+
+    def makeTrace(title, steps, indices):
+      return CSRIndicesTrace(self, title, CSRIndices.fromRowsAndIndices(
+        steps, indices, numSteps))
+
+    self._mmTraces["predictedActiveCells"] = makeTrace(
+      "predicted => active cells (correct)",
+      predictedCellSteps[correct], predictedCells.indices[correct])
+    self._mmTraces["predictedInactiveCells"] = makeTrace(
+      "predicted => inactive cells (extra)",
+      predictedCellSteps[~correct], predictedCells.indices[~correct])
+    self._mmTraces["predictedActiveColumns"] = makeTrace(
+      "predicted => active columns (correct)",
+      predictedActiveColumnKeys / numColumns,
+      predictedActiveColumnKeys % numColumns)
+    self._mmTraces["predictedInactiveColumns"] = makeTrace(
+      "predicted => inactive columns (extra)",
+      predictedInactiveColumnKeys / numColumns,
+      predictedInactiveColumnKeys % numColumns)
+    self._mmTraces["unpredictedActiveColumns"] = makeTrace(
+      "unpredicted => active columns (bursting)",
+      unpredictedActiveColumnKeys / numColumns,
+      unpredictedActiveColumnKeys % numColumns)
+
+    # Group the predicted => active cells by the sequence label of their step
+    labelIds = {}
+    stepLabelIds = numpy.array(
+      [labelIds.setdefault(label, len(labelIds)) if label is not None else -1
+       for label in self.mmGetTraceSequenceLabels().data], dtype="int64")
+    correctLabelIds = stepLabelIds[predictedCellSteps[correct]]
+    correctCells = predictedCells.indices[correct]
 
-    self._mmTraces["predictedActiveCells"] = IndicesTrace(self,
-      "predicted => active cells (correct)")
-    self._mmTraces["predictedInactiveCells"] = IndicesTrace(self,
-      "predicted => inactive cells (extra)")
-    self._mmTraces["predictedActiveColumns"] = IndicesTrace(self,
-      "predicted => active columns (correct)")
-    self._mmTraces["predictedInactiveColumns"] = IndicesTrace(self,
-      "predicted => inactive columns (extra)")
-    self._mmTraces["unpredictedActiveColumns"] = IndicesTrace(self,
-      "unpredicted => active columns (bursting)")
-
-    predictedCellsTrace = self._mmTraces["predictedCells"]
-
-    for i, activeColumns in enumerate(self.mmGetTraceActiveColumns().data):
-      predictedActiveCells = set()
-      predictedInactiveCells = set()
-      predictedActiveColumns = set()
-      predictedInactiveColumns = set()
-
-      for predictedCell in predictedCellsTrace.data[i]:
-        predictedColumn = self.columnForCell(predictedCell)
-
-        if predictedColumn  in activeColumns:
-          predictedActiveCells.add(predictedCell)
-          predictedActiveColumns.add(predictedColumn)
-
-          sequenceLabel = self.mmGetTraceSequenceLabels().data[i]
-          if sequenceLabel is not None:
-            self._mmData["predictedActiveCellsForSequence"][sequenceLabel].add(
-              predictedCell)
-        else:
-          predictedInactiveCells.add(predictedCell)
-          predictedInactiveColumns.add(predictedColumn)
-
-      unpredictedActiveColumns = set(activeColumns) - set(predictedActiveColumns)
-
-      self._mmTraces["predictedActiveCells"].data.append(predictedActiveCells)
-      self._mmTraces["predictedInactiveCells"].data.append(predictedInactiveCells)
-      self._mmTraces["predictedActiveColumns"].data.append(predictedActiveColumns)
-      self._mmTraces["predictedInactiveColumns"].data.append(
-        predictedInactiveColumns)
-      self._mmTraces["unpredictedActiveColumns"].data.append(
-        unpredictedActiveColumns)
+    self._mmData["predictedActiveCellsForSequence"] = defaultdict(set)
+    for label, labelId in labelIds.iteritems():
+      cells = correctCells[correctLabelIds == labelId]
+      if len(cells) > 0:
+        self._mmData["predictedActiveCellsForSequence"][label].update(
+          cells.astype(int).tolist())
 
     self._mmTransitionTracesStale = False
 
@@ -351,9 +363,8 @@ class ApicalTMPairMonitorMixin(MonitorMixinBase):
       activeColumns, basalInput, apicalInput, basalGrowthCandidates,
       apicalGrowthCandidates, learn)
 
-    self._mmTraces["predictedCells"].data.append(
-      set(self.getPredictedCells()))
-    self._mmTraces["activeCells"].data.append(set(self.getActiveCells()))
+    self._mmTraces["predictedCells"].data.append(self.getPredictedCells())
+    self._mmTraces["activeCells"].data.append(self.getActiveCells())
     self._mmTraces["activeColumns"].data.append(activeColumns)
     self._mmTraces["numBasalSegments"].data.append(
       self.basalConnections.numSegments())
@@ -412,9 +423,9 @@ class ApicalTMPairMonitorMixin(MonitorMixinBase):
   def mmClearHistory(self):
     super(ApicalTMPairMonitorMixin, self).mmClearHistory()
 
-    self._mmTraces["activeColumns"] = IndicesTrace(self, "active columns")
-    self._mmTraces["activeCells"] = IndicesTrace(self, "active cells")
-    self._mmTraces["predictedCells"] = IndicesTrace(self, "predicted cells")
+    self._mmTraces["activeColumns"] = CSRIndicesTrace(self, "active columns")
+    self._mmTraces["activeCells"] = CSRIndicesTrace(self, "active cells")
+    self._mmTraces["predictedCells"] = CSRIndicesTrace(self, "predicted cells")
     self._mmTraces["numBasalSegments"] = CountsTrace(self, "# basal segments")
     self._mmTraces["numBasalSynapses"] = CountsTrace(self, "# basal synapses")
     self._mmTraces["numApicalSegments"] = CountsTrace(self, "# apical segments")
@@ -447,9 +458,8 @@ class ApicalTMPairMonitorMixin(MonitorMixinBase):
     if activityType == "predictedActiveCells":
       self._mmComputeTransitionTraces()
 
-    cellTrace = copy.deepcopy(self._mmTraces[activityType].data)
-    for i in xrange(len(cellTrace)):
-      cellTrace[i] = self.getCellIndices(cellTrace[i])
+    cellTrace = [self.getCellIndices(cells)
+                 for cells in self._mmTraces[activityType].data]
 
     return self.mmGetCellTracePlot(cellTrace, self.numberOfCells(),
                                    activityType, title, showReset,
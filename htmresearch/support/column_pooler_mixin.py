@@ -25,14 +25,14 @@ ColumnPooler mixin that enables detailed monitoring of history.
 
 from collections import defaultdict
 
-import copy
-
 from prettytable import PrettyTable
 
 from nupic.algorithms.monitor_mixin.metric import Metric
 from nupic.algorithms.monitor_mixin.monitor_mixin_base import MonitorMixinBase
-from nupic.algorithms.monitor_mixin.trace import (IndicesTrace, CountsTrace,
-                                                BoolsTrace, StringsTrace)
+from nupic.algorithms.monitor_mixin.trace import (CountsTrace, BoolsTrace,
+                                                StringsTrace)
+
+from htmresearch.support.csr_indices_trace import CSRIndicesTrace
 
 
 class ColumnPoolerMonitorMixin(MonitorMixinBase):
@@ -129,7 +129,7 @@ class ColumnPoolerMonitorMixin(MonitorMixinBase):
     super(ColumnPoolerMonitorMixin, self).compute(
       feedforwardInput, lateralInputs, feedforwardGrowthCandidates, learn)
 
-    self._mmTraces["activeCells"].data.append(set(self.getActiveCells()))
+    self._mmTraces["activeCells"].data.append(self.getActiveCells())
 
     self._mmTraces["numDistalSegments"].data.append(
       self.numberOfDistalSegments())
@@ -184,7 +184,7 @@ class ColumnPoolerMonitorMixin(MonitorMixinBase):
   def mmClearHistory(self):
     super(ColumnPoolerMonitorMixin, self).mmClearHistory()
 
-    self._mmTraces["activeCells"] = IndicesTrace(self, "active cells")
+    self._mmTraces["activeCells"] = CSRIndicesTrace(self, "active cells")
     self._mmTraces["numDistalSegments"] = CountsTrace(self, "# distal segments")
     self._mmTraces["numDistalSynapses"] = CountsTrace(self, "# distal synapses")
     self._mmTraces["numConnectedDistalSynapses"] = CountsTrace(
@@ -218,9 +218,8 @@ class ColumnPoolerMonitorMixin(MonitorMixinBase):
     @return (Plot) plot
     """
 
-    cellTrace = copy.deepcopy(self._mmTraces[activityType].data)
-    for i in xrange(len(cellTrace)):
-      cellTrace[i] = self.getCellIndices(cellTrace[i])
+    cellTrace = [self.getCellIndices(cells)
+                 for cells in self._mmTraces[activityType].data]
 
     return self.mmGetCellTracePlot(cellTrace, self.numberOfCells(),
                                    activityType, title, showReset,
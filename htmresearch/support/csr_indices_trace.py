@@ -0,0 +1,190 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Array-backed indices traces for the monitor mixins.
+"""
+
+import numpy
+import scipy.sparse
+
+from nupic.algorithms.monitor_mixin.trace import IndicesTrace, CountsTrace
+
+
+
+class CSRIndices(object):
+  """
+  Append-only list of sets of indices, stored CSR-style: one uint32 array with
+  the sorted indices of every entry, and an array of offsets into it. Entry i
+  is indices[offsets[i]:offsets[i+1]].
+
+  Reading an entry returns a set, so this can be used in place of a list of
+  sets.
+  """
+
+  def __init__(self, indices=None, offsets=None):
+    """
+    @param indices (numpy array)
+    @param offsets (numpy array)
+    Optional initial contents, in the format described above.
+    """
+    if indices is None:
+      indices = numpy.empty(0, dtype="uint32")
+      offsets = numpy.zeros(1, dtype="int64")
+
+    self._size = len(offsets) - 1
+    self._numIndices = int(offsets[-1])
+    self._offsets = numpy.zeros(max(len(offsets), 64), dtype="int64")
+    self._offsets[:len(offsets)] = offsets
+    self._indices = numpy.empty(max(len(indices), 1024), dtype="uint32")
+    self._indices[:len(indices)] = indices
+
+
+  @staticmethod
+  def fromRowsAndIndices(rows, indices, numRows):
+    """
+    Build a CSRIndices from parallel arrays of entries and indices.
+
+    @param rows (numpy array) The entry of each index, in [0, numRows)
+    @param indices (numpy array)
+    @param numRows (int) Number of entries, including empty ones
+
+    @return (CSRIndices)
+    """
+    rows = numpy.asarray(rows, dtype="int64")
+    indices = numpy.asarray(indices, dtype="int64")
+    if len(indices) > 0:
+      keys = numpy.unique(rows * (indices.max() + 1) + indices)
+      rows = keys // (indices.max() + 1)
+      indices = keys % (indices.max() + 1)
+    offsets = numpy.searchsorted(rows, numpy.arange(numRows + 1))
+    return CSRIndices(indices.astype("uint32"), offsets)
+
+
+  @property
+  def indices(self):
+    """
+    @return (numpy array) The indices of all entries, concatenated
+    """
+    return self._indices[:self._numIndices]
+
+
+  @property
+  def offsets(self):
+    """
+    @return (numpy array) len(self) + 1 offsets into self.indices
+    """
+    return self._offsets[:self._size + 1]
+
+
+  def append(self, indices):
+    """
+    @param indices (iterable) Indices of the new entry. Duplicates are dropped.
+    """
+    indices = numpy.unique(numpy.fromiter(indices, dtype="uint32")
+                           if isinstance(indices, (set, frozenset))
+                           else numpy.asarray(indices, dtype="uint32"))
+
+    end = self._numIndices + len(indices)
+    if end > len(self._indices):
+      self._indices = numpy.resize(self._indices,
+                                   max(end, 2 * len(self._indices)))
+    if self._size + 2 > len(self._offsets):
+      self._offsets = numpy.resize(self._offsets, 2 * len(self._offsets))
+
+    self._indices[self._numIndices:end] = indices
+    self._numIndices = end
+    self._size += 1
+    self._offsets[self._size] = end
+
+
+  def getIndices(self, i):
+    """
+    @return (numpy array) Sorted indices of entry i, without copying
+    """
+    if i < 0:
+      i += self._size
+    if not 0 <= i < self._size:
+      raise IndexError("CSRIndices index out of range")
+    return self._indices[self._offsets[i]:self._offsets[i + 1]]
+
+
+  def counts(self):
+    """
+    @return (numpy array) Number of indices in each entry
+    """
+    return numpy.diff(self.offsets)
+
+
+  def rows(self):
+    """
+    @return (numpy array) The entry of each index in self.indices
+    """
+    return numpy.repeat(numpy.arange(self._size), self.counts())
+
+
+  def toSparseMatrix(self, numColumns):
+    """
+    @return (scipy.sparse.csr_matrix)
+    A binary len(self) x numColumns matrix with one row per entry.
+    """
+    return scipy.sparse.csr_matrix(
+      (numpy.ones(self._numIndices, dtype="int32"), self.indices,
+       self.offsets), shape=(self._size, numColumns))
+
+
+  def __len__(self):
+    return self._size
+
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return [self[j] for j in xrange(*i.indices(self._size))]
+    return set(self.getIndices(i).astype(int).tolist())
+
+
+  def __iter__(self):
+    offsets = self.offsets
+    for i in xrange(self._size):
+      yield set(self._indices[offsets[i]:offsets[i + 1]].astype(int).tolist())
+
+
+
+class CSRIndicesTrace(IndicesTrace):
+  """
+  IndicesTrace whose data is a CSRIndices rather than a list of sets.
+  """
+
+  def __init__(self, monitor, title, data=None):
+    """
+    @param data (CSRIndices) Optional initial contents
+    """
+    super(CSRIndicesTrace, self).__init__(monitor, title)
+    self.data = data if data is not None else CSRIndices()
+
+
+  def makeCountsTrace(self):
+    """
+    @return (CountsTrace) A new Trace made up of counts of this trace's indices.
+    """
+    trace = CountsTrace(self.monitor, "# {0}".format(self.title))
+    trace.data = self.data.counts().tolist()
+    return trace
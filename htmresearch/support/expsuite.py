@@ -48,6 +48,40 @@ def convert_param_to_dirname(param):
     else:
         return re.sub("0+$", '0', '%f'%param)
 
+def encode_history_column(values):
+    """ Helper function to store the values of one tag as a numpy array. Columns
+        of ints, floats or bools get a numeric array, everything else (None,
+        strings, lists, mixed types) an object array, so that tolist() always
+        gives back the logged values.
+    """
+    valuetypes = set(type(v) for v in values)
+    if valuetypes and (valuetypes <= set([int, long]) or
+                       valuetypes == set([float]) or valuetypes == set([bool])):
+        try:
+            return array(values)
+        except OverflowError:
+            pass
+    column = empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        column[i] = v
+    return column
+
+def aggregate_columns(histories, aggregate):
+    """ Helper function to apply an aggregation function to every column of a
+        2D array. Functions that accept an axis argument, like numpy's mean or
+        max, are applied to all columns at once.
+    """
+    try:
+        aggregated = aggregate(histories, axis=0)
+        if shape(aggregated) == (histories.shape[1],):
+            return asarray(aggregated, dtype=float)
+    except TypeError:
+        pass
+    aggregated = zeros(histories.shape[1])
+    for i in range(histories.shape[1]):
+        aggregated[i] = aggregate(histories[:, i])
+    return aggregated
+
 
 class PyExperimentSuite(object):
     
@@ -57,6 +91,8 @@ class PyExperimentSuite(object):
     def __init__(self):
         # list of keys, that had to be renamed because they contained spaces
         self.key_warning_issued = []
+        # parsed log files, see get_history_columns()
+        self.history_cache = {}
     
     def parse_opt(self):
         """ parses the command line options for different settings. """
@@ -167,6 +203,72 @@ class PyExperimentSuite(object):
         cfgp.write(f)
         f.close()
                 
+    def get_history_columns(self, exp, rep):
+        """ returns the log of one experiment and one repetition as a tuple
+            (number of logged iterations, dictionary of numpy arrays), with
+            one array per tag and None where an iteration did not log the tag.
+            returns None if the log file does not exist.
+
+            The log file is only parsed when it changed since it was last
+            read. The parsed columns are kept in memory and in a
+            '<rep>.log.npz' file next to the log, keyed by the log file's
+            modification time and size.
+        """
+        logfile = os.path.join(exp, '%i.log'%rep)
+        try:
+            stat = os.stat(logfile)
+        except OSError:
+            return None
+        key = array([stat.st_mtime, stat.st_size], dtype=float)
+
+        cache = getattr(self, 'history_cache', None)
+        if cache is None:
+            cache = self.history_cache = {}
+        if logfile in cache and (cache[logfile][0] == key).all():
+            return cache[logfile][1]
+
+        history = None
+        cachefile = logfile + '.npz'
+        try:
+            data = load(cachefile, allow_pickle=True)
+            if (data['key'] == key).all():
+                tags = data['tags'].tolist()
+                columns = dict((tag, data['c%i'%i]) for i, tag in enumerate(tags))
+                history = (int(data['length']), columns)
+            data.close()
+        except Exception:
+            # missing, outdated format or unreadable cache, parse the log
+            history = None
+
+        if history is None:
+            f = open(logfile)
+            lines = [json.loads(line) for line in f]
+            f.close()
+
+            tags = []
+            for dic in lines:
+                tags.extend(tag for tag in dic if tag not in tags)
+            columns = dict((tag, encode_history_column([dic.get(tag) for dic in lines]))
+                           for tag in tags)
+            history = (len(lines), columns)
+
+            arrays = dict(('c%i'%i, columns[tag]) for i, tag in enumerate(tags))
+            arrays['key'] = key
+            arrays['length'] = array(len(lines))
+            arrays['tags'] = encode_history_column(tags)
+            try:
+                tmpname = '%s.%i.tmp'%(cachefile, os.getpid())
+                f = open(tmpname, 'wb')
+                savez(f, **arrays)
+                f.close()
+                os.rename(tmpname, cachefile)
+            except (IOError, OSError):
+                # the cache is only an optimization, e.g. for read-only results
+                pass
+
+        cache[logfile] = (key, history)
+        return history
+
     def get_history(self, exp, rep, tags):
         """ returns the whole history for one experiment and one repetition.
             tags can be a string or a list of strings. if tags is a string,
@@ -180,42 +282,49 @@ class PyExperimentSuite(object):
             raise SystemExit('experiment %s not found.'%exp)         
         
         # make list of tags, even if it is only one
-        if tags != 'all' and not hasattr(tags, '__iter__'):
+        alltags = (tags == 'all')
+        if not alltags and not hasattr(tags, '__iter__'):
             tags = [tags] 
         
-        results = {}
-        logfile = os.path.join(exp, '%i.log'%rep)
-        try:
-            f = open(logfile)
-        except IOError:
-            if len(tags) == 1:
+        history = self.get_history_columns(exp, rep)
+        if history is None or history[0] == 0:
+            if not alltags and len(tags) == 1:
                 return []
             else:
                 return {}
 
-        for line in f:
-            dic = json.loads(line)
-            for tag in tags:
-              if not tag in results:
-                results[tag] = []
-
-              if tag in dic:
-                results[tag].append(dic[tag])
-              else:
-                results[tag].append(None)
-                            
-        f.close()
-        if len(results) == 0:
-            if len(tags) == 1:
-                return []
+        length, columns = history
+        if alltags:
+            tags = columns.keys()
+
+        results = {}
+        for tag in tags:
+            if tag in columns:
+                results[tag] = columns[tag].tolist()
             else:
-                return {}
-            # raise ValueError('tag(s) not found: %s'%str(tags))
-        if len(tags) == 1:
-            return results[results.keys()[0]]
+                results[tag] = [None] * length
+
+        if not alltags and len(tags) == 1:
+            return results[tags[0]]
         else:
             return results
     
+    def get_history_array(self, exp, rep, tag):
+        """ like get_history(..) for a single tag, but returns the history as
+            a numpy array. numeric histories are returned as numeric arrays,
+            all others as object arrays. a missing log file or an empty log
+            gives an empty array.
+        """
+        history = self.get_history_columns(exp, rep)
+        if history is None or history[0] == 0:
+            return zeros(0)
+
+        length, columns = history
+        if tag in columns:
+            return columns[tag]
+        else:
+            return encode_history_column([None] * length)
+    
     
     def get_history_tags(self, exp, rep=0):
         """ returns all available tags (logging keys) of the given experiment 
@@ -320,37 +429,28 @@ class PyExperimentSuite(object):
         results = {}
         for tag in tags:
             # get all histories
-            histories = zeros((params['repetitions'], params['iterations']))
-            skipped = []
+            iterations = params['iterations']
+            histories = []
             for i in range(params['repetitions']):
-                try:
-                    histories[i, :] = self.get_history(exp, i, tag)
-                except ValueError:
-                    h = self.get_history(exp, i, tag)
-                    if len(h) == 0:
-                        # history not existent, skip it
-                        print('warning: history %i has length 0 (expected: %i). it will be skipped.'%(i, params['iterations'])) 
-                        skipped.append(i)
-                    elif len(h) > params['iterations']:
-                        # if history too long, crop it 
-                        print('warning: history %i has length %i (expected: %i). it will be truncated.'%(i, len(h), params['iterations']))
-                        h = h[:params['iterations']]
-                        histories[i,:] = h
-                    elif len(h) < params['iterations']:
-                        # if history too short, crop everything else
-                        print('warning: history %i has length %i (expected: %i). all other histories will be truncated.'%(i, len(h), params['iterations']))
-                        params['iterations'] = len(h)
-                        histories = histories[:,:params['iterations']]
-                        histories[i, :] = h
-            
-            # remove all rows that have been skipped
-            histories = delete(histories, skipped, axis=0)
-            params['repetitions'] -= len(skipped)
+                h = self.get_history_array(exp, i, tag)
+                if len(h) == 0:
+                    # history not existent, skip it
+                    print('warning: history %i has length 0 (expected: %i). it will be skipped.'%(i, iterations)) 
+                    continue
+                elif len(h) > iterations:
+                    # if history too long, crop it 
+                    print('warning: history %i has length %i (expected: %i). it will be truncated.'%(i, len(h), iterations))
+                elif len(h) < iterations:
+                    # if history too short, crop everything else
+                    print('warning: history %i has length %i (expected: %i). all other histories will be truncated.'%(i, len(h), iterations))
+                    iterations = len(h)
+                histories.append(h)
+
+            histories = array([h[:iterations] for h in histories], dtype=float)
+            histories = histories.reshape(len(histories), iterations)
                 
             # calculate result from each column with aggregation function
-            aggregated = zeros(params['iterations'])
-            for i in range(params['iterations']):
-                aggregated[i] = aggregate(histories[:, i])
+            aggregated = aggregate_columns(histories, aggregate)
             
             # if only one tag is requested, return list immediately, otherwise append to dictionary
             if len(tags) == 1:
@@ -25,6 +25,7 @@ Common functions used in the neural_correlations project
 
 import random
 import numpy as np
+import scipy.sparse
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
@@ -140,29 +141,126 @@ def generateRandomSequence(numSymbols, numColumns, sparsity):
   return sequence
 
 
-def computePWCorrelations(spikeTrains, removeAutoCorr):
+def _correlationBlockFunction(spikeTrains, dtype):
+  """
+  Prepares a spike train matrix for block-wise computation of pairwise
+  correlations.
+  
+  The correlation of two cells follows from their coactivity count and their
+  first and second moments. Over T time-steps,
+  T^2 cov(i, j) = T sum_t x_i x_j - sum_t x_i sum_t x_j
+  For spike counts every term is an integer, which float64 holds exactly, so a
+  pair without covariance has a correlation of exactly 0 and the sign of each
+  correlation does not depend on the input format, the block size or dtype.
+  
+  @param spikeTrains (array, scipy.sparse matrix or SpikeTrainStore) numCells x
+         timeSteps matrix of spike trains
+  @param dtype (string) dtype of the correlation blocks
+  @return correlationBlock (function) takes two slices or arrays of cell indices
+          (rows, cols) and returns the len(rows) x len(cols) matrix of Pearson
+          correlation coefficients. Pairs with a silent cell are 0.
+  """
+  if isinstance(spikeTrains, SpikeTrainStore):
+    spikeTrains = spikeTrains.toCSR()
+
+  if scipy.sparse.issparse(spikeTrains):
+    # Never densify the spike trains.
+    spikeTrains = scipy.sparse.csr_matrix(spikeTrains, dtype="float64")
+    spikeTrains.eliminate_zeros()
+    sums = np.asarray(spikeTrains.sum(axis=1)).ravel()
+    squares = np.asarray(spikeTrains.multiply(spikeTrains).sum(axis=1)).ravel()
+    active = np.diff(spikeTrains.indptr) > 0
+
+    def coactivityBlock(rows, cols):
+      return (spikeTrains[rows] * spikeTrains[cols].T).toarray()
+  else:
+    spikeTrains = np.asarray(spikeTrains, dtype="float64")
+    sums = spikeTrains.sum(axis=1)
+    squares = np.einsum("ij,ij->i", spikeTrains, spikeTrains)
+    active = np.any(spikeTrains != 0, axis=1)
+
+    def coactivityBlock(rows, cols):
+      return np.dot(spikeTrains[rows], spikeTrains[cols].T)
+
+  numSteps = spikeTrains.shape[1]
+  variances = numSteps * squares - sums * sums
+
+  def correlationBlock(rows, cols):
+    covariance = (numSteps * coactivityBlock(rows, cols) -
+                  np.outer(sums[rows], sums[cols]))
+    # Cells that fire at every time-step have no variance, so (as with
+    # np.corrcoef) their correlations are NaN.
+    with np.errstate(divide="ignore", invalid="ignore"):
+      block = covariance / np.sqrt(np.outer(variances[rows], variances[cols]))
+    # A silent cell's zero covariance would otherwise be NaN too.
+    block[~active[rows], :] = 0
+    block[:, ~active[cols]] = 0
+    with np.errstate(invalid="ignore"):
+      np.clip(block, -1, 1, out=block)
+    return block.astype(dtype)
+
+  return correlationBlock
+
+
+def _finalizeCorrelations(corrMatrix, removeAutoCorr):
+  """
+  Sets the diagonal of a correlation matrix and counts its negative entries.
+  
+  @param corrMatrix (array) numCells x numCells correlation matrix
+  @param removeAutoCorr (boolean) if true, the diagonal is set to zero
+  @return numNegPCC (int) number of negative pairwise correlations
+  """
+  diagonal = corrMatrix.diagonal().copy()
+  if removeAutoCorr:
+    diagonal[:] = 0
+  else:
+    # A cell is perfectly correlated with itself, up to rounding.
+    with np.errstate(invalid="ignore"):
+      diagonal[diagonal > 0] = 1
+  np.fill_diagonal(corrMatrix, diagonal)
+  with np.errstate(invalid="ignore"):
+    return int(np.count_nonzero(corrMatrix < 0))
+
+
+def computePWCorrelations(spikeTrains, removeAutoCorr, blockSize=1024,
+                          dtype="float64"):
   """
   Computes pairwise correlations from spikeTrains
   
-  @param spikeTrains (array) spike trains obtained from the activation of cells in the TM
-         the array dimensions are: numCells x timeSteps
+  The correlations are computed from the coactivity counts and spike counts of
+  the cells, one blockSize x blockSize tile at a time, so the only large array
+  is the result. They agree with np.corrcoef up to floating point rounding, but
+  pairs without covariance are exactly 0, so numNegPCC is the exact number of
+  pairs with a negative covariance for any input format, blockSize and dtype.
+  
+  @param spikeTrains (array, scipy.sparse matrix or SpikeTrainStore) spike trains obtained
+         from the activation of cells in the TM. The array dimensions are: numCells x timeSteps.
+         Sparse (e.g. CSR) spike trains and stores are never converted to a dense matrix.
   @param removeAutoCorr (boolean) if true, auto-correlations are removed by substracting
          the diagonal of the correlation matrix         
+  @param blockSize (int) number of cells per tile
+  @param dtype (string) dtype of the correlation matrix. Use "float32" to halve
+         the memory used for large numbers of cells.
   @return corrMatrix (array) numCells x numCells matrix containing the Pearson correlation
           coefficient of spike trains of cell i and cell j
   @return numNegPCC (int) number of negative pairwise correlations (PCC(i,j) < 0)
   """
   numCells = np.shape(spikeTrains)[0]
-  corrMatrix = np.zeros((numCells, numCells))
-  numNegPCC = 0
-  for i in range(numCells):
-    for j in range(numCells):
-      if i == j and removeAutoCorr == True:
-        continue
-      if not all(spikeTrains[i,:] == 0) and not all(spikeTrains[j,:] == 0):
-        corrMatrix[i,j] = np.corrcoef(spikeTrains[i,:], spikeTrains[j,:])[0,1]    
-        if corrMatrix[i,j] < 0:
-          numNegPCC += 1
+  corrMatrix = np.zeros((numCells, numCells), dtype=dtype)
+  correlationBlock = _correlationBlockFunction(spikeTrains, dtype)
+
+  # The matrix is symmetric, so only compute the tiles on and above the
+  # diagonal.
+  for rowStart in xrange(0, numCells, blockSize):
+    rows = slice(rowStart, min(rowStart + blockSize, numCells))
+    for colStart in xrange(rowStart, numCells, blockSize):
+      cols = slice(colStart, min(colStart + blockSize, numCells))
+      block = correlationBlock(rows, cols)
+      corrMatrix[rows, cols] = block
+      if colStart != rowStart:
+        corrMatrix[cols, rows] = block.T
+
+  numNegPCC = _finalizeCorrelations(corrMatrix, removeAutoCorr)
   return (corrMatrix, numNegPCC)
 
   
@@ -233,44 +331,226 @@ def sampleCellsAcrossColumns(numCellPairs, cellsPerColumn, numColumns, seed=42):
   return cellPairs
 
 
-def subSample(spikeTrains, numCells, totalCells, currentTS, timeWindow):
+class SpikeTrainStore(object):
   """
-  Obtains a random sample of cells from the whole spike train matrix consisting of numCells cells
-  from the start of simulation time up to currentTS
+  A numCells x timeSteps binary spike train matrix stored as packed bits (one
+  bit per cell per time-step, 32x smaller than a uint32 matrix), optionally
+  memory-mapped to a .npy file.
   
-  @param spikeTrains (array) array containing the spike trains of cells in the TM
-  @param numCells (int) number of cells to be sampled from the matrix of spike trains
-  @param totalCells (int) total number of cells in the TM
-  @param currentTS (int) time-step upper bound of sample (sample will go from time-step 0 up to currentTS)
-  @param timeWindow (int) number of time-steps to sample from the spike trains
-  @return subSpikeTrains (array) spike train matrix sampled from the total spike train matrix
+  Time windows and cell subsamples are views: they share the packed bits and
+  only record which cells and time-steps they cover, so creating one takes
+  O(1) time (or O(cells) for a subsample). The bits are unpacked when a view
+  is converted with toDense() or toCSR(). computeEntropy, computeISI,
+  computePWCorrelations, computePWCorrelationsWithinCol, subSample and
+  subSampleWholeColumn all accept a store in place of a spike train matrix.
+  """
+
+  def __init__(self, numCells, numSteps, filename=None):
+    """
+    @param numCells (int) number of cells
+    @param numSteps (int) number of time-steps
+    @param filename (string) if specified, the bits are kept in a memory-mapped
+           .npy file, which can be reopened with SpikeTrainStore.load
+    """
+    shape = (numCells, (numSteps + 7) / 8)
+    if filename is None:
+      packed = np.zeros(shape, dtype="uint8")
+    else:
+      packed = np.lib.format.open_memmap(filename, mode="w+", dtype="uint8",
+                                         shape=shape)
+    self._setView(packed, numSteps, None, 0, numSteps)
+
+
+  def _setView(self, packed, totalSteps, cells, start, stop):
+    self.packed = packed
+    self.totalSteps = totalSteps
+    self.cells = cells
+    self.start = start
+    self.stop = stop
+
+
+  def _view(self, cells, start, stop):
+    view = SpikeTrainStore.__new__(SpikeTrainStore)
+    view._setView(self.packed, self.totalSteps, cells, start, stop)
+    return view
+
+
+  @classmethod
+  def load(cls, filename, numSteps, mode="r"):
+    """
+    Opens a store that was created with a filename.
+    
+    @param filename (string) the store's .npy file
+    @param numSteps (int) number of time-steps in the store
+    @param mode (string) memory-map mode, e.g. "r" or "r+"
+    @return store (SpikeTrainStore)
+    """
+    store = cls.__new__(cls)
+    store._setView(np.load(filename, mmap_mode=mode), numSteps, None, 0,
+                   numSteps)
+    return store
+
+
+  @classmethod
+  def fromDense(cls, spikeTrains, filename=None):
+    """
+    @param spikeTrains (array) numCells x timeSteps matrix, nonzero entries are spikes
+    @return store (SpikeTrainStore)
+    """
+    numCells, numSteps = np.shape(spikeTrains)
+    store = cls(numCells, numSteps, filename)
+    store.packed[:] = np.packbits(np.asarray(spikeTrains) != 0, axis=1)
+    return store
+
+
+  @property
+  def shape(self):
+    numCells = (self.packed.shape[0] if self.cells is None
+                else self.cells.size)
+    return (numCells, self.stop - self.start)
+
+
+  def _absoluteCells(self, cells):
+    if self.cells is None:
+      return np.asarray(cells)
+    return self.cells[cells]
+
+
+  def setActiveCells(self, timeStep, activeCells):
+    """
+    Records the spikes of one time-step.
+    
+    @param timeStep (int) time-step, relative to the start of this view
+    @param activeCells (iterable) indices of the cells that fire, relative to
+           this view. Cells that are not listed keep their previous value.
+    """
+    t = self.start + timeStep
+    activeCells = np.unique(np.fromiter(activeCells, dtype="int"))
+    cells = self._absoluteCells(activeCells)
+    self.packed[cells, t / 8] |= np.uint8(0x80 >> (t % 8))
+
+
+  def window(self, start, stop):
+    """
+    @param start (int) first time-step, relative to this view
+    @param stop (int) time-step after the last one, relative to this view
+    @return view (SpikeTrainStore) the same cells over time-steps [start, stop)
+    """
+    if not 0 <= start <= stop <= self.stop - self.start:
+      raise ValueError("Invalid time window", start, stop)
+    return self._view(self.cells, self.start + start, self.start + stop)
+
+
+  def subsample(self, cellIndices):
+    """
+    @param cellIndices (array) indices of cells, relative to this view
+    @return view (SpikeTrainStore) these cells over the same time-steps
+    """
+    cells = self._absoluteCells(np.asarray(cellIndices, dtype="int"))
+    return self._view(np.atleast_1d(cells), self.start, self.stop)
+
+
+  def iterDenseBlocks(self, blockSize=4096, dtype="uint32"):
+    """
+    Unpacks the view a few cells at a time.
+    
+    @param blockSize (int) number of cells per block
+    @return generator of (firstCell, block) where block is a
+            blockSize x timeSteps matrix of the given dtype
+    """
+    numCells, numSteps = self.shape
+    byteStart = self.start / 8
+    byteStop = (self.stop + 7) / 8
+    bitOffset = self.start - 8 * byteStart
+    for firstCell in xrange(0, numCells, blockSize):
+      cells = slice(firstCell, min(firstCell + blockSize, numCells))
+      if self.cells is None:
+        packed = self.packed[cells, byteStart:byteStop]
+      else:
+        packed = self.packed[self.cells[cells], byteStart:byteStop]
+      bits = np.unpackbits(packed, axis=1)[:, bitOffset:bitOffset + numSteps]
+      yield firstCell, bits.astype(dtype)
+
+
+  def toDense(self, dtype="uint32"):
+    """
+    @return spikeTrains (array) numCells x timeSteps matrix
+    """
+    dense = np.zeros(self.shape, dtype=dtype)
+    for firstCell, block in self.iterDenseBlocks(dtype=dtype):
+      dense[firstCell:firstCell + block.shape[0]] = block
+    return dense
+
+
+  def toCSR(self, blockSize=4096):
+    """
+    Converts the view into a CSR matrix without unpacking more than blockSize
+    cells at a time.
+    
+    @return spikeTrains (scipy.sparse.csr_matrix) numCells x timeSteps matrix
+    """
+    blocks = [scipy.sparse.csr_matrix(block)
+              for _, block in self.iterDenseBlocks(blockSize, dtype="uint8")]
+    if len(blocks) == 0:
+      return scipy.sparse.csr_matrix(self.shape, dtype="uint8")
+    return scipy.sparse.vstack(blocks, format="csr")
+
+
+  def spikeCounts(self):
+    """
+    @return counts (array) number of spikes of each cell in this view
+    """
+    counts = np.zeros(self.shape[0], dtype="int64")
+    for firstCell, block in self.iterDenseBlocks(dtype="uint8"):
+      counts[firstCell:firstCell + block.shape[0]] = block.sum(axis=1)
+    return counts
+
+
+
+def _sampleWindow(totalTS, currentTS, timeWindow):
+  """
+  Chooses the time-steps sampled by subSample and subSampleWholeColumn.
+  
+  @return (start, stop) time-steps [start, stop) of the sample
   """
-  indices = np.random.permutation(np.arange(totalCells))
   if currentTS > 0 and currentTS < timeWindow:
-    subSpikeTrains = np.zeros((numCells, currentTS), dtype = "uint32")
-    for i in range(numCells):
-      subSpikeTrains[i,:] = spikeTrains[indices[i],:]
+    return 0, currentTS
   elif currentTS > 0 and currentTS >= timeWindow:
-    subSpikeTrains = np.zeros((numCells, timeWindow), dtype = "uint32")    
-    for i in range(numCells):
-      subSpikeTrains[i,:] = spikeTrains[indices[i],(currentTS-timeWindow):currentTS]
+    return currentTS - timeWindow, currentTS
   elif currentTS == 0:
     # This option takes the whole spike train history
-    totalTS = np.shape(spikeTrains)[1]
-    subSpikeTrains = np.zeros((numCells, totalTS), dtype = "uint32")
-    for i in range(numCells):
-      subSpikeTrains[i,:] = spikeTrains[indices[i],:]
-  elif currentTS < 0:
+    return 0, totalTS
+  else:
     # This option takes a timestep at random and a time window 
     # specified by the user after the chosen time step
-    totalTS = np.shape(spikeTrains)[1]
-    subSpikeTrains = np.zeros((numCells, timeWindow), dtype = "uint32")
     rnd = random.randrange(totalTS - timeWindow)
     print "Starting from timestep: " + str(rnd)
-    for i in range(numCells):
-      subSpikeTrains[i,:] = spikeTrains[indices[i],rnd:(rnd+timeWindow)]
-    
-  return subSpikeTrains
+    return rnd, rnd + timeWindow
+
+
+def _sampleSpikeTrains(spikeTrains, cells, currentTS, timeWindow):
+  start, stop = _sampleWindow(np.shape(spikeTrains)[1], currentTS, timeWindow)
+  if isinstance(spikeTrains, SpikeTrainStore):
+    return spikeTrains.subsample(cells).window(start, stop)
+  return np.asarray(spikeTrains)[cells, start:stop].astype("uint32")
+
+
+def subSample(spikeTrains, numCells, totalCells, currentTS, timeWindow):
+  """
+  Obtains a random sample of cells from the whole spike train matrix consisting of numCells cells
+  from the start of simulation time up to currentTS
+  
+  @param spikeTrains (array or SpikeTrainStore) array containing the spike trains of cells in the TM
+  @param numCells (int) number of cells to be sampled from the matrix of spike trains
+  @param totalCells (int) total number of cells in the TM
+  @param currentTS (int) time-step upper bound of sample (sample will go from time-step 0 up to currentTS)
+  @param timeWindow (int) number of time-steps to sample from the spike trains
+  @return subSpikeTrains (array or SpikeTrainStore) spike train matrix sampled from the total spike
+          train matrix. A SpikeTrainStore input returns a view of the store.
+  """
+  indices = np.random.permutation(np.arange(totalCells))
+  return _sampleSpikeTrains(spikeTrains, indices[:numCells], currentTS,
+                            timeWindow)
 
 
 def subSampleWholeColumn(spikeTrains, colIndices, cellsPerColumn, currentTS, timeWindow):
@@ -278,62 +558,32 @@ def subSampleWholeColumn(spikeTrains, colIndices, cellsPerColumn, currentTS, tim
   Obtains subsample from matrix of spike trains by considering the cells in columns specified
   by colIndices. Thus, it returns a matrix of spike trains of cells within the same column.
     
-  @param spikeTrains (array) array containing the spike trains of cells in the TM
+  @param spikeTrains (array or SpikeTrainStore) array containing the spike trains of cells in the TM
   @param colIndices (array) array containing the indices of columns whose spike trains should be sampled
   @param cellsPerColumn (int) number of cells per column in the TM
   @param currentTS (int) time-step upper bound of sample (sample will go from time-step 0 up to currentTS)
   @param timeWindow (int) number of time-steps to sample from the spike trains
-  @return subSpikeTrains (array) spike train matrix sampled from the total spike train matrix
+  @return subSpikeTrains (array or SpikeTrainStore) spike train matrix sampled from the total spike
+          train matrix. A SpikeTrainStore input returns a view of the store.
   """
-  numColumns = np.shape(colIndices)[0]
-  numCells = numColumns * cellsPerColumn
-
-  if currentTS > 0 and currentTS < timeWindow:
-    subSpikeTrains = np.zeros((numCells, currentTS), dtype = "uint32")
-    for i in range(numColumns):
-      currentCol = colIndices[i]
-      initialCell = cellsPerColumn * currentCol
-      for j in range(cellsPerColumn):
-        subSpikeTrains[(cellsPerColumn*i) + j,:] = spikeTrains[initialCell + j,:]
-  elif currentTS > 0 and currentTS >= timeWindow:
-    subSpikeTrains = np.zeros((numCells, timeWindow), dtype = "uint32")
-    for i in range(numColumns):
-      currentCol = colIndices[i]
-      initialCell = cellsPerColumn * currentCol
-      for j in range(cellsPerColumn):
-        subSpikeTrains[(cellsPerColumn*i) + j,:] = spikeTrains[initialCell + j,(currentTS-timeWindow):currentTS]
-  elif currentTS == 0:
-    # This option takes the whole spike train history
-    totalTS = np.shape(spikeTrains)[1]
-    subSpikeTrains = np.zeros((numCells, totalTS), dtype = "uint32")
-    for i in range(numColumns):
-      currentCol = colIndices[i]
-      initialCell = cellsPerColumn * currentCol
-      for j in range(cellsPerColumn):
-        subSpikeTrains[(cellsPerColumn*i) + j,:] = spikeTrains[initialCell + j,:]
-  elif currentTS < 0:
-    totalTS = np.shape(spikeTrains)[1]
-    subSpikeTrains = np.zeros((numCells, timeWindow), dtype = "uint32")
-    rnd = random.randrange(totalTS - timeWindow)
-    print "Starting from timestep: " + str(rnd)
-    for i in range(numColumns):
-      currentCol = colIndices[i]
-      initialCell = cellsPerColumn * currentCol
-      for j in range(cellsPerColumn):
-        subSpikeTrains[(cellsPerColumn*i) + j,:] = spikeTrains[initialCell + j,rnd:(rnd+timeWindow)]
-    
-  return subSpikeTrains
+  cells = (cellsPerColumn * np.asarray(colIndices, dtype="int")[:, np.newaxis] +
+           np.arange(cellsPerColumn)).ravel()
+  return _sampleSpikeTrains(spikeTrains, cells, currentTS, timeWindow)
 
 
 def computeEntropy(spikeTrains):
   """
   Estimates entropy in spike trains.
   
-  @param spikeTrains (array) matrix of spike trains
+  @param spikeTrains (array or SpikeTrainStore) matrix of spike trains
   @return entropy (float) entropy
   """
   MIN_ACTIVATION_PROB = 0.000001
-  activationProb = np.mean(spikeTrains, 1)
+  if isinstance(spikeTrains, SpikeTrainStore):
+    activationProb = (spikeTrains.spikeCounts() /
+                      float(spikeTrains.shape[1]))
+  else:
+    activationProb = np.mean(spikeTrains, 1)
   activationProb[activationProb < MIN_ACTIVATION_PROB] = MIN_ACTIVATION_PROB
   activationProb = activationProb / np.sum(activationProb)
   entropy = -np.dot(activationProb, np.log2(activationProb))
@@ -344,27 +594,30 @@ def computeISI(spikeTrains):
   """
   Estimates the inter-spike interval from a spike train matrix.
   
-  @param spikeTrains (array) matrix of spike trains
+  @param spikeTrains (array or SpikeTrainStore) matrix of spike trains
   @return isi (array) matrix with the inter-spike interval obtained from the spike train.
           Each entry in this matrix represents the number of time-steps in-between 2 spikes
           as the algorithm scans the spike train matrix.
   """
-  zeroCount = 0
-  isi = []
-  cells = 0
-  for i in range(np.shape(spikeTrains)[0]):
-    if cells > 0 and cells % 250 == 0:
-      print str(cells) + " cells processed"
-    for j in range(np.shape(spikeTrains)[1]):
-      if spikeTrains[i][j] == 0:
-        zeroCount += 1
-      elif zeroCount > 0:
-        isi.append(zeroCount)
-        zeroCount = 0
-    zeroCount = 0
-    cells += 1
+  if isinstance(spikeTrains, SpikeTrainStore):
+    spikeTrains = spikeTrains.toCSR()
+  else:
+    spikeTrains = scipy.sparse.csr_matrix(np.asarray(spikeTrains))
+  spikeTrains.eliminate_zeros()
+  spikeTrains.sort_indices()
+
+  # Each spike ends a run of silent time-steps, which started after the
+  # previous spike of the same cell (or at the first time-step). Silent runs
+  # after a cell's last spike are not intervals.
+  spikeTimes = spikeTrains.indices.astype("int64")
+  previousSpikeTimes = np.empty_like(spikeTimes)
+  previousSpikeTimes[1:] = spikeTimes[:-1]
+  firstSpikes = spikeTrains.indptr[:-1][np.diff(spikeTrains.indptr) > 0]
+  previousSpikeTimes[firstSpikes] = -1
+  intervals = spikeTimes - previousSpikeTimes - 1
+
   print "**All cells processed**"
-  return isi
+  return intervals[intervals > 0].tolist()
 
 
 def poissonSpikeGenerator(firingRate, nBins, nTrials):
@@ -541,35 +794,32 @@ def inputAnalysis(allSequences, model, numColumns):
   return overlapMatrix  
   
 
-def computePWCorrelationsWithinCol(spikeTrains, removeAutoCorr, cellsPerColumn):
+def computePWCorrelationsWithinCol(spikeTrains, removeAutoCorr, cellsPerColumn,
+                                   dtype="float64"):
   """
   Computes pairwise correlations from spikeTrains
   
-  @param spikeTrains (array) spike trains obtained from the activation of cells in the TM
-     the array dimensions are: numCells x timeSteps
+  Only pairs of cells in the same column are computed, one column at a time,
+  as in computePWCorrelations.
+  
+  @param spikeTrains (array, scipy.sparse matrix or SpikeTrainStore) spike trains obtained
+     from the activation of cells in the TM. The array dimensions are: numCells x timeSteps
   @param removeAutoCorr (boolean) if true, auto-correlations are removed by substracting
      the diagonal of the correlation matrix
   @param cellsPerColumn (int) number of cells per column in thr TM
+  @param dtype (string) dtype of the correlation matrix
   @return corrMatrix (array) numCells x numCells matrix containing the Pearson correlation
       coefficient of spike trains of cell i and cell j
   @return numNegPCC (int) number of negative pairwise correlations (PCC(i,j) < 0)
   """
   numCells = np.shape(spikeTrains)[0]
   numCols = numCells / cellsPerColumn
-  corrMatrix = np.zeros((numCells, numCells))
-  numNegPCC = 0
-  indices = np.zeros(cellsPerColumn, dtype="uint32")
-  
-  for col in range(numCols):
-    for k in range(cellsPerColumn):
-      indices[k] = (cellsPerColumn * col) + k
-    for i in indices:
-      for j in indices:
-        if i == j and removeAutoCorr == True:
-          continue
-        if not all(spikeTrains[i,:] == 0) and not all(spikeTrains[j,:] == 0):          
-          corrMatrix[i,j] = np.corrcoef(spikeTrains[i,:], spikeTrains[j,:])[0,1]  
-          if corrMatrix[i,j] < 0:
-            numNegPCC += 1
-          
+  corrMatrix = np.zeros((numCells, numCells), dtype=dtype)
+  correlationBlock = _correlationBlockFunction(spikeTrains, dtype)
+
+  for col in xrange(numCols):
+    cells = slice(cellsPerColumn * col, cellsPerColumn * (col + 1))
+    corrMatrix[cells, cells] = correlationBlock(cells, cells)
+
+  numNegPCC = _finalizeCorrelations(corrMatrix, removeAutoCorr)
   return (corrMatrix, numNegPCC)
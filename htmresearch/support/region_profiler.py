@@ -0,0 +1,124 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Opt-in instrumentation of the sub-phases of a region's compute.
+"""
+
+import json
+import time
+
+
+
+class RegionProfiler(object):
+  """
+  Accumulates the time spent in each sub-phase of a region's compute, along
+  with event counters (active cells, synapses grown, ...).
+
+  Regions only hold a RegionProfiler while profiling is enabled, so when it is
+  disabled the cost is a single check per phase.
+
+  Example
+  =======
+
+  profiler.start()
+  # ... convert the inputs ...
+  profiler.lap("inputConversion")
+  # ... run the algorithm ...
+  profiler.lap("compute")
+  profiler.count("activeCells", len(activeCells))
+  """
+
+  def __init__(self):
+    self.reset()
+
+
+  def reset(self):
+    """
+    Clears all timers and counters.
+    """
+    self.numComputes = 0
+    self.timers = {}
+    self.counters = {}
+    self._lastTime = None
+
+
+  def start(self):
+    """
+    Marks the beginning of a compute.
+    """
+    self.numComputes += 1
+    self._lastTime = time.time()
+
+
+  def lap(self, phase):
+    """
+    Adds the time elapsed since the last call to start(), lap() or resume() to
+    the given phase.
+
+    @param phase (string)
+    Name of the phase that just finished
+    """
+    now = time.time()
+    self.timers[phase] = self.timers.get(phase, 0.0) + (now - self._lastTime)
+    self._lastTime = now
+
+
+  def resume(self):
+    """
+    Restarts the clock without recording the time elapsed since the last lap,
+    e.g. to leave out the time spent gathering counters.
+    """
+    self._lastTime = time.time()
+
+
+  def count(self, counter, value=1):
+    """
+    Adds value to the given counter.
+
+    @param counter (string)
+    Name of the counter
+
+    @param value (int)
+    Amount to add
+    """
+    self.counters[counter] = self.counters.get(counter, 0) + int(value)
+
+
+  def toDict(self):
+    """
+    @return (dict)
+    The number of computes, the total time in seconds of each phase and the
+    totals of each counter.
+    """
+    return {
+      "numComputes": self.numComputes,
+      "timers": dict(self.timers),
+      "counters": dict(self.counters),
+    }
+
+
+  def toJson(self):
+    """
+    @return (string)
+    The result of toDict() as a JSON string.
+    """
+    return json.dumps(self.toDict(), sort_keys=True)
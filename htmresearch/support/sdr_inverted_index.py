@@ -0,0 +1,157 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Decode a set of active cells against many stored SDRs at once"""
+
+import numpy as np
+
+
+
+class SDRInvertedIndex(object):
+  """
+  Stores a cell -> SDR inverted index over a dict of learned representations,
+  so that the overlap of a set of active cells with every stored SDR can be
+  computed in a single pass over the active cells' postings, rather than by
+  intersecting the active cells with each SDR in turn.
+
+  Each key may map to a single SDR or to a list of SDRs. For a list, the score
+  of the key is the best score among its SDRs.
+  """
+
+  def __init__(self, representations):
+    """
+    @param representations (dict)
+    Maps a key to an SDR, or to a list of SDRs. For example,
+    PIUNExperiment.locationRepresentations or
+    PIUNExperiment.inputRepresentations.
+    """
+    self.keys = []
+    sdrs = []
+    sdrKeys = []
+    for key, value in representations.iteritems():
+      if isinstance(value, list):
+        for sdr in value:
+          sdrs.append(sdr)
+          sdrKeys.append(len(self.keys))
+      else:
+        sdrs.append(value)
+        sdrKeys.append(len(self.keys))
+      self.keys.append(key)
+
+    # The indexed values, and the SDRs of the lists among them. Holding on to
+    # them means a replaced value can't be mistaken for the indexed one.
+    self.indexedValues = [(key, value,
+                           list(value) if isinstance(value, list) else None)
+                          for key, value in representations.iteritems()]
+    self.sdrKeys = np.array(sdrKeys, dtype="int")
+    self.sdrSizes = np.array([len(sdr) for sdr in sdrs], dtype="float")
+
+    # Postings, sorted by cell. The SDRs containing cell c are
+    # postingSDRs[cellOffsets[c]:cellOffsets[c+1]].
+    uniqueSDRs = [np.unique(np.asarray(sdr, dtype="int")) for sdr in sdrs]
+    if len(uniqueSDRs) > 0:
+      cells = np.concatenate(uniqueSDRs)
+      postingSDRs = np.repeat(np.arange(len(uniqueSDRs)),
+                              [len(sdr) for sdr in uniqueSDRs])
+    else:
+      cells = np.empty(0, dtype="int")
+      postingSDRs = np.empty(0, dtype="int")
+
+    order = np.argsort(cells, kind="mergesort")
+    self.postingSDRs = postingSDRs[order]
+    numCells = (cells.max() + 1) if cells.size > 0 else 0
+    self.cellOffsets = np.zeros(numCells + 1, dtype="int")
+    np.cumsum(np.bincount(cells, minlength=numCells) if numCells > 0
+              else np.empty(0, dtype="int"),
+              out=self.cellOffsets[1:])
+
+
+  def isCurrent(self, representations):
+    """
+    Check whether the representations changed since they were indexed. A key
+    must still map to the same object, and a list must still hold the same
+    SDRs. SDRs that are modified in place aren't detected.
+
+    @return (bool)
+    True if this index still describes the given representations.
+    """
+    if len(representations) != len(self.indexedValues):
+      return False
+
+    for key, value, sdrs in self.indexedValues:
+      if key not in representations or representations[key] is not value:
+        return False
+      if sdrs is not None and (len(value) != len(sdrs) or
+                               any(a is not b for a, b in zip(value, sdrs))):
+        return False
+
+    return True
+
+
+  def overlaps(self, activeCells):
+    """
+    Count how many of the active cells are in each stored SDR.
+
+    @param activeCells (numpy array)
+
+    @return (numpy array)
+    The overlap of each stored SDR, in insertion order.
+    """
+    if self.sdrSizes.size == 0:
+      return np.zeros(0, dtype="int")
+
+    activeCells = np.unique(np.asarray(activeCells, dtype="int"))
+    numCells = self.cellOffsets.size - 1
+    activeCells = activeCells[activeCells < numCells]
+
+    starts = self.cellOffsets[activeCells]
+    lengths = self.cellOffsets[activeCells + 1] - starts
+
+    # Gather every posting of every active cell without a Python loop.
+    total = lengths.sum()
+    postingStarts = np.cumsum(lengths) - lengths
+    postings = (np.repeat(starts - postingStarts, lengths) +
+                np.arange(total, dtype="int"))
+
+    return np.bincount(self.postingSDRs[postings],
+                       minlength=self.sdrSizes.size)
+
+
+  def containment(self, activeCells):
+    """
+    Compute the fraction of each key's SDR that is contained in the active
+    cells.
+
+    @param activeCells (numpy array)
+
+    @return (numpy array)
+    One score per key, in the order of self.keys. Keys with a list of SDRs get
+    the best score among their SDRs. Keys with an empty list get 0. An empty
+    SDR is fully contained in any set of active cells.
+    """
+    overlaps = self.overlaps(activeCells)
+    sdrContainment = np.ones(self.sdrSizes.size, dtype="float")
+    nonEmpty = self.sdrSizes > 0
+    sdrContainment[nonEmpty] = overlaps[nonEmpty] / self.sdrSizes[nonEmpty]
+
+    keyContainment = np.zeros(len(self.keys), dtype="float")
+    np.maximum.at(keyContainment, self.sdrKeys, sdrContainment)
+    return keyContainment
@@ -0,0 +1,59 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Segment activity shared by the temporal memories and location modules"""
+
+import numpy as np
+
+
+def computeSegmentActivity(connections, activeInput, connectedPermanence):
+  """
+  Count the active connected synapses and the active potential synapses on
+  every segment.
+
+  This is equivalent to calling connections.computeActivity twice, once with
+  and once without the connectedPermanence, but the permanence matrix is only
+  read once: each active input's column of permanences is extracted once and
+  both counts are taken from it.
+
+  @param connections (SparseMatrixConnections)
+  @param activeInput (numpy array)
+  @param connectedPermanence (float)
+
+  @return (tuple)
+  - overlaps (numpy array)
+    The number of active connected synapses for each segment.
+
+  - potentialOverlaps (numpy array)
+    The number of active potential synapses for each segment.
+  """
+  numSegments = connections.matrix.nRows()
+  overlaps = np.zeros(numSegments, dtype="int32")
+  potentialOverlaps = np.zeros(numSegments, dtype="int32")
+
+  # Compare in the permanences' own precision, as computeActivity does.
+  connectedPermanence = np.float32(connectedPermanence)
+  for inputIndex in activeInput:
+    permanences = connections.matrix.getCol(int(inputIndex))
+    potentialOverlaps += permanences > 0
+    overlaps += permanences >= connectedPermanence
+
+  return overlaps, potentialOverlaps
@@ -21,14 +21,16 @@
 # ----------------------------------------------------------------------
 
 import copy
+import multiprocessing
 import os
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import matplotlib as mpl
 
 from htmresearch.frameworks.sp_paper.sp_metrics import (
-calculateInputOverlapMat, percentOverlap
+calculateInputOverlapMat, percentOverlap, getSynapseMatrix
 )
 from nupic.bindings.math import GetNTAReal
 
@@ -279,10 +281,105 @@ def analyzeReceptiveFieldCorrelatedInputs(
 
 
 
-def runSPOnBatch(sp, inputVectors, learn, sdrOrders=None, verbose=0):
+_batchSP = None
+_batchInputVectors = None
+_batchOutputFile = None
+
+
+def _initBatchWorker(sp, inputVectors, outputFile):
+  global _batchSP, _batchInputVectors, _batchOutputFile
+  _batchSP = sp
+  _batchInputVectors = inputVectors
+  _batchOutputFile = outputFile
+
+
+def _runBatchShardWorker(shard):
+  start, stop = shard
+  outputColumns = np.load(_batchOutputFile, mmap_mode="r+")
+  for i in xrange(start, stop):
+    _batchSP.compute(_batchInputVectors[i], False, outputColumns[i])
+  outputColumns.flush()
+  del outputColumns
+  return stop - start
+
+
+
+def runSPInference(sp, inputVectors, numProcesses=None, filename=None,
+                   shardSize=1024, verbose=0):
+  """
+  Run the SP with learning off on every input vector, in parallel. Since the
+  SP does not change, the workers are forked with a snapshot of it and of the
+  input vectors (copy-on-write, nothing is serialized), each worker computes
+  shards of rows and writes them straight into a memory-mapped output array.
+
+  :param sp: sp instance
+  :param inputVectors: 2D array of input vectors
+  :param numProcesses: number of worker processes, defaults to cpu_count()
+  :param filename: .npy file for the outputs. If None, a temporary file is
+                   used and the outputs are returned as an in-memory array.
+  :param shardSize: number of input vectors per task
+  :return: numInputVector x numColumns array of outputs, memory-mapped to
+           filename if one was given
+  """
+  numInputVector, inputSize = inputVectors.shape
+  numColumns = np.prod(sp.getColumnDimensions())
+  if numProcesses is None:
+    numProcesses = multiprocessing.cpu_count()
+
+  if filename is None:
+    fd, outputFile = tempfile.mkstemp(suffix=".npy")
+    os.close(fd)
+  else:
+    outputFile = filename
+
+  try:
+    outputColumns = np.lib.format.open_memmap(
+      outputFile, mode="w+", dtype=uintType,
+      shape=(numInputVector, numColumns))
+    outputColumns.flush()
+
+    shards = [(start, min(start + shardSize, numInputVector))
+              for start in xrange(0, numInputVector, shardSize)]
+    pool = multiprocessing.Pool(numProcesses, _initBatchWorker,
+                                (sp, inputVectors, outputFile))
+    try:
+      numFinished = 0
+      for numComputed in pool.imap_unordered(_runBatchShardWorker, shards):
+        numFinished += numComputed
+        if verbose > 0:
+          print "{} % finished".format(
+            100 * float(numFinished) / float(numInputVector))
+    finally:
+      pool.close()
+      pool.join()
+
+    if filename is None:
+      outputColumns = np.array(outputColumns)
+  finally:
+    if filename is None:
+      os.remove(outputFile)
+
+  return outputColumns
+
+
+
+def runSPOnBatch(sp, inputVectors, learn, sdrOrders=None, verbose=0,
+                 numProcesses=1):
+  """
+  Run the SP on every input vector, in the order given by sdrOrders.
+
+  :param numProcesses: with learn=False, the number of processes sharing the
+                       work (see runSPInference)
+  """
   numInputVector, inputSize = inputVectors.shape
   numColumns = np.prod(sp.getColumnDimensions())
 
+  if not learn and numProcesses > 1:
+    # The order of presentation doesn't matter without learning.
+    outputColumns = runSPInference(sp, inputVectors, numProcesses,
+                                   verbose=verbose)
+    return outputColumns, np.ones((numColumns,), dtype=realDType)
+
   if sdrOrders is None:
     sdrOrders = range(numInputVector)
 
@@ -365,10 +462,4 @@ def createDirectories(expName):
 
 
 def getConnectedSyns(sp):
-  numInputs = sp.getNumInputs()
-  numColumns = np.prod(sp.getColumnDimensions())
-  connectedSyns = np.zeros((numColumns, numInputs), dtype=uintType)
-  for columnIndex in range(numColumns):
-    sp.getConnectedSynapses(columnIndex, connectedSyns[columnIndex, :])
-  connectedSyns = connectedSyns.astype('float32')
-  return connectedSyns
\ No newline at end of file
+  return getSynapseMatrix(sp).toarray()
\ No newline at end of file
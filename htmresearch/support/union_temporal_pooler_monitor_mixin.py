@@ -32,14 +32,19 @@ from nupic.algorithms.monitor_mixin.monitor_mixin_base import MonitorMixinBase
 from htmresearch.algorithms.union_temporal_pooler import UnionTemporalPooler
 from nupic.algorithms.monitor_mixin.plot import Plot
 from nupic.algorithms.monitor_mixin.trace import (
-  IndicesTrace, StringsTrace, BoolsTrace, MetricsTrace, CountsTrace)
+  StringsTrace, BoolsTrace, MetricsTrace, CountsTrace)
 
 from nupic.bindings.math import GetNTAReal
 
+from htmresearch.support.csr_indices_trace import CSRIndicesTrace
+
 
 realDType = GetNTAReal()
 uintType = "uint32"
 
+# Number of timesteps whose overlaps are computed by each sparse product
+OVERLAP_CHUNK_SIZE = 1024
+
 
 
 class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
@@ -52,9 +57,52 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
     super(UnionTemporalPoolerMonitorMixin, self).__init__(*args, **kwargs)
 
     self._mmResetActive = True  # First iteration is always a reset
+
+    # Sampling of the structural values, which read the whole pooler. Maps
+    # each value to its (interval, enabled) setting.
+    self._mmSampling = {
+      "numConnections": (1, True),
+      "connectionsPerColumnMetric": (1, True),
+      "dutyCycles": (1, True),
+    }
+    self._mmSampleRequested = False
+
     self.mmClearHistory()
 
 
+  def mmSetSampling(self, name, interval=1, enabled=True):
+    """
+    Sets how often `compute` records one of the structural monitored values.
+    Timesteps that aren't sampled repeat the previous sample, so the traces
+    stay aligned with the union SDR trace. The first timestep after a history
+    clear is always sampled, so enable values before recording, or clear the
+    history after enabling them.
+
+    Duty cycles are only updated on sampled timesteps, with their period
+    divided by the interval.
+
+    @param name (string) "numConnections", "connectionsPerColumnMetric" or
+                         "dutyCycles"
+    @param interval (int) Sample every `interval` timesteps. If None, only
+                          sample when requested with `mmRequestSample`.
+    @param enabled (bool) If False, never record this value
+    """
+    if name not in self._mmSampling:
+      raise ValueError("Unknown sampled value: {0}".format(name))
+    if interval is not None and interval < 1:
+      raise ValueError("Sampling interval must be at least 1")
+
+    self._mmSampling[name] = (interval, enabled)
+
+
+  def mmRequestSample(self):
+    """
+    Makes the next call to `compute` sample every enabled structural value,
+    regardless of its interval.
+    """
+    self._mmSampleRequested = True
+
+
   def mmGetDataUnionSDRDutyCycle(self):
     """
     @return (list) duty cycles for union SDR bits
@@ -419,9 +467,12 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
     Update the duty cycle variables internally tracked by the TM mixin.
     """
     period = self.getDutyCyclePeriod()
+    interval = self._mmSampling["dutyCycles"][0]
+    if interval is not None:
+      period = max(period / float(interval), 1.0)
 
     unionSDRArray = numpy.zeros(self.getNumColumns())
-    unionSDRArray[list(self._mmTraces["unionSDR"].data[-1])] = 1
+    unionSDRArray[self._mmTraces["unionSDR"].data.getIndices(-1)] = 1
 
     self._mmData["unionSDRDutyCycle"] = \
       UnionTemporalPoolerMonitorMixin._mmUpdateDutyCyclesHelper(
@@ -432,6 +483,27 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
         self._mmData["persistenceDutyCycle"], self._poolingActivation, period)
 
 
+  def _mmIsSampleDue(self, name, step):
+    """
+    @param name (string) Name of a structural value. See `mmSetSampling`.
+    @param step (int) Index of the current timestep in the traces
+
+    @return (bool) Whether `compute` should record the value at this timestep
+    """
+    interval, enabled = self._mmSampling[name]
+    return enabled and (step == 0 or self._mmSampleRequested or
+                        (interval is not None and step % interval == 0))
+
+
+  def _mmRepeatSample(self, name):
+    """
+    Repeats the last sample of a structural value's trace, if it is enabled.
+    """
+    trace = self._mmTraces[name]
+    if self._mmSampling[name][1] and len(trace.data) > 0:
+      trace.data.append(trace.data[-1])
+
+
   def _mmComputeSequenceRepresentationData(self):
     """
     Calculates values for the overlap distance matrix, stability within a
@@ -442,31 +514,40 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
     if not self._sequenceRepresentationDataStale:
       return
 
-    unionSDRTrace = self.mmGetTraceUnionSDR()
-    sequenceLabelsTrace = self.mmGetTraceSequenceLabels()
-    resetsTrace = self.mmGetTraceResets()
+    unionSDRs = self.mmGetTraceUnionSDR().data.toSparseMatrix(
+      self.getNumColumns())
+    sequenceLabels = self.mmGetTraceSequenceLabels().data
+    resets = numpy.array(self.mmGetTraceResets().data, dtype="bool")
 
-    n = len(unionSDRTrace.data)
+    n = unionSDRs.shape[0]
     overlapMatrix = numpy.empty((n, n), dtype=uintType)
     stabilityConfusionUnionSDR = []
     distinctnessConfusionUnionSDR = []
 
-    for i in xrange(n):
-      for j in xrange(i+1):
-        overlapUnionSDR = len(unionSDRTrace.data[i] & unionSDRTrace.data[j])
-
-        overlapMatrix[i][j] = overlapUnionSDR
-        overlapMatrix[j][i] = overlapUnionSDR
-
-        if (i != j and
-            sequenceLabelsTrace.data[i] is not None and
-            not resetsTrace.data[i] and
-            sequenceLabelsTrace.data[j] is not None and
-            not resetsTrace.data[j]):
-          if sequenceLabelsTrace.data[i] == sequenceLabelsTrace.data[j]:
-            stabilityConfusionUnionSDR.append(overlapUnionSDR)
-          else:
-            distinctnessConfusionUnionSDR.append(overlapUnionSDR)
+    # Only pairs of labeled, non-reset timesteps count toward the confusion
+    # metrics. Give each label an id so that labels can be compared in bulk.
+    labelIds = {}
+    stepLabelIds = numpy.array(
+      [labelIds.setdefault(label, len(labelIds)) if label is not None else -1
+       for label in sequenceLabels], dtype="int64")
+    eligible = (stepLabelIds != -1) & ~resets
+
+    unionSDRsTransposed = unionSDRs.T.tocsr()
+    for start in xrange(0, n, OVERLAP_CHUNK_SIZE):
+      stop = min(start + OVERLAP_CHUNK_SIZE, n)
+      overlaps = (unionSDRs[start:stop] * unionSDRsTransposed).toarray()
+      overlapMatrix[start:stop] = overlaps
+
+      # Visit each earlier timestep of each row, in the same row-major order
+      # as the pairs i > j.
+      rows = numpy.arange(start, stop)
+      pairs = ((rows[:, numpy.newaxis] > numpy.arange(n)) &
+               eligible[start:stop, numpy.newaxis] & eligible)
+      sameLabel = (stepLabelIds[start:stop, numpy.newaxis] == stepLabelIds)
+      stabilityConfusionUnionSDR += (
+        overlaps[pairs & sameLabel].astype(int).tolist())
+      distinctnessConfusionUnionSDR += (
+        overlaps[pairs & ~sameLabel].astype(int).tolist())
 
     self._mmData["overlap"] = overlapMatrix
     self._mmData["stabilityConfusion"] = stabilityConfusionUnionSDR
@@ -479,23 +560,33 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
     """
     @return (list) Life duration of all active bits
     """
-    bitLifeList = []
     traceData = self._mmTraces["unionSDR"].data
     n = len(traceData)
-    bitLifeCounter = numpy.zeros(self.getNumColumns())
-    preActiveCells = set()
-    for t in xrange(n-1):
-      preActiveCells = set(numpy.where(bitLifeCounter>0)[0])
-      newActiveCells = list(traceData[t] - preActiveCells)
-      stopActiveCells = list(preActiveCells - traceData[t])
-      continuousActiveCells = list(preActiveCells & traceData[t] )
-      bitLifeList += list(bitLifeCounter[stopActiveCells])
 
-      bitLifeCounter[stopActiveCells] = 0
-      bitLifeCounter[newActiveCells] = 1
-      bitLifeCounter[continuousActiveCells] += 1
+    # Bits active in timesteps 0 ... n-2, sorted by bit and then by timestep
+    steps = traceData.rows()
+    bits = traceData.indices.astype("int64")
+    observed = steps < n - 1
+    steps = steps[observed]
+    bits = bits[observed]
+    if len(steps) == 0:
+      return []
+    order = numpy.lexsort((steps, bits))
+    steps = steps[order]
+    bits = bits[order]
+
+    # Run-length encode each bit's activity. A bitlife is recorded when its run
+    # ends before the last observed timestep.
+    continuesRun = numpy.zeros(len(steps), dtype="bool")
+    continuesRun[1:] = (bits[1:] == bits[:-1]) & (steps[1:] == steps[:-1] + 1)
+    runStarts = numpy.flatnonzero(~continuesRun)
+    runEnds = numpy.append(runStarts[1:], len(steps)) - 1
+    runLengths = runEnds - runStarts + 1
+    stopSteps = steps[runEnds] + 1
 
-    return bitLifeList
+    ended = stopSteps < n - 1
+    order = numpy.lexsort((bits[runEnds][ended], stopSteps[ended]))
+    return runLengths[ended][order].astype("float").tolist()
 
 
 
@@ -510,22 +601,33 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
     unionSDR = super(UnionTemporalPoolerMonitorMixin, self).compute(*args,
                                                                     **kwargs)
 
-    ### From spatial pooler
-    # total number of connections
-    connectedCounts = numpy.zeros(self.getNumColumns(), dtype=uintType)
-    self.getConnectedCounts(connectedCounts)
-    numConnections = numpy.sum(connectedCounts)
+    step = len(self._mmTraces["resets"].data)
 
-    self._mmTraces["unionSDR"].data.append(set(unionSDR))
-    self._mmTraces["numConnections"].data.append(numConnections)
+    self._mmTraces["unionSDR"].data.append(unionSDR)
     self._mmTraces["sequenceLabels"].data.append(sequenceLabel)
     self._mmTraces["resets"].data.append(self._mmResetActive)
     self._mmResetActive = False
-    self._mmTraces["connectionsPerColumnMetric"].data.append(
-      Metric(self, "connections per column", self._connectedCounts.tolist()))
+
+    ### From spatial pooler
+    if self._mmIsSampleDue("numConnections", step):
+      # total number of connections
+      connectedCounts = numpy.zeros(self.getNumColumns(), dtype=uintType)
+      self.getConnectedCounts(connectedCounts)
+      self._mmTraces["numConnections"].data.append(numpy.sum(connectedCounts))
+    else:
+      self._mmRepeatSample("numConnections")
+
+    if self._mmIsSampleDue("connectionsPerColumnMetric", step):
+      self._mmTraces["connectionsPerColumnMetric"].data.append(
+        Metric(self, "connections per column", self._connectedCounts.tolist()))
+    else:
+      self._mmRepeatSample("connectionsPerColumnMetric")
 
     self._sequenceRepresentationDataStale = True
-    self._mmUpdateDutyCycles()
+    if self._mmIsSampleDue("dutyCycles", step):
+      self._mmUpdateDutyCycles()
+
+    self._mmSampleRequested = False
 
 
   def reset(self):
@@ -540,27 +642,31 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
     if verbosity == 1:
       traces = [trace.makeCountsTrace() for trace in traces]
 
-    return traces + [
-      self.mmGetTraceConnectionsPerColumnMetric(),
-      self.mmGetTraceSequenceLabels()
-    ]
+    if self._mmSampling["connectionsPerColumnMetric"][1]:
+      traces.append(self.mmGetTraceConnectionsPerColumnMetric())
+
+    return traces + [self.mmGetTraceSequenceLabels()]
 
 
   def mmGetDefaultMetrics(self, verbosity=1):
     metrics = ([Metric.createFromTrace(trace)
-                for trace in self.mmGetDefaultTraces()[:-2]])
-
-    connectionsPerColumnMetricIntial = (
-      self._mmTraces["connectionsPerColumnMetric"].data[0].copy())
-    connectionsPerColumnMetricIntial.title += " (initial)"
-    connectionsPerColumnMetricFinal = (
-      self._mmTraces["connectionsPerColumnMetric"].data[-1].copy())
-    connectionsPerColumnMetricFinal.title += " (final)"
+                for trace in self.mmGetDefaultTraces()[:1]])
 
     metrics += [self.mmGetMetricStabilityConfusion(),
-                self.mmGetMetricDistinctnessConfusion(),
-                connectionsPerColumnMetricIntial,
-                connectionsPerColumnMetricFinal]
+                self.mmGetMetricDistinctnessConfusion()]
+
+    connectionsPerColumnMetricTrace = (
+      self._mmTraces["connectionsPerColumnMetric"])
+    if len(connectionsPerColumnMetricTrace.data) > 0:
+      connectionsPerColumnMetricIntial = (
+        connectionsPerColumnMetricTrace.data[0].copy())
+      connectionsPerColumnMetricIntial.title += " (initial)"
+      connectionsPerColumnMetricFinal = (
+        connectionsPerColumnMetricTrace.data[-1].copy())
+      connectionsPerColumnMetricFinal.title += " (final)"
+
+      metrics += [connectionsPerColumnMetricIntial,
+                  connectionsPerColumnMetricFinal]
 
     return metrics
 
@@ -568,7 +674,7 @@ class UnionTemporalPoolerMonitorMixin(MonitorMixinBase):
   def mmClearHistory(self):
     super(UnionTemporalPoolerMonitorMixin, self).mmClearHistory()
 
-    self._mmTraces["unionSDR"] = IndicesTrace(self, "union SDR")
+    self._mmTraces["unionSDR"] = CSRIndicesTrace(self, "union SDR")
     self._mmTraces["sequenceLabels"] = StringsTrace(self, "sequence labels")
     self._mmTraces["resets"] = BoolsTrace(self, "resets")
     self._mmTraces["connectionsPerColumnMetric"] = MetricsTrace(
@@ -113,14 +113,15 @@ def createTemporalMemory():
 def calculateCorrelation(spikeTrains, pairs):
   numPairs = len(pairs)
   corr = np.zeros((numPairs, ))
+  spikeCounts = spikeTrains.spikeCounts()
   for pairI in range(numPairs):
-    if (np.sum(spikeTrains[pairs[pairI][0], :]) == 0 or
-      np.sum(spikeTrains[pairs[pairI][1], :]) == 0):
+    if (spikeCounts[pairs[pairI][0]] == 0 or
+      spikeCounts[pairs[pairI][1]] == 0):
       corr[pairI] = np.nan
       continue
 
     (corrMatrix, numNegPCC) = computePWCorrelations(
-      spikeTrains[pairs[pairI], :], removeAutoCorr=True)
+      spikeTrains.subsample(pairs[pairI]), removeAutoCorr=True)
     corr[pairI] = corrMatrix[0, 1]
   return corr
 
@@ -172,7 +173,7 @@ if __name__ == "__main__":
     activeCellNum = []
     predictedActiveColumnsNum = []
 
-    spikeTrains = np.zeros((tm.numberOfCells(), stepsPerEpoch), dtype="uint32")
+    spikeTrains = SpikeTrainStore(tm.numberOfCells(), stepsPerEpoch)
     t = 0
 
     for i in range(len(barMovies)):
@@ -189,8 +190,7 @@ if __name__ == "__main__":
 
         tm.compute(outputColumns.nonzero()[0], learn=True)
 
-        for cell in tm.getActiveCells():
-          spikeTrains[cell, t] = 1
+        spikeTrains.setActiveCells(t, tm.getActiveCells())
 
         # Obtain active columns:
         activeColumnsIndices = [tm.columnForCell(i) for i in
@@ -789,5 +789,100 @@ class ColumnPoolerTest(unittest.TestCase):
 
 
 
+  def testComputeBatchMatchesCompute(self):
+    """
+    Batched inference should give exactly the same active cells as running
+    compute(learn=False) on each sensation in turn.
+    """
+    feedforwardInputs = [
+      [range(0, 40), range(40, 80), range(80, 120)],
+      [range(120, 160), range(160, 200), range(200, 240)]
+    ]
+    objectLateralInputs = [
+      [range(200, 240), range(100, 140)],  # Object 1
+      [range(240, 280), range(140, 180)],  # Object 2
+    ]
+
+    poolers = [self._initializeDefaultPooler(lateralInputWidths=[512, 512])
+               for _ in xrange(2)]
+    for pooler in poolers:
+      for obj in xrange(2):
+        pooler.reset()
+        for i in range(3):
+          for f in range(3):
+            pooler.compute(feedforwardInputs[obj][f], objectLateralInputs[obj],
+                           learn=True)
+      pooler.reset()
+
+    union = sorted(set(feedforwardInputs[0][0]) | set(feedforwardInputs[1][1]))
+    sensations = [
+      (union, [], ()),
+      (union, [objectLateralInputs[0][0], ()], ()),
+      (union, [(), objectLateralInputs[1][1]], ()),
+      (feedforwardInputs[0][0], objectLateralInputs[1], ()),
+      ((), objectLateralInputs[0], poolers[0].getActiveCells()),
+      (feedforwardInputs[1][2], [], range(0, 2048, 7)),
+      (range(0, 20) + range(120, 140), [], ()),
+    ]
+
+    expected = []
+    for feedforwardInput, lateralInputs, prevActiveCells in sensations:
+      poolers[0].activeCells = numpy.asarray(prevActiveCells, dtype="uint32")
+      poolers[0].compute(feedforwardInput, lateralInputs, learn=False)
+      expected.append(poolers[0].getActiveCells())
+
+    actual = poolers[1].computeBatch(
+      [feedforwardInput for feedforwardInput, _, _ in sensations],
+      [lateralInputs for _, lateralInputs, _ in sensations],
+      [prevActiveCells for _, _, prevActiveCells in sensations])
+
+    self.assertEqual(len(actual), len(expected))
+    for activeCells, expectedCells in zip(actual, expected):
+      numpy.testing.assert_array_equal(activeCells, expectedCells)
+
+
+  def testComputeBatchAfterLearning(self):
+    """
+    The connected synapses are reused by consecutive batches, and extracted
+    again once the pooler has learned.
+    """
+    feedforwardInputs = [range(0, 40), range(40, 80), range(80, 120)]
+    lateralInputs = [range(200, 240)]
+
+    poolers = [self._initializeDefaultPooler(lateralInputWidths=[512])
+               for _ in xrange(2)]
+    for pooler in poolers:
+      for feedforwardInput in feedforwardInputs:
+        pooler.compute(feedforwardInput, lateralInputs, learn=True)
+      pooler.reset()
+
+    poolers[1].computeBatch(feedforwardInputs)
+    connectedMatrices = dict(poolers[1]._connectedMatrices)
+    self.assertEqual(len(connectedMatrices), 3)
+    poolers[1].computeBatch(feedforwardInputs)
+    for key, cached in poolers[1]._connectedMatrices.iteritems():
+      self.assertIs(cached, connectedMatrices[key])
+
+    # Learn a second object, which is only recognized if the batch uses the
+    # new synapses.
+    secondObject = [range(120, 160), range(160, 200)]
+    for pooler in poolers:
+      for feedforwardInput in secondObject:
+        pooler.compute(feedforwardInput, [range(240, 280)], learn=True)
+      pooler.reset()
+
+    expected = []
+    for feedforwardInput in feedforwardInputs + secondObject:
+      poolers[0].reset()
+      poolers[0].compute(feedforwardInput, learn=False)
+      expected.append(poolers[0].getActiveCells())
+    self.assertTrue(len(expected[-1]) > 0)
+
+    actual = poolers[1].computeBatch(feedforwardInputs + secondObject,
+                                     prevActiveCellsBatch=[()] * 5)
+    for activeCells, expectedCells in zip(actual, expected):
+      numpy.testing.assert_array_equal(activeCells, expectedCells)
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,92 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import scipy.sparse
+
+from htmresearch.algorithms.hierarchical_clustering import (
+  HierarchicalClustering)
+
+
+
+def rowByRowOverlaps(data, selfOverlaps=False):
+  """
+  The condensed pairwise overlaps, computed one row at a time.
+  """
+  overlaps = []
+  for i in xrange(data.shape[0]):
+    start = i if selfOverlaps else i+1
+    overlaps.append(data[i].multiply(data[start:]).getnnz(1))
+  return numpy.concatenate(overlaps)
+
+
+
+class HierarchicalClusteringTest(unittest.TestCase):
+
+  def setUp(self):
+    rng = numpy.random.RandomState(42)
+    dense = (rng.rand(37, 200) < 0.1) * rng.randint(1, 4, size=(37, 200))
+    self.data = scipy.sparse.csr_matrix(dense)
+    self.tempDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tempDir)
+
+
+  def testBlockedOverlaps(self):
+    for selfOverlaps in [False, True]:
+      expected = rowByRowOverlaps(self.data, selfOverlaps)
+      for blockSize in [None, 1, 5, 100]:
+        overlaps = HierarchicalClustering._computeOverlaps(
+          self.data, selfOverlaps, blockSize=blockSize)
+        numpy.testing.assert_array_equal(overlaps, expected)
+
+
+  def testMemoryMappedOverlaps(self):
+    filename = os.path.join(self.tempDir, "overlaps.dat")
+    for selfOverlaps in [False, True]:
+      overlaps = HierarchicalClustering._computeOverlaps(
+        self.data, selfOverlaps, blockSize=5, filename=filename)
+      expected = rowByRowOverlaps(self.data, selfOverlaps)
+      numpy.testing.assert_array_equal(overlaps, expected)
+
+      stored = numpy.memmap(filename, dtype="int16", mode="r")
+      numpy.testing.assert_array_equal(stored, expected)
+      del stored, overlaps
+
+
+  def testParallelOverlaps(self):
+    for selfOverlaps in [False, True]:
+      overlaps = HierarchicalClustering._computeOverlaps(
+        self.data, selfOverlaps, blockSize=5, numProcesses=2)
+      numpy.testing.assert_array_equal(
+        overlaps, rowByRowOverlaps(self.data, selfOverlaps))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
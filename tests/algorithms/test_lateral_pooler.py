@@ -18,6 +18,7 @@
 #
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
+import pickle
 import unittest
 import numpy as np
 from htmresearch.algorithms.lateral_pooler import LateralPooler
@@ -91,7 +92,144 @@ class LateralPoolerTest(unittest.TestCase):
     self.assertTrue(np.all(W_nup == W_lat), 
       "Wrong synaptic weights, something diverges during learning.")
 
-      
+
+  def test_whether_batched_encoding_is_the_same_as_compute(self):
+    """
+    The batched encoding function should produce the same 
+    codes as computing each input vector separately.
+    """
+    n = 128
+    m = 100
+    d = 20
+
+    X = np.random.randint(0,2,size=(m,d))
+    Y_cmp = np.zeros((n,d))
+
+    params = {
+        "inputDimensions": [m,1],
+        "columnDimensions": [n,1],
+        "potentialRadius": n,
+        "potentialPct": 1.0,
+        "globalInhibition": True,
+        "numActiveColumnsPerInhArea": 8,
+        "seed": 1936 }
+
+    pooler = LateralPooler(**params)
+    for t in range(d):
+      pooler.compute(X[:,t], True, Y_cmp[:,t])
+
+    for t in range(d):
+      pooler.compute(X[:,t], False, Y_cmp[:,t])
+
+    Y_enc = pooler.encode(X)
+    self.assertTrue(np.all(Y_cmp == Y_enc), 
+      "Batched encoding differs from compute.")
+
+    Y_enc = pooler.encode(X, applyLateralInhibition=False)
+    for t in range(d):
+      pooler.compute(X[:,t], False, Y_cmp[:,t], applyLateralInhibition=False)
+    self.assertTrue(np.all(Y_cmp == Y_enc), 
+      "Batched encoding differs from compute without lateral inhibition.")
+
+
+  def test_whether_sparse_lateral_updates_are_the_same_as_dense(self):
+    """
+    Lazily updating the lateral connections should lead to the 
+    same codes and connections as the dense updates.
+    """
+    n = 128
+    m = 100
+    d = 50
+
+    X = np.random.randint(0,2,size=(m,d))
+    Y_dense  = np.zeros((n,d))
+    Y_sparse = np.zeros((n,d))
+
+    params = {
+        "inputDimensions": [m,1],
+        "columnDimensions": [n,1],
+        "potentialRadius": n,
+        "potentialPct": 1.0,
+        "globalInhibition": True,
+        "numActiveColumnsPerInhArea": 8,
+        "dutyCyclePeriod": 20,
+        "lateralLearningRate": 0.1,
+        "seed": 1936 }
+
+    sp_dense  = LateralPooler(**params)
+    sp_sparse = LateralPooler(sparseLateralUpdates=True, **params)
+
+    for t in range(d):
+      sp_dense.compute(X[:,t], True, Y_dense[:,t])
+      sp_sparse.compute(X[:,t], True, Y_sparse[:,t])
+
+    self.assertTrue(np.all(Y_dense == Y_sparse), 
+      "Sparse lateral updates produce different outputs.")
+    self.assertTrue(np.allclose(sp_dense.avgActivityPairs, 
+                                sp_sparse.avgActivityPairs))
+    self.assertTrue(np.allclose(sp_dense.lateralConnections, 
+                                sp_sparse.lateralConnections))
+
+    self.assertTrue(np.all(sp_dense.encode(X) == sp_sparse.encode(X)), 
+      "Sparse lateral updates produce different encodings.")
+
+
+  def test_whether_old_pickles_can_be_loaded(self):
+    """
+    Poolers pickled before the sparse lateral updates store the lateral 
+    connections and pairwise activities as public attributes. They should 
+    load and keep learning with the dense updates.
+    """
+    n = 128
+    m = 100
+    d = 20
+
+    X = np.random.randint(0,2,size=(m,d))
+    Y_new = np.zeros((n,d))
+    Y_old = np.zeros((n,d))
+
+    params = {
+        "inputDimensions": [m,1],
+        "columnDimensions": [n,1],
+        "potentialRadius": n,
+        "potentialPct": 1.0,
+        "globalInhibition": True,
+        "numActiveColumnsPerInhArea": 8,
+        "dutyCyclePeriod": 20,
+        "lateralLearningRate": 0.1,
+        "seed": 1936 }
+
+    pooler = LateralPooler(**params)
+    for t in range(d):
+      pooler.compute(X[:,t], True, Y_new[:,t])
+
+    # Recreate the attribute layout of the old class
+    oldState = pickle.loads(pickle.dumps(pooler)).__dict__
+    oldState["lateralConnections"] = oldState.pop("_lateralConnections")
+    oldState["avgActivityPairs"]   = oldState.pop("_avgActivityPairs")
+    for key in ["_sparseLateralUpdates", "_avgActivityPairsScale",
+                "_avgActivityPairsRowSums", "_lateralStep", 
+                "_lateralRowSteps", "_lateralEpsilon"]:
+      del oldState[key]
+    oldPooler = LateralPooler.__new__(LateralPooler)
+    oldPooler.__dict__.update(oldState)
+
+    loaded = pickle.loads(pickle.dumps(oldPooler))
+    self.assertTrue(np.all(loaded.lateralConnections == 
+                           pooler.lateralConnections))
+    self.assertTrue(np.all(loaded.avgActivityPairs == 
+                           pooler.avgActivityPairs))
+
+    for t in range(d):
+      pooler.compute(X[:,t], True, Y_new[:,t])
+      loaded.compute(X[:,t], True, Y_old[:,t])
+
+    self.assertTrue(np.all(Y_new == Y_old), 
+      "Loaded pooler produces different outputs.")
+    self.assertTrue(np.all(loaded.lateralConnections == 
+                           pooler.lateralConnections))
+
+
 
 
 if __name__ == "__main__":
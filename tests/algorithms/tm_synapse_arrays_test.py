@@ -0,0 +1,109 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import cPickle as pickle
+import unittest
+
+import numpy
+
+from htmresearch.algorithms.TM import TM, _SynapseArrays
+
+
+
+class TMSynapseArraysTest(unittest.TestCase):
+  """
+  The array-backed synapse store must not change the output or the saved
+  state of the TM.
+  """
+
+  def _runSequences(self, tm, sequences, numRepetitions):
+    states = []
+    for _ in xrange(numRepetitions):
+      for sequence in sequences:
+        for pattern in sequence:
+          tm.compute(pattern, enableLearn=True, computeInfOutput=True)
+          states.append((tm.activeState["t"].copy(),
+                         tm.predictedState["t"].copy(),
+                         tm.getNumSegments(),
+                         tm.getNumSynapses()))
+        tm.reset()
+    return states
+
+
+  def testSameOutputAndState(self):
+    numberOfCols = 64
+    rng = numpy.random.RandomState(42)
+    sequences = []
+    for _ in xrange(3):
+      sequence = []
+      for _ in xrange(6):
+        pattern = numpy.zeros(numberOfCols, dtype="uint32")
+        pattern[rng.choice(numberOfCols, 8, replace=False)] = 1
+        sequence.append(pattern)
+      sequences.append(sequence)
+
+    params = {
+      "numberOfCols": numberOfCols,
+      "cellsPerColumn": 4,
+      "initialPerm": 0.5,
+      "connectedPerm": 0.5,
+      "newSynapseCount": 6,
+      "activationThreshold": 4,
+      "minThreshold": 3,
+      "globalDecay": 0.0,
+      "maxAge": 0,
+      "seed": 42,
+    }
+    tmLists = TM(useSynapseArrays=False, **params)
+    tmArrays = TM(useSynapseArrays=True, **params)
+
+    statesLists = self._runSequences(tmLists, sequences, 5)
+    statesArrays = self._runSequences(tmArrays, sequences, 5)
+
+    self.assertGreater(tmLists.getNumSegments(), 0)
+    for (activeA, predictedA, segmentsA, synapsesA), \
+        (activeB, predictedB, segmentsB, synapsesB) in zip(statesLists,
+                                                           statesArrays):
+      numpy.testing.assert_array_equal(activeA, activeB)
+      numpy.testing.assert_array_equal(predictedA, predictedB)
+      self.assertEqual(segmentsA, segmentsB)
+      self.assertEqual(synapsesA, synapsesB)
+
+    self.assertEqual(pickle.dumps(tmLists, 2), pickle.dumps(tmArrays, 2))
+
+    # The incrementally updated store matches one built from scratch
+    incremental = tmArrays._synapseArrays
+    incremental.update(tmArrays.cells)
+    rebuilt = _SynapseArrays(numberOfCols, params["cellsPerColumn"])
+    rebuilt.update(tmArrays.cells)
+    for name in ["presynapticCells", "permanences", "synapseSegments",
+                 "segmentSizes", "segmentCells", "segmentsPerCell",
+                 "segmentSynapseStarts", "cellSegmentStarts"]:
+      numpy.testing.assert_array_equal(getattr(incremental, name),
+                                       getattr(rebuilt, name))
+    self.assertEqual(len(incremental.segments), len(rebuilt.segments))
+    self.assertTrue(all(a is b for a, b in zip(incremental.segments,
+                                               rebuilt.segments)))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -36,30 +36,36 @@ class UnionTemporalPoolerTest(unittest.TestCase):
 
 
   def setUp(self):
-    self.unionTemporalPooler = UnionTemporalPooler(inputDimensions=(5, ),
-                                   columnDimensions=(5, ),
-                                   potentialRadius=16,
-                                   potentialPct=0.9,
-                                   globalInhibition=True,
-                                   localAreaDensity=-1.0,
-                                   numActiveColumnsPerInhArea=2.0,
-                                   stimulusThreshold=2,
-                                   synPermInactiveDec=0.01,
-                                   synPermActiveInc=0.03,
-                                   synPermConnected=0.3,
-                                   minPctOverlapDutyCycle=0.001,
-                                   dutyCyclePeriod=1000,
-                                   boostStrength=0.0,
-                                   seed=42,
-                                   spVerbosity=0,
-                                   wrapAround=True,
-
-                                   # union_temporal_pooler.py parameters
-                                   activeOverlapWeight=1.0,
-                                   predictedActiveOverlapWeight=10.0,
-                                   maxUnionActivity=0.20,
-                                   exciteFunctionType='Fixed',
-                                   decayFunctionType='NoDecay')
+    self.unionTemporalPooler = self._createPooler()
+
+
+  def _createPooler(self, **kwargs):
+    args = dict(inputDimensions=(5, ),
+                columnDimensions=(5, ),
+                potentialRadius=16,
+                potentialPct=0.9,
+                globalInhibition=True,
+                localAreaDensity=-1.0,
+                numActiveColumnsPerInhArea=2.0,
+                stimulusThreshold=2,
+                synPermInactiveDec=0.01,
+                synPermActiveInc=0.03,
+                synPermConnected=0.3,
+                minPctOverlapDutyCycle=0.001,
+                dutyCyclePeriod=1000,
+                boostStrength=0.0,
+                seed=42,
+                spVerbosity=0,
+                wrapAround=True,
+
+                # union_temporal_pooler.py parameters
+                activeOverlapWeight=1.0,
+                predictedActiveOverlapWeight=10.0,
+                maxUnionActivity=0.20,
+                exciteFunctionType='Fixed',
+                decayFunctionType='NoDecay')
+    args.update(kwargs)
+    return UnionTemporalPooler(**args)
 
 
   def testDecayPoolingActivationDefaultDecayRate(self):
@@ -124,5 +130,108 @@ class UnionTemporalPoolerTest(unittest.TestCase):
     self.assertEquals(result[1], 4)
 
 
+  def testPredictedActiveInputHistory(self):
+    pooler = self._createPooler(historyLength=3)
+    inputs = numpy.array([[1, 1, 0, 0, 0],
+                          [0, 1, 1, 0, 0],
+                          [0, 0, 1, 1, 0],
+                          [0, 0, 0, 1, 1]], dtype=REAL_DTYPE)
+    for predictedActiveInput in inputs:
+      pooler.compute(predictedActiveInput, predictedActiveInput, learn=True)
+
+    for age in xrange(3):
+      self.assertTrue(numpy.array_equal(
+        pooler._prePredictedActiveInput[:, pooler._historySlot(age)],
+        inputs[-1 - age]))
+    self.assertTrue(numpy.array_equal(pooler._prePredictedActiveCount,
+                                      inputs[1:].sum(axis=0)))
+
+
+  def testBatchedPermanenceUpdates(self):
+    """
+    Without the union and history reinforcement, the batched permanence
+    updates are the same as the sequential ones.
+    """
+    poolers = [self._createPooler(historyLength=2,
+                                  synPermPredActiveInc=0.0,
+                                  synPermPreviousPredActiveInc=0.0,
+                                  batchedPermanenceUpdates=batched)
+               for batched in (False, True)]
+
+    inputs = numpy.array([[1, 1, 1, 0, 0],
+                          [0, 1, 1, 1, 0],
+                          [0, 0, 1, 1, 1],
+                          [1, 0, 0, 1, 1]], dtype=REAL_DTYPE)
+    for _ in xrange(5):
+      for predictedActiveInput in inputs:
+        for pooler in poolers:
+          pooler.compute(predictedActiveInput, predictedActiveInput,
+                         learn=True)
+
+    expected = numpy.zeros(5, dtype=REAL_DTYPE)
+    actual = numpy.zeros(5, dtype=REAL_DTYPE)
+    for column in xrange(5):
+      poolers[0].getPermanence(column, expected)
+      poolers[1].getPermanence(column, actual)
+      self.assertTrue(numpy.array_equal(expected, actual))
+
+
+  def testBatchedUnionAndHistoryUpdates(self):
+    """
+    With the union and history reinforcement, the batched permanence updates
+    are the sum of the sequential ones. Starting from permanences far from 0
+    and 1, no update is trimmed or clipped, so they only differ by rounding.
+    """
+    poolers = [self._createPooler(columnDimensions=(10, ),
+                                  numActiveColumnsPerInhArea=3.0,
+                                  maxUnionActivity=0.5,
+                                  historyLength=2,
+                                  synPermPredActiveInc=0.05,
+                                  synPermPreviousPredActiveInc=0.02,
+                                  batchedPermanenceUpdates=batched)
+               for batched in (False, True)]
+
+    inputs = numpy.array([[1, 1, 1, 0, 0],
+                          [0, 1, 1, 1, 0],
+                          [0, 0, 1, 1, 1],
+                          [1, 0, 0, 1, 1]], dtype=REAL_DTYPE)
+    # Fill the history and the union SDR without learning.
+    for predictedActiveInput in inputs:
+      for pooler in poolers:
+        pooler.compute(predictedActiveInput, predictedActiveInput, learn=False)
+
+    potential = numpy.zeros(5, dtype=REAL_DTYPE)
+    for pooler in poolers:
+      for column in xrange(10):
+        pooler.getPotential(column, potential)
+        pooler.setPermanence(column, 0.5 * potential)
+
+    expected = numpy.zeros(5, dtype=REAL_DTYPE)
+    actual = numpy.zeros(5, dtype=REAL_DTYPE)
+    for predictedActiveInput in inputs:
+      for pooler in poolers:
+        pooler.compute(predictedActiveInput, predictedActiveInput, learn=True)
+
+      activeCells = poolers[0]._activeCells
+      self.assertTrue(numpy.array_equal(activeCells, poolers[1]._activeCells))
+      self.assertTrue(numpy.array_equal(poolers[0].getUnionSDR(),
+                                        poolers[1].getUnionSDR()))
+      # Some columns are only in the union SDR, some are also active.
+      unionSDR = poolers[0].getUnionSDR()
+      self.assertTrue(len(numpy.setdiff1d(unionSDR, activeCells)) > 0)
+      self.assertTrue(len(numpy.intersect1d(unionSDR, activeCells)) > 0)
+
+      for column in xrange(10):
+        poolers[0].getPermanence(column, expected)
+        poolers[1].getPermanence(column, actual)
+        numpy.testing.assert_allclose(actual, expected, atol=1e-6)
+
+    # The union and history reinforcement changed the permanences.
+    for column in poolers[0].getUnionSDR():
+      poolers[0].getPotential(column, potential)
+      poolers[1].getPermanence(column, actual)
+      self.assertFalse(numpy.allclose(actual, 0.5 * potential))
+
+
 if __name__ == "__main__":
   unittest.main()
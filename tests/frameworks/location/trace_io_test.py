@@ -0,0 +1,152 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import io
+import unittest
+
+import numpy as np
+
+from htmresearch.frameworks.location.trace_io import (
+  BinaryTraceReader, BinaryTraceWriter, JSONLinesTraceWriter,
+  exportToJSONLines)
+
+
+
+def makeRecords(numObjects=5, numSteps=4, seed=42):
+  """
+  A trace with a header, then for each object a "currentObject" record and
+  steps that each start with a movement.
+  """
+  rng = np.random.RandomState(seed)
+
+  def cells(n=10):
+    return np.sort(rng.choice(1000, n, replace=False)).astype("uint32")
+
+  records = [(None, [{"numModules": 3, "objects": ["a", "b"]}])]
+  for iObject in xrange(numObjects):
+    records.append(("currentObject", [{"name": iObject, "features": []}]))
+    for step in xrange(numSteps):
+      if step == 0:
+        records.append(("initialSensation", []))
+      else:
+        records.append(("shift", [[0.25 * step, -1.5]]))
+      records.append(("locationLayer", [[cells(), cells(5)],
+                                        [cells(3), np.array([], "uint32")]]))
+      records.append(("predictedFeatureLocationPair",
+                      [cells(), [["obj", step, 0.5]]]))
+      records.append(("featureInput", [cells(8), ["A", "B"]]))
+  return records
+
+
+def assertPayloadsEqual(testCase, expected, actual):
+  testCase.assertEqual(len(expected), len(actual))
+  for e, a in zip(expected, actual):
+    if isinstance(e, np.ndarray):
+      np.testing.assert_array_equal(e, a)
+    elif (isinstance(e, list) and len(e) > 0 and
+          all(isinstance(x, np.ndarray) for x in e)):
+      testCase.assertEqual(len(e), len(a))
+      for x, y in zip(e, a):
+        np.testing.assert_array_equal(x, y)
+    else:
+      testCase.assertEqual(e, a)
+
+
+
+class TraceIOTest(unittest.TestCase):
+
+  def setUp(self):
+    self.records = makeRecords()
+
+    self.binary = io.BytesIO()
+    writer = BinaryTraceWriter(self.binary, recordsPerChunk=7)
+    for tag, payloads in self.records:
+      writer.writeRecord(tag, payloads)
+    writer.close()
+
+    self.reader = BinaryTraceReader(io.BytesIO(self.binary.getvalue()))
+
+
+  def testIterRecords(self):
+    records = list(self.reader.iterRecords())
+    self.assertEqual(len(records), len(self.records))
+    for (expectedTag, expected), (tag, payloads) in zip(self.records,
+                                                         records):
+      self.assertEqual(expectedTag, tag)
+      assertPayloadsEqual(self, expected, payloads)
+
+    # Ranges that start and stop within chunks
+    for start, stop in [(3, 4), (5, 20), (13, 14), (0, len(self.records))]:
+      records = list(self.reader.iterRecords(start, stop))
+      self.assertEqual([tag for tag, _ in records],
+                       [tag for tag, _ in self.records[start:stop]])
+
+
+  def testFindRecord(self):
+    objectRecords = [i for i, (tag, _) in enumerate(self.records)
+                     if tag == "currentObject"]
+    self.assertEqual(self.reader.getObjectCount(), len(objectRecords))
+
+    for iObject, objectRecord in enumerate(objectRecords):
+      self.assertEqual(self.reader.findRecord(iObject), objectRecord)
+      self.assertEqual(self.reader.getStepCount(iObject), 4)
+      for step in xrange(4):
+        record = self.reader.findRecord(iObject, step)
+        self.assertEqual(self.records[record][0],
+                         "initialSensation" if step == 0 else "shift")
+
+      with self.assertRaises(IndexError):
+        self.reader.findRecord(iObject, 4)
+
+
+  def testIterObject(self):
+    start = self.reader.findRecord(2, 1)
+    stop = self.reader.findRecord(3)
+    records = list(self.reader.iterObject(2, 1))
+    self.assertEqual(len(records), stop - start)
+    for (expectedTag, expected), (tag, payloads) in zip(
+        self.records[start:stop], records):
+      self.assertEqual(expectedTag, tag)
+      assertPayloadsEqual(self, expected, payloads)
+
+
+  def testExportIsIdenticalToJSONLines(self):
+    expected = io.BytesIO()
+    writer = JSONLinesTraceWriter(expected)
+    for tag, payloads in self.records:
+      writer.writeRecord(tag, payloads)
+    writer.close()
+
+    exported = io.BytesIO()
+    exportToJSONLines(self.reader, exported)
+    self.assertEqual(exported.getvalue(), expected.getvalue())
+
+
+  def testWriterMustStartAtBeginning(self):
+    out = io.BytesIO()
+    out.write("header")
+    with self.assertRaises(ValueError):
+      BinaryTraceWriter(out)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -79,6 +79,39 @@ class ColumnPoolerRegionTest(unittest.TestCase):
     net.run(3)
 
 
+  def testProfile(self):
+    """Profiling is off by default and reports timers and counters when on."""
+
+    rawParams = {"outputWidth": 8 * 2048}
+    net = Network()
+    rawSensor = net.addRegion("raw", "py.RawSensor", json.dumps(rawParams))
+    l2c = net.addRegion("L2", "py.ColumnPoolerRegion", "")
+    net.link("raw", "L2", "UniformLink", "")
+
+    self.assertEqual(json.loads(l2c.getParameter("profile")), {})
+
+    l2c.setParameter("enableProfiling", True)
+
+    rawSensorPy = rawSensor.getSelf()
+    rawSensorPy.addDataToQueue([2, 4, 6], 0, 42)
+    rawSensorPy.addDataToQueue([2, 42, 1023], 0, 43)
+    rawSensorPy.addResetToQueue(44)
+    net.run(3)
+
+    profile = json.loads(l2c.getParameter("profile"))
+    self.assertEqual(profile["numComputes"], 3)
+    self.assertEqual(profile["counters"]["resets"], 1)
+    self.assertEqual(profile["counters"]["feedforwardInputBits"], 6)
+    self.assertGreater(profile["counters"]["activeCells"], 0)
+    self.assertEqual(set(profile["timers"].keys()),
+                     set(["inputConversion", "compute", "outputConversion",
+                          "reset"]))
+
+    l2c.executeCommand(["resetProfile"])
+    profile = json.loads(l2c.getParameter("profile"))
+    self.assertEqual(profile["numComputes"], 0)
+
+
 if __name__ == "__main__":
   unittest.main()
 
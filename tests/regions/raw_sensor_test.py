@@ -20,6 +20,7 @@
 # ----------------------------------------------------------------------
 
 import json
+import numpy
 import os
 import shutil
 import tempfile
@@ -105,6 +106,41 @@ class RawSensorTest(unittest.TestCase):
                       "Value of sequenceIdOut incorrect")
 
 
+  def testBatch(self):
+    net = Network()
+    rawSensor = net.addRegion("raw","py.RawSensor",
+                              json.dumps({"outputWidth": 1029}))
+    vfe = net.addRegion("output","VectorFileEffector","")
+    net.link("raw", "output", "UniformLink", "")
+    vfe.setParameter("outputFile",os.path.join(self.tmpDir,"temp.csv"))
+
+    # Batches are output in order with the individually queued records
+    rawSensorPy = rawSensor.getSelf()
+    rawSensorPy.addDataToQueue([7, 8], 0, 41)
+    rawSensorPy.addBatchToQueue(indices=numpy.array([2, 4, 6, 1023]),
+                                indptr=numpy.array([0, 3, 3, 4]),
+                                resets=numpy.array([0, 1, 0]),
+                                sequenceIds=numpy.array([42, 43, 44]))
+    rawSensorPy.addResetToQueue(45)
+
+    expected = [([7, 8], 0, 41),
+                ([2, 4, 6], 0, 42),
+                ([], 1, 43),
+                ([1023], 0, 44),
+                ([], 1, 45)]
+
+    for nonZeros, reset, sequenceId in expected:
+      net.run(1)
+      self.assertEqual(list(rawSensor.getOutputData("dataOut").nonzero()[0]),
+                       nonZeros, "Value of dataOut incorrect")
+      self.assertEqual(rawSensor.getOutputData("resetOut").sum(), reset,
+                       "Value of resetOut incorrect")
+      self.assertEqual(rawSensor.getOutputData("sequenceIdOut").sum(),
+                       sequenceId, "Value of sequenceIdOut incorrect")
+
+    self.assertEqual(len(rawSensorPy.queue), 0, "Queue should be empty")
+
+
 if __name__ == "__main__":
   unittest.main()
 
@@ -0,0 +1,251 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+import numpy as np
+import scipy.sparse
+
+from htmresearch.support.neural_correlations_utils import (
+  computeISI, computePWCorrelations, computePWCorrelationsWithinCol,
+  SpikeTrainStore)
+
+
+
+def pairwiseCorrcoef(spikeTrains, removeAutoCorr, pairs=None):
+  """
+  The correlation matrix computed with one np.corrcoef per pair of cells, and
+  the exact number of pairs of active cells with a negative covariance.
+  """
+  numCells, numSteps = spikeTrains.shape
+  if pairs is None:
+    pairs = [(i, j) for i in xrange(numCells) for j in xrange(numCells)]
+  sums = spikeTrains.sum(axis=1).astype("int64")
+  coactivity = np.dot(spikeTrains.astype("int64"),
+                      spikeTrains.T.astype("int64"))
+
+  corrMatrix = np.zeros((numCells, numCells))
+  numNegPCC = 0
+  with warnings.catch_warnings():
+    warnings.simplefilter("ignore", RuntimeWarning)
+    for i, j in pairs:
+      if i == j and removeAutoCorr:
+        continue
+      if sums[i] == 0 or sums[j] == 0:
+        continue
+      corrMatrix[i, j] = np.corrcoef(spikeTrains[i], spikeTrains[j])[0, 1]
+      if numSteps * coactivity[i, j] - sums[i] * sums[j] < 0:
+        numNegPCC += 1
+  return corrMatrix, numNegPCC
+
+
+
+def loopISI(spikeTrains):
+  """
+  The inter-spike intervals, scanned one time-step at a time.
+  """
+  isi = []
+  for i in range(np.shape(spikeTrains)[0]):
+    zeroCount = 0
+    for j in range(np.shape(spikeTrains)[1]):
+      if spikeTrains[i][j] == 0:
+        zeroCount += 1
+      elif zeroCount > 0:
+        isi.append(zeroCount)
+        zeroCount = 0
+  return isi
+
+
+
+class ComputePWCorrelationsTest(unittest.TestCase):
+
+  def setUp(self):
+    rng = np.random.RandomState(0)
+    self.spikeTrains = (rng.rand(23, 40) < 0.2).astype("uint32")
+    # A silent cell and a cell that fires at every time-step.
+    self.spikeTrains[3] = 0
+    self.spikeTrains[7] = 1
+
+
+  def _inputs(self):
+    return [self.spikeTrains,
+            scipy.sparse.csr_matrix(self.spikeTrains),
+            SpikeTrainStore.fromDense(self.spikeTrains)]
+
+
+  def testMatchesCorrcoef(self):
+    for removeAutoCorr in (True, False):
+      expected, expectedNumNeg = pairwiseCorrcoef(self.spikeTrains,
+                                                  removeAutoCorr)
+      for spikeTrains in self._inputs():
+        for blockSize in (5, 1024):
+          corrMatrix, numNegPCC = computePWCorrelations(
+            spikeTrains, removeAutoCorr, blockSize=blockSize)
+          np.testing.assert_allclose(corrMatrix, expected, atol=1e-12)
+          self.assertEqual(numNegPCC, expectedNumNeg)
+
+
+  def testSilentAndAlwaysFiringCells(self):
+    corrMatrix, _ = computePWCorrelations(self.spikeTrains,
+                                          removeAutoCorr=False)
+    self.assertTrue(np.all(corrMatrix[3] == 0))
+    self.assertTrue(np.all(corrMatrix[:, 3] == 0))
+    self.assertTrue(np.all(np.isnan(np.delete(corrMatrix[7], 3))))
+    self.assertTrue(np.all(np.isnan(np.delete(corrMatrix[:, 7], 3))))
+    self.assertEqual(corrMatrix[0, 0], 1)
+
+
+  def testSameResultForAllInputs(self):
+    """
+    Pairs of binary spike trains often have exactly zero covariance. They must
+    not be counted as negative in any input format, blockSize or dtype.
+    """
+    rng = np.random.RandomState(0)
+    spikeTrains = (rng.rand(60, 40) < 0.2).astype("uint32")
+    inputs = [spikeTrains,
+              scipy.sparse.csr_matrix(spikeTrains),
+              SpikeTrainStore.fromDense(spikeTrains)]
+
+    expected, expectedNumNeg = computePWCorrelations(spikeTrains, True)
+    self.assertEqual(expectedNumNeg, pairwiseCorrcoef(spikeTrains, True)[1])
+    for spikeTrains in inputs:
+      for blockSize in (7, 1024):
+        corrMatrix, numNegPCC = computePWCorrelations(
+          spikeTrains, True, blockSize=blockSize)
+        np.testing.assert_array_equal(corrMatrix, expected)
+        self.assertEqual(numNegPCC, expectedNumNeg)
+      _, numNegPCC = computePWCorrelations(spikeTrains, True, dtype="float32")
+      self.assertEqual(numNegPCC, expectedNumNeg)
+
+
+  def testWithinColumn(self):
+    cellsPerColumn = 4
+    numCells = 20
+    pairs = [(i, j) for i in xrange(numCells) for j in xrange(numCells)
+             if i / cellsPerColumn == j / cellsPerColumn]
+    for removeAutoCorr in (True, False):
+      expected, expectedNumNeg = pairwiseCorrcoef(self.spikeTrains[:numCells],
+                                                  removeAutoCorr, pairs)
+      for spikeTrains in self._inputs():
+        if not isinstance(spikeTrains, SpikeTrainStore):
+          spikeTrains = spikeTrains[:numCells]
+        else:
+          spikeTrains = spikeTrains.subsample(np.arange(numCells))
+        corrMatrix, numNegPCC = computePWCorrelationsWithinCol(
+          spikeTrains, removeAutoCorr, cellsPerColumn)
+        np.testing.assert_allclose(corrMatrix, expected, atol=1e-12)
+        self.assertEqual(numNegPCC, expectedNumNeg)
+
+
+
+class SpikeTrainStoreTest(unittest.TestCase):
+
+  def setUp(self):
+    rng = np.random.RandomState(42)
+    self.spikeTrains = (rng.rand(13, 45) < 0.3).astype("uint32")
+
+
+  def _assertSameSpikeTrains(self, store, expected):
+    self.assertEqual(store.shape, expected.shape)
+    np.testing.assert_array_equal(store.toDense(), expected)
+    np.testing.assert_array_equal(store.toCSR().toarray(), expected)
+    np.testing.assert_array_equal(store.spikeCounts(), expected.sum(axis=1))
+
+
+  def testSetActiveCells(self):
+    store = SpikeTrainStore(*self.spikeTrains.shape)
+    for t in xrange(self.spikeTrains.shape[1]):
+      store.setActiveCells(t, set(self.spikeTrains[:, t].nonzero()[0]))
+    self._assertSameSpikeTrains(store, self.spikeTrains)
+    self._assertSameSpikeTrains(SpikeTrainStore.fromDense(self.spikeTrains),
+                                self.spikeTrains)
+
+
+  def testWindow(self):
+    store = SpikeTrainStore.fromDense(self.spikeTrains)
+    for start, stop in [(3, 30), (8, 16), (13, 14), (5, 5), (0, 45)]:
+      self._assertSameSpikeTrains(store.window(start, stop),
+                                  self.spikeTrains[:, start:stop])
+    self._assertSameSpikeTrains(store.window(3, 40).window(6, 20),
+                                self.spikeTrains[:, 9:23])
+    self.assertRaises(ValueError, store.window, 10, 46)
+
+
+  def testSubsampleAndWindow(self):
+    store = SpikeTrainStore.fromDense(self.spikeTrains)
+    cells = np.array([11, 2, 7, 2])
+    expected = self.spikeTrains[cells, 5:27]
+    self._assertSameSpikeTrains(store.subsample(cells).window(5, 27), expected)
+    self._assertSameSpikeTrains(store.window(5, 27).subsample(cells), expected)
+    self._assertSameSpikeTrains(
+      store.window(1, 40).subsample(cells).window(4, 26).subsample([3, 0]),
+      expected[[3, 0]])
+
+
+  def testSetActiveCellsInView(self):
+    store = SpikeTrainStore(*self.spikeTrains.shape)
+    view = store.subsample([4, 9]).window(11, 20)
+    view.setActiveCells(2, [1])
+    expected = np.zeros(self.spikeTrains.shape, dtype="uint32")
+    expected[9, 13] = 1
+    self._assertSameSpikeTrains(store, expected)
+
+
+  def testLoad(self):
+    tempDir = tempfile.mkdtemp()
+    try:
+      filename = os.path.join(tempDir, "spikes.npy")
+      store = SpikeTrainStore.fromDense(self.spikeTrains, filename)
+      store.packed.flush()
+      del store
+
+      loaded = SpikeTrainStore.load(filename, self.spikeTrains.shape[1])
+      self._assertSameSpikeTrains(loaded, self.spikeTrains)
+      self._assertSameSpikeTrains(loaded.window(7, 33).subsample([0, 12]),
+                                  self.spikeTrains[[0, 12], 7:33])
+      del loaded
+    finally:
+      shutil.rmtree(tempDir)
+
+
+  def testComputeISI(self):
+    spikeTrains = np.array([[0, 0, 0, 1, 1, 0, 1, 0, 0],
+                            [1, 1, 1, 0, 0, 0, 0, 1, 1],
+                            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0, 1],
+                            [1, 0, 0, 0, 0, 0, 0, 0, 0]], dtype="uint32")
+    self.assertEqual(computeISI(spikeTrains), [3, 1, 4, 8])
+    self.assertEqual(computeISI(spikeTrains), loopISI(spikeTrains))
+    self.assertEqual(computeISI(SpikeTrainStore.fromDense(spikeTrains)),
+                     loopISI(spikeTrains))
+
+    store = SpikeTrainStore.fromDense(self.spikeTrains)
+    self.assertEqual(computeISI(self.spikeTrains), loopISI(self.spikeTrains))
+    self.assertEqual(computeISI(store.window(3, 41).subsample([5, 1, 8])),
+                     loopISI(self.spikeTrains[[5, 1, 8], 3:41]))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
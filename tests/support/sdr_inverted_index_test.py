@@ -0,0 +1,125 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+from htmresearch.support.sdr_inverted_index import SDRInvertedIndex
+
+
+
+def intersectContainment(representations, activeCells):
+  """
+  The containment of each key's SDRs in the active cells, computed with one
+  np.intersect1d per SDR.
+  """
+  scores = []
+  for value in representations.itervalues():
+    sdrs = value if isinstance(value, list) else [value]
+    best = 0.0
+    for sdr in sdrs:
+      if sdr.size == 0:
+        contained = 1.0
+      else:
+        contained = np.intersect1d(sdr, activeCells).size / float(sdr.size)
+      best = max(best, contained)
+    scores.append(best)
+  return np.array(scores)
+
+
+
+class SDRInvertedIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.rng = np.random.RandomState(42)
+
+
+  def _randomSDR(self, size=10, numCells=100):
+    return np.sort(self.rng.choice(numCells, size, replace=False))
+
+
+  def _assertSameContainment(self, index, representations):
+    for _ in xrange(20):
+      activeCells = self._randomSDR(size=40)
+      np.testing.assert_allclose(index.containment(activeCells),
+                                 intersectContainment(representations,
+                                                      activeCells))
+
+
+  def testSingleSDRs(self):
+    representations = dict((i, self._randomSDR()) for i in xrange(30))
+    representations[30] = np.array([], dtype="int")
+
+    index = SDRInvertedIndex(representations)
+    self.assertEqual(index.keys, representations.keys())
+    self._assertSameContainment(index, representations)
+
+
+  def testListsOfSDRs(self):
+    representations = dict((i, [self._randomSDR() for _ in xrange(i % 4)])
+                           for i in xrange(30))
+
+    index = SDRInvertedIndex(representations)
+    self._assertSameContainment(index, representations)
+
+
+  def testFullyContainedSDR(self):
+    sdr = self._randomSDR()
+    index = SDRInvertedIndex({"a": sdr, "b": np.array([], dtype="int")})
+    np.testing.assert_array_equal(index.containment(sdr), [1.0, 1.0])
+
+
+  def testRebuildAfterAppend(self):
+    representations = dict((i, [self._randomSDR()]) for i in xrange(10))
+    index = SDRInvertedIndex(representations)
+
+    representations[3].append(self._randomSDR())
+    self.assertFalse(index.isCurrent(representations))
+    index = SDRInvertedIndex(representations)
+    self.assertTrue(index.isCurrent(representations))
+    self._assertSameContainment(index, representations)
+
+
+  def testRebuildAfterReplacement(self):
+    representations = dict((i, self._randomSDR()) for i in xrange(10))
+    index = SDRInvertedIndex(representations)
+    self.assertTrue(index.isCurrent(representations))
+
+    # Replace a value with a new SDR of the same size, and drop the old one so
+    # that its id can be reused.
+    representations[3] = self._randomSDR()
+    self.assertFalse(index.isCurrent(representations))
+    index = SDRInvertedIndex(representations)
+    self._assertSameContainment(index, representations)
+
+    # Replace an SDR within a list, keeping the length of the list
+    representations[4] = [self._randomSDR()]
+    index = SDRInvertedIndex(representations)
+    representations[4][0] = self._randomSDR()
+    self.assertFalse(index.isCurrent(representations))
+
+    representations[10] = self._randomSDR()
+    self.assertFalse(index.isCurrent(representations))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,135 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+from nupic.bindings.math import SparseMatrixConnections
+
+from htmresearch.algorithms import apical_dependent_temporal_memory
+from htmresearch.algorithms import apical_tiebreak_temporal_memory
+from htmresearch.algorithms.apical_dependent_temporal_memory import (
+  ApicalDependentTemporalMemory)
+from htmresearch.algorithms.apical_tiebreak_temporal_memory import (
+  ApicalTiebreakTemporalMemory)
+from htmresearch.support.segment_activity import computeSegmentActivity
+
+CONNECTED_PERMANENCE = 0.21
+
+
+
+def twoPassSegmentActivity(connections, activeInput, connectedPermanence):
+  """
+  The segment activity computed with one computeActivity call per count.
+  """
+  return (connections.computeActivity(activeInput, connectedPermanence),
+          connections.computeActivity(activeInput))
+
+
+
+class SegmentActivityTest(unittest.TestCase):
+
+  def setUp(self):
+    self.rng = np.random.RandomState(42)
+    self.numCells = 30
+    self.numInputs = 60
+    self.connections = SparseMatrixConnections(self.numCells, self.numInputs)
+
+    segments = self.connections.createSegments(
+      self.rng.randint(self.numCells, size=80))
+    # Permanences below, at and above the connected permanence.
+    for permanence in (0.1, CONNECTED_PERMANENCE, 0.3, 0.5):
+      for segment in segments:
+        self.connections.growSynapses(
+          [segment], self._randomInput(self.rng.randint(1, 6)), permanence)
+    # Destroyed segments leave empty rows behind.
+    self.connections.destroySegments(segments[::7])
+
+
+  def _randomInput(self, size=25):
+    return np.sort(self.rng.choice(self.numInputs, size, replace=False))
+
+
+  def testMatchesComputeActivity(self):
+    for activeInput in ([], self._randomInput(1), self._randomInput(),
+                        np.arange(self.numInputs)):
+      overlaps, potentialOverlaps = computeSegmentActivity(
+        self.connections, activeInput, CONNECTED_PERMANENCE)
+      expectedOverlaps, expectedPotentialOverlaps = twoPassSegmentActivity(
+        self.connections, activeInput, CONNECTED_PERMANENCE)
+
+      np.testing.assert_array_equal(overlaps, expectedOverlaps)
+      np.testing.assert_array_equal(potentialOverlaps,
+                                    expectedPotentialOverlaps)
+
+
+  def testApicalTiebreakSegments(self):
+    for _ in xrange(10):
+      activeInput = self._randomInput()
+      reducedThresholdCells = self.rng.choice(self.numCells, 10, replace=False)
+      for reducedThreshold in (1, 2, 3):
+        args = (self.connections, activeInput, reducedThresholdCells,
+                CONNECTED_PERMANENCE, 3, 2, reducedThreshold)
+        self._assertSameAsTwoPass(
+          apical_tiebreak_temporal_memory,
+          ApicalTiebreakTemporalMemory._calculateBasalSegmentActivity, args)
+
+      args = (self.connections, activeInput, CONNECTED_PERMANENCE, 3, 2)
+      self._assertSameAsTwoPass(
+        apical_tiebreak_temporal_memory,
+        ApicalTiebreakTemporalMemory._calculateApicalSegmentActivity, args)
+
+
+  def testApicalDependentSegments(self):
+    for _ in xrange(10):
+      activeInput = self._randomInput()
+      reducedThresholdCells = self.rng.choice(self.numCells, 10, replace=False)
+      for reducedThreshold in (1, 2, 3):
+        args = (self.connections, activeInput, CONNECTED_PERMANENCE, 3, 2,
+                reducedThreshold, reducedThresholdCells)
+        self._assertSameAsTwoPass(
+          apical_dependent_temporal_memory,
+          ApicalDependentTemporalMemory._calculateSegmentActivity, args)
+
+
+  def _assertSameAsTwoPass(self, module, calculateSegmentActivity, args):
+    """
+    Compares the segments found with computeSegmentActivity to the segments
+    found when the module uses twoPassSegmentActivity instead.
+    """
+    result = calculateSegmentActivity(*args)
+    module.computeSegmentActivity = twoPassSegmentActivity
+    try:
+      expected = calculateSegmentActivity(*args)
+    finally:
+      module.computeSegmentActivity = computeSegmentActivity
+
+    activeSegments, matchingSegments, potentialOverlaps = result
+    (expectedActiveSegments, expectedMatchingSegments,
+     expectedPotentialOverlaps) = expected
+    np.testing.assert_array_equal(activeSegments, expectedActiveSegments)
+    np.testing.assert_array_equal(matchingSegments, expectedMatchingSegments)
+    np.testing.assert_array_equal(potentialOverlaps, expectedPotentialOverlaps)
+
+
+
+if __name__ == "__main__":
+  unittest.main()